@@ -1,8 +1,9 @@
 import streamlit as st
 import plotly.graph_objects as go
-import networkx as nx
+import numpy as np
 from rustworkx import max_weight_matching
 from graph_utils import degree_sequence_repr, edges_to_rustworkx_graph, parse_degree_sequence, maximum_matching_size_numpy
+from graph_visualization import LABEL_MAX_NODES, LARGE_GRAPH_NODES, LayoutCache
 from havel_hakimi_algorithm import havel_hakimi_general
 from strategies.max_degree_strategy import MaxDegreeStrategy
 from strategies.min_degree_strategy import MinDegreeStrategy
@@ -18,53 +19,76 @@ STRATEGY_MAP = {
     "naive_matching": NaiveMatchingAwareStrategy
 }
 
-def plot_graph_plotly(edges, matching_edges=None, title=""):
-    G = nx.Graph()
-    G.add_edges_from(edges)
-    pos = nx.spring_layout(G, seed=42)
-    edge_x = []
-    edge_y = []
-    for e in G.edges():
-        x0, y0 = pos[e[0]]
-        x1, y1 = pos[e[1]]
-        edge_x += [x0, x1, None]
-        edge_y += [y0, y1, None]
-    edge_trace = go.Scatter(
+def realize_degree_sequence(degrees, strategy_name):
+    """
+    Run Havel-Hakimi and the matching computations for a (sorted) degree sequence and a strategy.
+
+    Returns:
+        dict: is_graphical, the (m, 2) edge array and the strategy's matching edges (None if the
+            strategy builds no matching), and the matching sizes.
+    """
+    strategy = STRATEGY_MAP[strategy_name]()
+    is_graphical, edges = havel_hakimi_general(list(degrees), strategy=strategy, as_array=True)
+    result = {"is_graphical": is_graphical, "edges": edges, "matching_edges": None}
+    if is_graphical:
+        if hasattr(strategy, "get_matching_edges"):
+            result["matching_edges"] = np.asarray(strategy.get_matching_edges(), dtype=np.int64).reshape(-1, 2)
+        result["matching_size"] = len(result["matching_edges"]) if result["matching_edges"] is not None else 0
+        result["max_matching_size_graph"] = len(max_weight_matching(edges_to_rustworkx_graph(edges), max_cardinality=True))
+        result["max_matching_size_degseq"] = maximum_matching_size_numpy(list(degrees))
+    return result
+
+# Memoized on the sequence and the strategy, the least recently used results are evicted.
+# Not used for the random strategy, which gives a new realization on every run.
+cached_realize_degree_sequence = st.cache_data(max_entries=32, show_spinner="Running Havel-Hakimi...")(realize_degree_sequence)
+
+@st.cache_resource
+def shared_layout_cache():
+    """
+    The layouts, kept apart from the results. The app keys them by the degree sequence: node i is
+    the node of degree degrees[i] for every strategy, so switching strategy keeps the node positions.
+    """
+    return LayoutCache(max_entries=16)
+
+def _segments(positions, node_ids, edges):
+    """The x and y coordinates of all the edges, as one line trace with NaN gaps between the edges."""
+    endpoints = positions[np.searchsorted(node_ids, edges)]  # (m, 2 endpoints, 2 coordinates)
+    coordinates = np.full((len(edges), 3, 2), np.nan)
+    coordinates[:, :2] = endpoints
+    return coordinates[:, :, 0].ravel(), coordinates[:, :, 1].ravel()
+
+def plot_graph_plotly(edges, matching_edges=None, title="", layout_key=None):
+    edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+    node_ids, positions = shared_layout_cache().get(edges, seed=42, key=layout_key)
+    n = len(node_ids)
+    # WebGL scales to tens of thousands of points and segments, SVG draws every one as a DOM element
+    Scatter = go.Scattergl if n >= LARGE_GRAPH_NODES else go.Scatter
+    edge_x, edge_y = _segments(positions, node_ids, edges)
+    edge_trace = Scatter(
         x=edge_x, y=edge_y,
-        line=dict(width=1, color='#888'),
+        line=dict(width=1 if n < LARGE_GRAPH_NODES else 0.5, color='#888'),
         hoverinfo='none',
         mode='lines')
 
-    match_x = []
-    match_y = []
-    if matching_edges:
-        for e in matching_edges:
-            x0, y0 = pos[e[0]]
-            x1, y1 = pos[e[1]]
-            match_x += [x0, x1, None]
-            match_y += [y0, y1, None]
-    match_trace = go.Scatter(
+    has_matching = matching_edges is not None and len(matching_edges) > 0
+    match_x, match_y = _segments(positions, node_ids, matching_edges if has_matching else edges[:0])
+    match_trace = Scatter(
         x=match_x, y=match_y,
-        line=dict(width=3, color='red'),
+        line=dict(width=3 if n < LARGE_GRAPH_NODES else 1.5, color='red'),
         hoverinfo='none',
         mode='lines',
         name='Matching')
 
-    node_x = []
-    node_y = []
-    for node in G.nodes():
-        x, y = pos[node]
-        node_x.append(x)
-        node_y.append(y)
-    node_trace = go.Scatter(
-        x=node_x, y=node_y,
-        mode='markers+text',
-        text=[str(n) for n in G.nodes()],
+    node_trace = Scatter(
+        x=positions[:, 0], y=positions[:, 1],
+        mode='markers+text' if n <= LABEL_MAX_NODES else 'markers',
+        text=node_ids.astype(str),
         textposition="top center",
-        marker=dict(size=12, color='lightblue', line=dict(width=2)),
+        marker=dict(size=12, color='lightblue', line=dict(width=2)) if n < LARGE_GRAPH_NODES
+        else dict(size=3, color='lightblue'),
         hoverinfo='text')
 
-    fig = go.Figure(data=[edge_trace, match_trace, node_trace] if matching_edges else [edge_trace, node_trace],
+    fig = go.Figure(data=[edge_trace, match_trace, node_trace] if has_matching else [edge_trace, node_trace],
                     layout=go.Layout(
                         title=title,
                         showlegend=False,
@@ -92,26 +116,18 @@ if st.button("Generate Interactive Graph"):
         n = len(degrees)
         deg_seq_str = degree_sequence_repr(degrees)
         st.write(f"Degree sequence: {deg_seq_str} (n={n})")
-        strategy = STRATEGY_MAP[strategy_name]()
-        is_graphical, edges = havel_hakimi_general(degrees, strategy=strategy)
-        if is_graphical:
-            matching_edges = None
-            if hasattr(strategy, "get_matching_edges"):
-                matching_edges = strategy.get_matching_edges()
-            matching_size = len(matching_edges) if matching_edges else 0
-            rw_graph = edges_to_rustworkx_graph(edges)
-            rw_matching = max_weight_matching(rw_graph, max_cardinality=True)
-            max_matching_size_graph = len(rw_matching)
-            max_matching_size_degseq = maximum_matching_size_numpy(degrees)
-
+        realize = realize_degree_sequence if strategy_name == "random" else cached_realize_degree_sequence
+        result = realize(tuple(degrees), strategy_name)
+        if result["is_graphical"]:
             # Display matching sizes above the graph
-            st.write(f"*Matching size by algorithm:* {matching_size}")
-            st.write(f"*Maximum matching size (resulting graph):* {max_matching_size_graph}")
-            st.write(f"*Maximum matching size (degree sequence):* {max_matching_size_degseq}")
+            st.write(f"*Matching size by algorithm:* {result['matching_size']}")
+            st.write(f"*Maximum matching size (resulting graph):* {result['max_matching_size_graph']}")
+            st.write(f"*Maximum matching size (degree sequence):* {result['max_matching_size_degseq']}")
             fig = plot_graph_plotly(
-                edges,
-                matching_edges=matching_edges,
-                title=f"Graph from HH Algorithm ({strategy.__class__.__name__})"
+                result["edges"],
+                matching_edges=result["matching_edges"],
+                layout_key=tuple(degrees),
+                title=f"Graph from HH Algorithm ({STRATEGY_MAP[strategy_name].__name__})"
             )
             st.plotly_chart(fig, use_container_width=True)
         else:
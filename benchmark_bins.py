@@ -0,0 +1,64 @@
+import argparse
+import time
+
+from bins import Bins
+from graph_utils import generate_power_law_degree_sequence
+from havel_hakimi_algorithm import havel_hakimi_general
+from strategies.max_degree_strategy import MaxDegreeStrategy
+from strategies.min_degree_strategy import MinDegreeStrategy
+
+
+def build_bins(degrees):
+    bins = Bins()
+    for vertex_id, degree in enumerate(degrees):
+        if degree > 0:
+            bins.add_node(degree, vertex_id)
+    return bins
+
+def time_calls(func, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        func()
+    return time.perf_counter() - start
+
+def benchmark_queries(bins, repeats):
+    """
+    Compare the degree queries of the bins against scanning the bin keys (the previous implementation).
+    """
+    queries = [
+        ("max degree", bins.get_max_degree, lambda: max(bins.bins)),
+        ("min degree", bins.get_min_degree, lambda: min(bins.bins)),
+        ("top degree (iter)", lambda: next(bins.iter_degrees_descending()),
+         lambda: next(iter(sorted(bins.bins.keys(), reverse=True)))),
+    ]
+    for name, fast, scan in queries:
+        fast_time = time_calls(fast, repeats)
+        scan_time = time_calls(scan, repeats)
+        print(f"  {name:<18} bins:    {fast_time * 1e6 / repeats:8.3f} us   key scan: {scan_time * 1e6 / repeats:8.3f} us"
+              f"   speedup: x{scan_time / fast_time:.1f}")
+
+def benchmark_strategies(degrees):
+    for StrategyClass in (MaxDegreeStrategy, MinDegreeStrategy):
+        start = time.perf_counter()
+        is_graphical, edges = havel_hakimi_general(degrees, strategy=StrategyClass(degrees=degrees))
+        elapsed = time.perf_counter() - start
+        print(f"  {StrategyClass.__name__:<18} graphical: {is_graphical!s:<5} edges: {len(edges):<8} time: {elapsed:.2f} s")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the degree queries of Bins on Zipf degree sequences")
+    parser.add_argument('--n', type=int, default=10**5, help="Number of vertices (default: 10^5)")
+    parser.add_argument('--exponents', type=float, nargs='+', default=[2.1, 2.5], help="Zipf exponents")
+    parser.add_argument('--seed', type=int, default=2, help="Seed for generate_power_law_degree_sequence")
+    parser.add_argument('--repeats', type=int, default=10000, help="Number of calls per timed query")
+    args = parser.parse_args()
+
+    for exponent in args.exponents:
+        degrees = generate_power_law_degree_sequence(args.n, exponent, args.seed)
+        bins = build_bins(degrees)
+        print(f"n={args.n}, exponent={exponent}: {len(bins)} distinct degrees, max degree {bins.get_max_degree()}")
+        benchmark_queries(bins, args.repeats)
+        benchmark_strategies(degrees)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+import argparse
+import json
+import os
+import platform
+import random
+import time
+import tracemalloc
+
+import numpy as np
+from rustworkx import undirected_gnp_random_graph
+
+from graph_utils import degree_sequence, generate_power_law_degree_sequence
+from havel_hakimi_algorithm import havel_hakimi_general
+from main import STRATEGY_MAP
+from utils import ensure_dir
+
+
+def k_odd_sequence(n, seed):
+    """[k] * (k+1) + [1] * (k(k+1)) with the largest odd k that fits in n vertices."""
+    k = max(1, int(n ** 0.5) - 1)
+    k -= 1 - k % 2
+    return [k] * (k + 1) + [1] * (k * (k + 1))
+
+def vanes_sequence(n, seed):
+    """[k] * 2 + [2] * (2k) with k = (n - 2) // 2."""
+    k = max(3, (n - 2) // 2)
+    return [k] * 2 + [2] * (2 * k)
+
+def regular_sequence(n, seed, d=4):
+    return [d] * (n - n % 2)
+
+def gnp_sequence(n, seed, average_degree=8):
+    graph = undirected_gnp_random_graph(n, min(1.0, average_degree / n), seed=seed)
+    return degree_sequence(graph.edge_list())
+
+def zipf_sequence(n, seed, exponent=2.1):
+    """
+    A Zipf sequence from generate_power_law_degree_sequence, with the degrees capped at sqrt(n)
+    (the usual structural cutoff) and the parity fixed, so it is graphical.
+    """
+    degrees = generate_power_law_degree_sequence(n, exponent, seed)
+    cap = max(1, int(n ** 0.5))
+    degrees = [min(degree, cap) for degree in degrees]
+    if sum(degrees) % 2:
+        degrees[-1] += 1
+    return degrees
+
+SEQUENCE_FAMILIES = {
+    "k_odd": k_odd_sequence,
+    "vanes": vanes_sequence,
+    "regular": regular_sequence,
+    "gnp": gnp_sequence,
+    "zipf": zipf_sequence,
+}
+
+
+def run_once(StrategyClass, degrees, seed):
+    random.seed(seed)  # RandomStrategy draws from the global generator
+    start = time.perf_counter()
+    is_graphical, edges = havel_hakimi_general(degrees, strategy=StrategyClass(degrees=degrees))
+    return time.perf_counter() - start, is_graphical, len(edges)
+
+def peak_memory(StrategyClass, degrees, seed):
+    """Peak of the memory allocated while realizing the sequence, in bytes (traced separately, tracing slows the run)."""
+    random.seed(seed)
+    tracemalloc.start()
+    try:
+        havel_hakimi_general(degrees, strategy=StrategyClass(degrees=degrees))
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def fit_exponent(sizes, values, min_value=0.0):
+    """
+    Slope of log(value) against log(n), the empirical exponent of value ~ n^a.
+    Points at or below `min_value` (e.g. times too short to be measured reliably) are left out.
+    """
+    points = [(n, value) for n, value in zip(sizes, values) if value > min_value]
+    if len(points) < 2:
+        return None
+    log_n, log_value = np.log([n for n, _ in points]), np.log([value for _, value in points])
+    return float(np.polyfit(log_n, log_value, 1)[0])
+
+def benchmark(strategies, families, sizes, repeats=3, seed=0, memory=True, max_seconds=10.0):
+    """
+    Time every strategy on every family for the sizes in increasing order.
+
+    A (strategy, family) pair is not repeated and stops growing once a run takes more than
+    `max_seconds`, so the quadratic strategies do not hold up the others.
+
+    Returns:
+        dict: {"runs": [...], "fits": [...]} with one run per (strategy, family, n) and the fitted
+            exponents of the time and memory of every pair.
+    """
+    runs = []
+    fits = []
+    for family in families:
+        sequences = [(size, SEQUENCE_FAMILIES[family](size, seed)) for size in sizes]
+        for strategy in strategies:
+            StrategyClass = STRATEGY_MAP[strategy]
+            pair_runs = []
+            for size, degrees in sequences:
+                timings = []
+                for _ in range(repeats):
+                    timings.append(run_once(StrategyClass, degrees, seed))
+                    if timings[-1][0] > max_seconds:
+                        break
+                seconds = min(timing[0] for timing in timings)
+                _, is_graphical, edge_count = timings[0]
+                run = {
+                    "strategy": strategy, "family": family, "n": len(degrees), "m": edge_count,
+                    "graphical": is_graphical, "seconds": seconds,
+                    "peak_bytes": peak_memory(StrategyClass, degrees, seed) if memory else None,
+                }
+                pair_runs.append(run)
+                print(f"  {strategy:<15} {family:<8} n={run['n']:<9} m={edge_count:<9} time: {seconds:9.4f} s"
+                      + (f"   peak: {run['peak_bytes'] / 2**20:8.2f} MiB" if memory else ""))
+                if seconds > max_seconds:
+                    break
+            runs.extend(pair_runs)
+            ns = [run["n"] for run in pair_runs]
+            fit = {
+                "strategy": strategy, "family": family,
+                "time_exponent": fit_exponent(ns, [run["seconds"] for run in pair_runs], min_value=1e-3),
+                "memory_exponent": fit_exponent(ns, [run["peak_bytes"] for run in pair_runs]) if memory else None,
+            }
+            fits.append(fit)
+            print(f"  {strategy:<15} {family:<8} time ~ n^{_format_exponent(fit['time_exponent'])}"
+                  + (f"   memory ~ n^{_format_exponent(fit['memory_exponent'])}" if memory else ""))
+    return {"runs": runs, "fits": fits}
+
+def _format_exponent(exponent):
+    return "?" if exponent is None else f"{exponent:.2f}"
+
+def save_baseline(results, path, args):
+    """
+    Save the results as JSON, one run per line in a fixed order, so two baselines can be diffed.
+    """
+    ensure_dir(os.path.dirname(path) or ".")
+    header = {
+        "python": platform.python_version(), "numpy": np.__version__, "machine": platform.machine(),
+        "repeats": args.repeats, "seed": args.seed, "sizes": args.sizes,
+    }
+    lines = [json.dumps(run, sort_keys=True) for run in results["runs"]]
+    fit_lines = [json.dumps(fit, sort_keys=True) for fit in results["fits"]]
+    with open(path, "w") as baseline:
+        baseline.write('{"header": ' + json.dumps(header, sort_keys=True) + ',\n "runs": [\n  ')
+        baseline.write(",\n  ".join(lines))
+        baseline.write('\n ],\n "fits": [\n  ')
+        baseline.write(",\n  ".join(fit_lines))
+        baseline.write("\n ]\n}\n")
+
+def compare_with_baseline(results, path, threshold=1.5):
+    """
+    Print the runs that are more than `threshold` times slower than in the baseline at `path`.
+
+    Returns:
+        int: The number of regressions.
+    """
+    with open(path) as baseline_file:
+        baseline = json.load(baseline_file)
+    previous = {(run["strategy"], run["family"], run["n"]): run for run in baseline["runs"]}
+    regressions = 0
+    for run in results["runs"]:
+        old = previous.get((run["strategy"], run["family"], run["n"]))
+        if old is None or old["seconds"] < 1e-3:
+            continue
+        ratio = run["seconds"] / old["seconds"]
+        if ratio > threshold:
+            regressions += 1
+            print(f"  regression: {run['strategy']} {run['family']} n={run['n']}: "
+                  f"{old['seconds']:.4f} s -> {run['seconds']:.4f} s (x{ratio:.2f})")
+    print(f"{regressions} regressions against {path}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Havel-Hakimi strategies on the project's degree sequence families")
+    parser.add_argument('--strategies', nargs='+', default=list(STRATEGY_MAP), choices=list(STRATEGY_MAP),
+                        help="Strategies to time (default: all of STRATEGY_MAP)")
+    parser.add_argument('--families', nargs='+', default=list(SEQUENCE_FAMILIES), choices=list(SEQUENCE_FAMILIES),
+                        help="Degree sequence families (default: all)")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[2**k for k in range(8, 15, 2)],
+                        help="Numbers of vertices, in increasing order (default: 256 1024 4096 16384)")
+    parser.add_argument('--repeats', type=int, default=3, help="Runs per size, the fastest is kept (default: 3)")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the random families and of RandomStrategy")
+    parser.add_argument('--max-seconds', type=float, default=10.0,
+                        help="Stop growing n for a strategy and family after a run this long (default: 10)")
+    parser.add_argument('--no-memory', action='store_true', help="Skip the (slower) peak memory measurement")
+    parser.add_argument('--output', type=str, default="benchmark_results/strategies_baseline.json",
+                        help="Where to save the results (default: benchmark_results/strategies_baseline.json)")
+    parser.add_argument('--compare', type=str, default=None, help="A previous baseline to check for regressions")
+    args = parser.parse_args()
+
+    results = benchmark(args.strategies, args.families, sorted(args.sizes), repeats=args.repeats, seed=args.seed,
+                        memory=not args.no_memory, max_seconds=args.max_seconds)
+    if args.compare:
+        compare_with_baseline(results, args.compare)
+    save_baseline(results, args.output, args)
+    print(f"Saved {len(results['runs'])} runs to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
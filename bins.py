@@ -1,13 +1,151 @@
-from collections import defaultdict
+from bisect import bisect_left, insort
+from itertools import islice
+
+
+class _Bin:
+    """
+    The nodes of a single degree, in bin order.
+
+    Nodes are stored in a list that may contain holes (None) left by removed nodes,
+    and free room before the first node so insertions at the front are cheap.
+    `slots` maps every node to its position, so a node is removed by its ID in O(1)
+    without shifting the others. The list is compacted once holes dominate it,
+    or before iterating over it.
+    """
+    __slots__ = ("items", "slots", "head", "base", "size")
+
+    def __init__(self):
+        self.items = []  # Node ids in bin order; None marks a hole or the free room before `head`
+        self.slots = dict()  # node_id -> position; the node is at items[position - base]
+        self.head = 0  # Index of the first node in items
+        self.base = 0
+        self.size = 0
+
+    def append(self, node_id):
+        self.slots[node_id] = len(self.items) + self.base
+        self.items.append(node_id)
+        self.size += 1
+
+    def appendleft(self, node_id):
+        if self.head == 0:
+            self._grow_front(1)
+        self.head -= 1
+        self.items[self.head] = node_id
+        self.slots[node_id] = self.head + self.base
+        self.size += 1
+
+    def prepend(self, node_ids):
+        """
+        Insert a run of nodes before the first node, keeping the run's order. O(len(node_ids)).
+        """
+        count = len(node_ids)
+        if self.head < count:
+            self._grow_front(count)
+        start = self.head - count
+        self.items[start:self.head] = node_ids
+        position = start + self.base
+        slots = self.slots
+        for node_id in node_ids:
+            slots[node_id] = position
+            position += 1
+        self.head = start
+        self.size += count
+
+    def remove(self, node_id):
+        items = self.items
+        index = self.slots.pop(node_id) - self.base
+        items[index] = None
+        self.size -= 1
+        if self.size == 0:
+            self.items = []
+            self.head = 0
+        elif index == self.head:
+            while items[self.head] is None:
+                self.head += 1
+        elif index == len(items) - 1:
+            while items[-1] is None:
+                items.pop()
+        if len(items) > 3 * self.size + 64:
+            self._compact()
+
+    def node_at(self, pos):
+        """
+        Return the node at position `pos` of the bin (negative positions count from the end).
+        """
+        if pos < 0:
+            pos += self.size
+        if not 0 <= pos < self.size:
+            raise IndexError("pop index out of range")
+        if pos == 0:
+            return self.items[self.head]
+        if pos == self.size - 1:
+            return self.items[-1]
+        if len(self.items) - self.head != self.size:  # There are holes, so positions are not indices
+            self._compact()
+        return self.items[self.head + pos]
+
+    def _grow_front(self, count):
+        """
+        Make room for at least `count` nodes before the first node.
+        The room grows with the bin, so repeated insertions at the front are amortized O(1).
+        A new list is created so iterators over the old one are not shifted.
+        """
+        extra = max(count, self.size, 4)
+        self.items = [None] * extra + self.items
+        self.head += extra
+        self.base -= extra
+
+    def _compact(self):
+        Bins.rebuilds += 1
+        self.items = [node_id for node_id in islice(self.items, self.head, None) if node_id is not None]
+        self.head = 0
+        self.base = 0
+        self.slots = {node_id: index for index, node_id in enumerate(self.items)}
+
+    def __iter__(self):
+        if len(self.items) - self.head != self.size:
+            # Iterating is O(size) anyway, so drop the holes once instead of filtering them on every pass
+            self._compact()
+        return islice(self.items, self.head, None)
+
+    def __contains__(self, node_id):
+        return node_id in self.slots
+
+    def __len__(self):
+        return self.size
+
+    def __bool__(self):
+        return self.size > 0
+
+    def __repr__(self):
+        return repr(list(self))
+
 
 class Bins:
+    rebuilds = 0  # Bins rebuilt or compacted so far, over all instances (read by HHProfiler)
+
     def __init__(self, pop_pos=0):
         """
         Initialize the bins data structure.
+
+        Besides the bins themselves, a sorted list of the degrees that have a non-empty bin
+        is maintained, so the max/min degree and the descending degree order are available
+        without scanning or sorting the bin keys.
+        Each bin indexes the position of its nodes, so a node can be removed by its ID
+        in O(1) while the order of the other nodes is preserved.
         """
-        self.bins = defaultdict(list)
+        self.bins = dict()
         self.size = 0  # Total number of nodes across all bins
         self.pop_pos = pop_pos
+        self._degrees = []  # Degrees of the non-empty bins, in ascending order
+
+    def clear(self):
+        """
+        Remove all the nodes, so the bins can be filled again with another sequence.
+        """
+        self.bins.clear()
+        self.size = 0
+        self._degrees.clear()
 
     def add_node(self, degree, node_id, index=None):
         """
@@ -16,12 +154,44 @@ class Bins:
         Args:
             degree (int): The degree of the node.
             node_id (int): The ID of the node.
+            index (int, optional): The position in the bin to insert at. Defaults to the end of the bin.
         """
-        if index is None:
-            index = len(self.bins[degree])
-        self.bins[degree].insert(index, node_id)
+        node_bin = self.bins.get(degree)
+        if node_bin is None:
+            node_bin = self.bins[degree] = _Bin()
+            insort(self._degrees, degree)
+        if index is None or index >= node_bin.size:
+            node_bin.append(node_id)
+        elif index == 0:
+            node_bin.appendleft(node_id)
+        else:
+            # Insertion in the middle of a bin is not used by the strategies, rebuild the bin
+            Bins.rebuilds += 1
+            nodes = list(node_bin)
+            nodes.insert(index, node_id)
+            node_bin = self.bins[degree] = _Bin()
+            for nid in nodes:
+                node_bin.append(nid)
         self.size += 1
 
+    def prepend_nodes(self, degree, node_ids):
+        """
+        Insert a run of nodes at the beginning of the bin corresponding to their degree,
+        so the first node of the run ends up first in the bin.
+
+        Args:
+            degree (int): The degree of the nodes.
+            node_ids (list[int]): The IDs of the nodes, in the order they should appear in the bin.
+        """
+        if not node_ids:
+            return
+        node_bin = self.bins.get(degree)
+        if node_bin is None:
+            node_bin = self.bins[degree] = _Bin()
+            insort(self._degrees, degree)
+        node_bin.prepend(node_ids)
+        self.size += len(node_ids)
+
     def pop_node(self, degree, pop_pos=None):
         """
         Pop a node from the bin corresponding to the given degree, and in a specific position.
@@ -35,12 +205,14 @@ class Bins:
         """
         if pop_pos is None:
             pop_pos = self.pop_pos
-        node_id = self.bins[degree].pop(pop_pos)
-        if not self.bins[degree]:
-            del self.bins[degree]
+        node_bin = self.bins[degree]
+        node_id = node_bin.node_at(pop_pos)
+        node_bin.remove(node_id)
+        if not node_bin.size:
+            self._remove_bin(degree)
         self.size -= 1
         return node_id
-    
+
     def pop_node_by_id(self, node_id, degree):
         """
         Pop a node by its ID from the bin corresponding to its degree.
@@ -52,17 +224,52 @@ class Bins:
         Returns:
             int: The ID of the popped node.
         """
-        self.bins[degree].remove(node_id)
-        if not self.bins[degree]:
-            del self.bins[degree]
+        node_bin = self.bins.get(degree)
+        if node_bin is None or node_id not in node_bin.slots:
+            raise ValueError(f"node {node_id} is not in the bin of degree {degree}")
+        node_bin.remove(node_id)
+        if not node_bin.size:
+            self._remove_bin(degree)
         self.size -= 1
         return node_id
 
+    def _remove_bin(self, degree):
+        """
+        Delete an empty bin and drop its degree from the sorted degrees.
+        """
+        del self.bins[degree]
+        if degree == self._degrees[-1]:
+            self._degrees.pop()
+        elif degree == self._degrees[0]:
+            del self._degrees[0]
+        else:
+            del self._degrees[bisect_left(self._degrees, degree)]
+
     def get_max_degree(self):
         """
         Get the maximum degree present in the bins.
         """
-        return max(self.bins)
+        if not self._degrees:
+            raise ValueError("get_max_degree() called on empty bins")
+        return self._degrees[-1]
+
+    def get_min_degree(self):
+        """
+        Get the minimum degree present in the bins.
+        """
+        if not self._degrees:
+            raise ValueError("get_min_degree() called on empty bins")
+        return self._degrees[0]
+
+    def get_last_node(self):
+        """
+        Get the last node in iteration order (the last node in the bin of the minimum degree), without removing it.
+
+        Returns:
+            tuple: A tuple (degree, node_id).
+        """
+        degree = self.get_min_degree()
+        return degree, self.bins[degree].node_at(-1)
 
     def __iter__(self):
         """
@@ -71,23 +278,23 @@ class Bins:
         Yields:
             tuple: A tuple (degree, node_id) for each node in the bins.
         """
-        for degree in sorted(self.bins.keys(), reverse=True):
+        for degree in self.iter_degrees_descending():
             for node_id in self.bins[degree]:
                 yield degree, node_id
 
     def iter_degrees_descending(self):
         """
         Returns an iterator that yields degrees in descending order.
-        
+
         Returns:
             iterator: An iterator over degrees in descending order
         """
-        return iter(sorted(self.bins.keys(), reverse=True))
+        return reversed(self._degrees)
 
 
     def __str__(self) -> str:
-        return f"Bins(size={self.size}, bins={dict(sorted(self.bins.items(), reverse=True))})"
-    
+        return f"Bins(size={self.size}, bins={dict((degree, list(self.bins[degree])) for degree in self.iter_degrees_descending())})"
+
     def __len__(self):
         """
         Return the total number of bins (distinct degrees).
@@ -106,8 +313,6 @@ class Bins:
             return True
         if len(self.bins) > 2:
             return False
-        min_degree = min(self.bins.keys())
-        max_degree = max(self.bins.keys())
-        if max_degree - min_degree > 1:  # if the degrees are not sequential/consecutive
+        if self._degrees[-1] - self._degrees[0] > 1:  # if the degrees are not sequential/consecutive
             return False
-        return True
\ No newline at end of file
+        return True
@@ -1,52 +1,80 @@
+import io
 import os
 import numpy as np
 import matplotlib.pyplot as plt
 from collections import Counter
 from datetime import datetime
 import random
+import time
 
-from graph_utils import check_legal_matching, degree_sequence, degree_sequence_repr, generate_graph_with_perfect_matching
+from graph_utils import check_legal_matching, degree_order, degree_sequence, degree_sequence_repr, generate_coupled_graphs, generate_graph_with_perfect_matching, prefix_degree_sequences
 from havel_hakimi_algorithm import havel_hakimi_general
-from graph_visualization import visualize_graph
+from hh_profiler import HHProfiler
+from graph_visualization import LayoutCache, visualize_graph
 from strategies.matching_aware_strategy import MatchingAwareStrategy
 from strategies.naive_matching_aware_strategy import NaiveMatchingAwareStrategy
+from results_store import ResultBuffer, ResultWriter, records_dir_for
+from sweep_runner import SweepCheckpoint, checkpoint_path_for, iter_sweep, sweep_arg_parser, sweep_seeds
 from utils import ensure_dir
 
 
 def save_figure(original_edges, matching, hh_edges, hh_matching, n, p, round_idx, save_dir, deg_seq_str):
     fig, axes = plt.subplots(1, 2, figsize=(16, 6))
     fig.suptitle(f"n={n}, p={p:.2f}, round={round_idx}, deg_seq=({deg_seq_str})", fontsize=14)
-    visualize_graph(original_edges, highlight_edges=matching, ax=axes[0],
-                    title=f"Original Graph\nPerfect Matching size: {len(matching) if matching else 0}")
-    visualize_graph(hh_edges, highlight_edges=hh_matching, ax=axes[1],
+    # HH node i is the i-th node of the degree sequence: drawn on the original nodes, with their layout
+    node_order = degree_order(original_edges)
+    hh_edges = node_order[np.asarray(hh_edges, dtype=np.int64).reshape(-1, 2)]
+    hh_matching = node_order[np.asarray(hh_matching, dtype=np.int64)].tolist() if hh_matching else hh_matching
+    layout_cache = LayoutCache()
+    visualize_graph(original_edges, highlight_edges=matching, ax=axes[0], layout_cache=layout_cache, layout_key=deg_seq_str,
+                    title=f"Original Graph\nPerfect Matching size: {len(matching) if matching is not None else 0}")
+    visualize_graph(hh_edges, highlight_edges=hh_matching, ax=axes[1], layout_cache=layout_cache, layout_key=deg_seq_str,
                     title=f"HH Algorithm\nMatching size: {len(hh_matching) if hh_matching else 0}")
     fig.tight_layout()
     fig.savefig(os.path.join(save_dir, f"graph_n{n}_p{p:.2f}_round{round_idx}.png"))
     plt.close(fig)
 
 def run_rounds_for_np_perfect_matching(StrategyClass, n, p, rounds, save_every,
-                                       save_dir, degseq_log_filename, edges_log_file):
+                                       save_dir, degseq_log_filename, edges_log_file, rng=None, graphs=None,
+                                       records=None, profile=False):
+    """
+    Run the rounds for one (n, p). `graphs`, if given, holds the (edges, matching, degrees) of every
+    round, already drawn by a coupled sweep; otherwise a graph is generated per round.
+    Every round is also added to `records` (a ResultBuffer), if given.
+    With `profile`, the HHProfiler summary of every round is printed.
+    """
     matching_sizes = []
     matching_size_counter = Counter()
     degseq_log_path = os.path.join(save_dir, degseq_log_filename)
     # with open(degseq_log_path, "w") as degseq_log:
         # degseq_log.write("n,p,round,degree_sequence,matching_size\n")
     for round_idx in range(1, rounds + 1):
-        original_edges, matching = generate_graph_with_perfect_matching(n, p)
-        degrees = degree_sequence(original_edges)
+        if graphs is not None:
+            original_edges, matching, degrees = graphs[round_idx - 1]
+        else:
+            original_edges, matching = generate_graph_with_perfect_matching(n, p, rng)
+            degrees = degree_sequence(original_edges)
         deg_seq_str = degree_sequence_repr(degrees)
         strategy = StrategyClass(degrees=degrees)
+        if profile:
+            strategy.profiler = HHProfiler()
         
+        start_time = time.perf_counter()
         is_graphical, hh_edges = havel_hakimi_general(degrees, strategy=strategy)
+        elapsed = time.perf_counter() - start_time
+        if profile:
+            print(strategy.profiler.summary_line(f"n={n}, p={p:.4f}, round={round_idx}"))
         hh_matching = strategy.get_matching_edges()
         msize = len(hh_matching) if hh_matching else 0
         matching_sizes.append(msize)
         matching_size_counter[msize] += 1
-        if use_naive_strategy:
+        if StrategyClass is NaiveMatchingAwareStrategy:
             assert check_legal_matching(hh_matching), "Naive strategy produced an illegal matching!"
+        if records is not None:
+            records.append(n=n, p=p, round=round_idx, matching_size=msize, original_matching=n // 2, seconds=elapsed)
 
         edges_log_file.write(f"Round {round_idx}: n={n}, p={p:.4f}, degree_sequence={deg_seq_str}\n")
-        edges_log_file.write(f"HH edges: {sorted(original_edges)}\n")
+        edges_log_file.write(f"HH edges: {sorted(map(tuple, original_edges.tolist()))}\n")
         edges_log_file.write(f"HH matching: {sorted(hh_matching)}\n")
 
         # degseq_log.write(f"{n},{p:.4f},{round_idx},\"{deg_seq_str}\",{msize}\n")
@@ -60,6 +88,39 @@ def run_rounds_for_np_perfect_matching(StrategyClass, n, p, rounds, save_every,
         #     )
     return matching_sizes, matching_size_counter
 
+def draw_coupled_rounds(n, p_range, rounds, rng):
+    """
+    Draw the graphs of every round for all p at once. Returns, for every p, the list of
+    (edges, matching, degrees) of its rounds.
+    """
+    graphs = [[] for _ in p_range]
+    for _ in range(rounds):
+        edge_prefixes, matching = generate_coupled_graphs(n, p_range, rng, perfect_matching=True)
+        for p_idx, (edges, degrees) in enumerate(zip(edge_prefixes, prefix_degree_sequences(edge_prefixes))):
+            graphs[p_idx].append((edges, matching, degrees))
+    return graphs
+
+def run_cell(StrategyClass, n, p_range, rounds, save_every, base_dir, degseq_log_filename, coupled,
+             profile=False, seed_sequence=None):
+    """
+    Run all the p of one n, with the cell's own random stream (see sweep_runner.run_sweep).
+    Returns, for every p, (matching_sizes, matching_size_counter, edges log text, records).
+    """
+    rng = np.random.default_rng(seed_sequence)
+    coupled_graphs = draw_coupled_rounds(n, p_range, rounds, rng) if coupled else None
+    results = []
+    for p_idx, p in enumerate(p_range):
+        save_dir = os.path.join(base_dir, f"n_{n}", f"p_{p:.2f}")
+        # ensre_dir(save_dir)
+        edges_log = io.StringIO()
+        records = ResultBuffer()
+        matching_sizes, matching_size_counter = run_rounds_for_np_perfect_matching(
+            StrategyClass, n, p, rounds, save_every, save_dir,
+            degseq_log_filename, edges_log, rng,
+            graphs=coupled_graphs[p_idx] if coupled else None, records=records, profile=profile)
+        results.append((matching_sizes, matching_size_counter, edges_log.getvalue(), records))
+    return results
+
 def save_statistics(n, p, rounds, matching_sizes, matching_size_counter, save_dir, log_file):
     avg = np.mean(matching_sizes)
     median = np.median(matching_sizes)
@@ -101,8 +162,25 @@ def run_experiment(
     edges_log_filename="edges_log.txt",
     degseq_log_filename="degseq_matching_log.txt",
     use_naive_strategy=False,
-    seed=None
+    seed=None,
+    coupled=False,
+    workers=1,
+    profile=False,
+    resume=False,
+    checkpoint_seconds=60.0
 ):
+    """
+    Run the sweep over n_range x p_range.
+    With `coupled`, the graphs of all p of a round share one weight per vertex pair
+    (see generate_coupled_graphs): they are drawn once per (n, round) and thresholded for every p.
+    Every n is a cell of sweep_runner.iter_sweep, run on `workers` processes, and the logs are
+    written in (n, p) order as the cells are done, so they do not depend on `workers`. They are
+    checkpointed every `checkpoint_seconds` (see SweepCheckpoint); with `resume`, an interrupted
+    run is resumed from its checkpoint, appending to its outputs.
+    Besides the text logs, every round is written as a typed record next to the experiment log
+    (see results_store), for load_results to read back.
+    With `profile`, every Havel-Hakimi run prints its phase times and counters (see HHProfiler).
+    """
     StrategyClass = NaiveMatchingAwareStrategy if use_naive_strategy else MatchingAwareStrategy
     if seed is not None:
         log_filename = f"experiment_log_s{seed}.txt"
@@ -113,32 +191,50 @@ def run_experiment(
 
     log_path = os.path.join(base_dir, log_filename)
     ensure_dir(base_dir)
-    with open(log_path, "w") as log_file:
-        log_file.write(f"Experiment started at {datetime.now()}\n\n")
-        log_file.write(f"n_range: {list(n_range)}\np_range: {list(p_range)}\nrounds: {rounds}\nsave_every: {save_every}\n\n")
-
-        with open(os.path.join(base_dir, edges_log_filename), "w") as edges_log:
-            for n in n_range:
-                for p in p_range:
-                    save_dir = os.path.join(base_dir, f"n_{n}", f"p_{p:.2f}")
-                    # ensre_dir(save_dir)
-                    matching_sizes, matching_size_counter = run_rounds_for_np_perfect_matching(
-                        StrategyClass, n, p, rounds, save_every, save_dir, 
-                        degseq_log_filename, edges_log)
-                    save_statistics(n, p, rounds, matching_sizes, matching_size_counter, save_dir, log_file)
+    checkpoint = SweepCheckpoint(checkpoint_path_for(log_path), {
+        "n_range": list(n_range), "p_range": [float(p) for p in p_range], "rounds": rounds, "seed": seed,
+        "strategy": StrategyClass.__name__, "coupled": coupled,
+    }, every_seconds=checkpoint_seconds)
+    resumed = resume and checkpoint.load()
+    if checkpoint.complete:
+        print(f"{log_path} is complete, nothing to resume.")
+        return
+    mode = "a" if resumed else "w"
+    with open(log_path, mode) as log_file, open(os.path.join(base_dir, edges_log_filename), mode) as edges_log, \
+            ResultWriter(records_dir_for(log_path), mode=mode) as record_writer:
+        if not resumed:
+            log_file.write(f"Experiment started at {datetime.now()}\n\n")
+            log_file.write(f"n_range: {list(n_range)}\np_range: {list(p_range)}\nrounds: {rounds}\nsave_every: {save_every}\n\n")
+        checkpoint.track([log_file, edges_log], [record_writer])
+
+        cells = [(StrategyClass, n, list(p_range), rounds, save_every, base_dir, degseq_log_filename, coupled, profile)
+                 for n in n_range]
+        cell_results = iter_sweep(run_cell, cells, workers=workers, seed=seed, start=checkpoint.cells_done)
+        for n, results in zip(list(n_range)[checkpoint.cells_done:], cell_results):
+            for p, (matching_sizes, matching_size_counter, edges_log_text, records) in zip(p_range, results):
+                save_dir = os.path.join(base_dir, f"n_{n}", f"p_{p:.2f}")
+                edges_log.write(edges_log_text)
+                record_writer.write(records, seed=seed)
+                save_statistics(n, p, rounds, matching_sizes, matching_size_counter, save_dir, log_file)
+            checkpoint.cell_done()
+        checkpoint.finish()
 
 
 if __name__ == "__main__":
-    # Generate 20 random seeds
-    SEEDS = [random.randint(0, 10000) for _ in range(10)]
+    args = sweep_arg_parser("Matching-aware Havel-Hakimi on random graphs with a perfect matching").parse_args()
+
+    # Generate 10 random seeds, saved so that --resume runs the same seeds again
+    SEEDS = sweep_seeds("experiment_results/seeds.json", 10, resume=args.resume)
     # SEEDS = [501, 1177, 1878, 2245, 2368, 3480, 5622, 5650, 6992, 8158]  #np.linspace(0.01, 0.26, 5)
     # SEEDS = [563, 7170, 7102, 626, 4962, 4626, 1398, 3875, 5928, 7734]  #np.linspace(0.002, 0.02, 5)
     # SEEDS = [2126, 660, 3540, 3732, 6126, 7426, 79, 4419, 5274, 8317]  #np.linspace(0.3, 0.5, 4)
 
     use_naive_strategy = False  # Set to True to use NaiveMatchingAwareStrategy
+    coupled = False  # Set to True to derive the graphs of all p of a round from one draw
 
     for seed in SEEDS:
         print(f"Running experiment with seed: {seed}")
         random.seed(seed)
         np.random.seed(seed)
-        run_experiment(use_naive_strategy=use_naive_strategy, seed=seed)
+        run_experiment(use_naive_strategy=use_naive_strategy, seed=seed, coupled=coupled, workers=args.workers,
+                       profile=args.profile, resume=args.resume)
@@ -1,37 +1,71 @@
+import io
 import os
 import numpy as np
 from datetime import datetime
 import random
+import time
 
 from rustworkx import max_weight_matching, undirected_gnp_random_graph, barabasi_albert_graph
 
+from results_store import ResultBuffer, ResultWriter, records_dir_for
+from sweep_runner import SweepCheckpoint, checkpoint_path_for, iter_sweep, sweep_arg_parser, sweep_seeds
 from utils import ensure_dir
-from graph_utils import check_legal_matching, degree_sequence, degree_sequence_repr, maximum_matching_size_numpy
+from graph_utils import check_legal_matching, degree_sequence, degree_sequence_repr, edges_to_rustworkx_graph, generate_coupled_graphs, maximum_matching_size_numpy, prefix_degree_sequences
 from havel_hakimi_algorithm import havel_hakimi_general
+from hh_cache import HHResultCache, cache_summary
+from hh_profiler import HHProfiler
 from strategies.matching_aware_strategy import MatchingAwareStrategy
 from strategies.naive_matching_aware_strategy import NaiveMatchingAwareStrategy
 
 
-def run_rounds_for_np_general(StrategyClass, n, p, rounds, degseq_log, seed=None):
+def run_rounds_for_np_general(StrategyClass, n, p, rounds, degseq_log, seed=None, graphs=None, cache=None,
+                              records=None, profile=False):
+    """
+    Run the rounds for one (n, p). `graphs`, if given, holds the (edges, degrees) of every round,
+    already drawn by a coupled sweep; otherwise a graph is generated per round.
+    With a `cache` (HHResultCache), sequences that were already run are not run again.
+    Every round is also added to `records` (a ResultBuffer), if given.
+    With `profile`, the HHProfiler summary of every round is printed.
+    """
     degseq_log.write("n,p,round,degree_sequence,matching_size\n")
     for round_idx in range(1, rounds + 1):
-        seed_i = seed + round_idx if seed is not None else None
-        # The barabasi_albert_graph function has a bug affecting reproducibility, see https://github.com/Qiskit/rustworkx/issues/1480
-        # original_graph = barabasi_albert_graph(n, p, seed=seed_i)
-        original_graph = undirected_gnp_random_graph(n, p, seed=seed_i)
-        original_edges = original_graph.edge_list()
+        if graphs is not None:
+            original_edges, degrees = graphs[round_idx - 1]
+            original_graph = edges_to_rustworkx_graph(original_edges)
+        else:
+            seed_i = seed + round_idx if seed is not None else None
+            # The barabasi_albert_graph function has a bug affecting reproducibility, see https://github.com/Qiskit/rustworkx/issues/1480
+            # original_graph = barabasi_albert_graph(n, p, seed=seed_i)
+            original_graph = undirected_gnp_random_graph(n, p, seed=seed_i)
+            original_edges = original_graph.edge_list()
+            degrees = degree_sequence(original_edges)
         matching = max_weight_matching(original_graph, max_cardinality=True)
-        degrees = degree_sequence(original_edges)
         deg_seq_str = degree_sequence_repr(degrees)
-        strategy = StrategyClass(degrees=degrees)
+        if cache is not None:
+            result = cache.run(degrees, StrategyClass, with_bound=True, deg_seq_str=deg_seq_str)
+            msize, max_deg_seq_matching_size = result.matching_size, result.matching_bound
+            # Both None on a hit: the matching was checked when the sequence was run, and a lookup
+            # is not timed as a realization
+            hh_matching, elapsed = result.matching_edges, result.seconds
+        else:
+            strategy = StrategyClass(degrees=degrees)
+            if profile:
+                strategy.profiler = HHProfiler()
 
-        _, __ = havel_hakimi_general(degrees, strategy=strategy)
-        hh_matching = strategy.get_matching_edges()
-        msize = len(hh_matching) if hh_matching else 0
-        if use_naive_strategy:
+            start_time = time.perf_counter()
+            _, __ = havel_hakimi_general(degrees, strategy=strategy)
+            elapsed = time.perf_counter() - start_time
+            if profile:
+                print(strategy.profiler.summary_line(f"n={n}, p={p:.4f}, round={round_idx}"))
+            hh_matching = strategy.get_matching_edges()
+            msize = len(hh_matching) if hh_matching else 0
+            max_deg_seq_matching_size = maximum_matching_size_numpy(degrees)
+        if StrategyClass is NaiveMatchingAwareStrategy and hh_matching is not None:
             assert check_legal_matching(hh_matching), "Naive strategy produced an illegal matching!"
-
-        max_deg_seq_matching_size = maximum_matching_size_numpy(degrees)
+        if records is not None:
+            records.append(n=n, p=p, seed=seed, round=round_idx, matching_size=msize,
+                           matching_bound=max_deg_seq_matching_size, original_matching=len(matching),
+                           seconds=elapsed)
 
         if len(deg_seq_str) == 0:
             degseq_log.write(f"{n},{p:.4f},{round_idx},'no deg sequence'\n")
@@ -41,6 +75,45 @@ def run_rounds_for_np_general(StrategyClass, n, p, rounds, degseq_log, seed=None
             degseq_log.write(f"HH matching size:           {msize}\n")
             degseq_log.write(f"MAX matching size:          {max_deg_seq_matching_size}    ---> success: {msize >= len(matching)},{max_deg_seq_matching_size - msize} \n")
 
+def draw_coupled_rounds(n, p_range, rounds, seed=None):
+    """
+    Draw the graphs of every round for all p at once, seeded per round like the uncoupled rounds.
+    Returns, for every p, the list of (edges, degrees) of its rounds.
+    """
+    graphs = [[] for _ in p_range]
+    for round_idx in range(1, rounds + 1):
+        rng = np.random.default_rng(seed + round_idx if seed is not None else None)
+        edge_prefixes, _ = generate_coupled_graphs(n, p_range, rng)
+        for p_idx, (edges, degrees) in enumerate(zip(edge_prefixes, prefix_degree_sequences(edge_prefixes))):
+            graphs[p_idx].append((edges, degrees))
+    return graphs
+
+def run_cell(StrategyClass, n, p_range, rounds, coupled, seed=None, cache_path=None, profile=False,
+             seed_sequence=None):
+    """
+    Run all the p of one n and return its part of the degree sequence log, its records
+    (a ResultBuffer) and the (hits, memory_hits, misses) counters of the HH result cache at `cache_path` (None if no cache).
+    The rounds keep their `seed + round_idx` seeds; without a seed, the base seed is drawn
+    from the cell's stream (see sweep_runner.run_sweep).
+    With `profile`, every sequence is run again with an HHProfiler, so the cache is not used.
+    """
+    if seed is None and seed_sequence is not None:
+        seed = int(seed_sequence.generate_state(1)[0])
+    degseq_log = io.StringIO()
+    records = ResultBuffer()
+    cache = HHResultCache(cache_path) if cache_path is not None and not profile else None
+    coupled_graphs = draw_coupled_rounds(n, p_range, rounds, seed) if coupled else None
+    for p_idx, p in enumerate(p_range):
+        if p >= n: # for Barabasi-Albert graph (m < n)
+            continue
+        run_rounds_for_np_general(StrategyClass, n, p, rounds, degseq_log, seed=seed,
+                                  graphs=coupled_graphs[p_idx] if coupled else None, cache=cache, records=records,
+                                  profile=profile)
+    if cache is None:
+        return degseq_log.getvalue(), records, None
+    cache.close()
+    return degseq_log.getvalue(), records, cache.counts()
+
 def run_experiment(
     # n_range=range(4, 251, 6),
     # p_range=np.linspace(0.01, 0.26, 5),
@@ -54,8 +127,26 @@ def run_experiment(
     base_dir="experiment_results/matching_aware_general",
     degseq_log_filename="degseq_matching_log.txt",
     use_naive_strategy=False,
-    seed=None
+    seed=None,
+    coupled=False,
+    workers=1,
+    cache_path=None,
+    profile=False,
+    resume=False,
+    checkpoint_seconds=60.0
 ):
+    """
+    Run the sweep over n_range x p_range.
+    With `coupled`, the G(n, p) graphs of all p of a round share one weight per vertex pair
+    (see generate_coupled_graphs): they are drawn once per (n, round) and thresholded for every p.
+    Every n is a cell of sweep_runner.iter_sweep, run on `workers` processes; the logs of the
+    cells are written in n order, checkpointed every `checkpoint_seconds` (see SweepCheckpoint).
+    With `resume`, an interrupted run is resumed from its checkpoint, appending to its outputs.
+    Every round is also written as a typed record next to the log (see results_store).
+    With a `cache_path`, the HH results are memoized in that SQLite file (see HHResultCache)
+    and the hit rate is printed at the end.
+    With `profile`, every Havel-Hakimi run prints its phase times and counters (see HHProfiler).
+    """
     # Uncomment for Barabasi-Albert graphs (p_range is the range of m in this case)
     # p_range = range(2, 11)
     if seed is not None:
@@ -65,20 +156,41 @@ def run_experiment(
     StrategyClass = NaiveMatchingAwareStrategy if use_naive_strategy else MatchingAwareStrategy
     ensure_dir(base_dir)
     degseq_log_filename = os.path.join(base_dir, degseq_log_filename)
-    with open(degseq_log_filename, "w") as degseq_log:
-        degseq_log.write("Experiment started at {}\n\n".format(datetime.now()))
-        for n in n_range:
-            for p in p_range:
-                if p >= n: # for Barabasi-Albert graph (m < n)
-                    continue
-                run_rounds_for_np_general(StrategyClass, n, p, rounds, degseq_log, seed=seed)
+    checkpoint = SweepCheckpoint(checkpoint_path_for(degseq_log_filename), {
+        "n_range": list(n_range), "p_range": [float(p) for p in p_range], "rounds": rounds, "seed": seed,
+        "strategy": StrategyClass.__name__, "coupled": coupled,
+    }, every_seconds=checkpoint_seconds)
+    resumed = resume and checkpoint.load()
+    if checkpoint.complete:
+        print(f"{degseq_log_filename} is complete, nothing to resume.")
+        return
+    mode = "a" if resumed else "w"
+    with open(degseq_log_filename, mode) as degseq_log, ResultWriter(records_dir_for(degseq_log_filename), mode=mode) as record_writer:
+        if not resumed:
+            degseq_log.write("Experiment started at {}\n\n".format(datetime.now()))
+        checkpoint.state.setdefault("cache_counts", [0, 0, 0])
+        checkpoint.track([degseq_log], [record_writer])
+        cells = [(StrategyClass, n, list(p_range), rounds, coupled, seed, cache_path, profile) for n in n_range]
+        for cell_log, records, cell_cache_counts in iter_sweep(run_cell, cells, workers=workers, seed=seed,
+                                                               start=checkpoint.cells_done):
+            degseq_log.write(cell_log)
+            record_writer.write(records)
+            if cell_cache_counts is not None:
+                checkpoint.state["cache_counts"] = [total + count for total, count in zip(checkpoint.state["cache_counts"], cell_cache_counts)]
+            checkpoint.cell_done()
         degseq_log.write("\nExperiment ended at {}".format(datetime.now()))
+        checkpoint.finish()
+    if cache_path is not None and not profile:
+        print(cache_summary(checkpoint.state["cache_counts"]))
 
 
 if __name__ == "__main__":
+    args = sweep_arg_parser("Matching-aware Havel-Hakimi on G(n, p) random graphs").parse_args()
+
     # Generate n random seeds
     n = 5
-    SEEDS = [random.randint(0, 10000) for _ in range(n)]
+    # Saved, so that --resume runs the same seeds again
+    SEEDS = sweep_seeds("experiment_results/matching_aware_general/seeds.json", n, resume=args.resume)
     # SEEDS = [2045, 1342, 7021, 6293, 9540]  # np.linspace(0.01, 0.26, 5)
     # SEEDS = [8423, 4576, 3081, 8468, 794]  # np.linspace(0.002, 0.02, 5)
     # SEEDS = [7298, 1237, 4039, 1549, 1637]  # np.linspace(0.3, 0.5, 4)
@@ -88,9 +200,12 @@ if __name__ == "__main__":
     # SEEDS = [4231, 9729, 7418, 4317, 4094]  # n_range=range(102, 301, 6), np.linspace(0.002, 0.02, 5)
 
     use_naive_strategy = False  # Set to True to use NaiveMatchingAwareStrategy
+    coupled = False  # Set to True to derive the graphs of all p of a round from one draw
+    cache_path = "experiment_results/hh_cache.sqlite"  # Set to None to run every sequence again
 
     for seed in SEEDS:
         print(f"Running experiment with seed: {seed}")
         random.seed(seed)
         np.random.seed(seed)
-        run_experiment(use_naive_strategy=use_naive_strategy, seed=seed)
+        run_experiment(use_naive_strategy=use_naive_strategy, seed=seed, coupled=coupled, workers=args.workers,
+                       cache_path=cache_path, profile=args.profile, resume=args.resume)
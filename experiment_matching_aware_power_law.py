@@ -1,35 +1,63 @@
+import io
 import os
 import numpy as np
 from datetime import datetime
 import random
-from havel_hakimi_algorithm import havel_hakimi_general
+import time
+from havel_hakimi_algorithm import havel_hakimi_batch, havel_hakimi_general
+from hh_profiler import HHProfiler
 from strategies.matching_aware_strategy import MatchingAwareStrategy
 from strategies.naive_matching_aware_strategy import NaiveMatchingAwareStrategy
 from graph_utils import check_legal_matching, degree_sequence_repr, maximum_matching_size_numpy, generate_power_law_degree_sequence
+from results_store import ResultBuffer, ResultWriter, records_dir_for
+from sweep_runner import SweepCheckpoint, checkpoint_path_for, iter_sweep, sweep_arg_parser, sweep_seeds
 from utils import ensure_dir
 
 
-def run_rounds_for_np_general(StrategyClass, n, p, rounds, degseq_log, seed=None) -> int:
+def run_profiled_round(StrategyClass, degrees, label):
+    """
+    Run one sequence with an HHProfiler and print its summary.
+    Returns (is_graphical, seconds, matching edges), like a round of havel_hakimi_batch.
+    """
+    strategy = StrategyClass(degrees=degrees)
+    strategy.profiler = HHProfiler()
+    start_time = time.perf_counter()
+    is_graphical, __ = havel_hakimi_general(degrees, strategy=strategy, precheck=True)
+    elapsed = time.perf_counter() - start_time
+    print(strategy.profiler.summary_line(label))
+    return is_graphical, elapsed, strategy.get_matching_edges() if is_graphical else None
+
+def run_rounds_for_np_general(StrategyClass, n, p, rounds, degseq_log, seed=None, records=None, profile=False) -> int:
+    """
+    Run the rounds of one (n, exponent) pair. Their sequences are realized in one
+    havel_hakimi_batch call, or one by one with `profile`, which instruments every run.
+    """
     graphical_sequences_count = 0
     degseq_log.write("n,p,round,degree_sequence,matching_size\n")
-    for round_idx in range(1, rounds + 1):
-        seed_i = seed + round_idx if seed is not None else None
-        degrees = generate_power_law_degree_sequence(n, p, seed_i)
-        deg_seq_str = degree_sequence_repr(degrees)
-        strategy = StrategyClass(degrees=degrees)
-
-        is_graphical, __ = havel_hakimi_general(degrees, strategy=strategy)
+    sequences = [generate_power_law_degree_sequence(n, p, seed + round_idx if seed is not None else None)
+                 for round_idx in range(1, rounds + 1)]
+    if profile:
+        outcomes = [run_profiled_round(StrategyClass, degrees, f"n={n}, a={p:.2f}, round={round_idx}")
+                    for round_idx, degrees in enumerate(sequences, start=1)]
+    else:
+        batch = havel_hakimi_batch(sequences, StrategyClass, precheck=True, store_edges=False, store_matchings=True)
+        outcomes = [(batch.is_graphical[index], batch.seconds[index], batch.matching_of(index).tolist())
+                    for index in range(rounds)]
+    for round_idx, (degrees, (is_graphical, elapsed, hh_matching)) in enumerate(zip(sequences, outcomes), start=1):
         if not is_graphical:
-            # degseq_log.write(f"{n},{p:.4f},{round_idx},'not graphical'\n")
+            # degseq_log.write(f"{n},{p:.4f},{round_idx},'not graphical: {strategy.rejection_reason}'\n")
             # print(f"Round {round_idx}, n={n}, Degree sequenceis not graphical, skipping...")
             continue
+        deg_seq_str = degree_sequence_repr(degrees)
         graphical_sequences_count += 1
-        hh_matching = strategy.get_matching_edges()
         msize = len(hh_matching) if hh_matching else 0
-        if use_naive_strategy:
+        if StrategyClass is NaiveMatchingAwareStrategy:
             assert check_legal_matching(hh_matching), "Naive strategy produced an illegal matching!"
 
         max_deg_seq_matching_size = maximum_matching_size_numpy(degrees)
+        if records is not None:
+            records.append(n=n, p=p, seed=seed, round=round_idx, matching_size=msize,
+                           matching_bound=max_deg_seq_matching_size, seconds=elapsed)
 
         if len(deg_seq_str) == 0:
             degseq_log.write(f"{n},{p:.4f},{round_idx},'no deg sequence'\n")
@@ -39,6 +67,24 @@ def run_rounds_for_np_general(StrategyClass, n, p, rounds, degseq_log, seed=None
             degseq_log.write(f"MAX-deg matching size:      {max_deg_seq_matching_size}, {msize == max_deg_seq_matching_size}\n") #    ---> success: {msize >= len(matching)},{max_deg_seq_matching_size - msize} \n")
     return graphical_sequences_count
 
+def run_cell(StrategyClass, n, a_range, rounds, seed=None, profile=False, seed_sequence=None):
+    """
+    Run all the exponents of one n. Returns its part of the degree sequence log, the number
+    of graphical sequences and the records of the graphical rounds (a ResultBuffer).
+    The rounds keep their `seed + round_idx` seeds; without a seed, the base seed is drawn
+    from the cell's stream (see sweep_runner.run_sweep).
+    With `profile`, the HHProfiler summary of every round is printed.
+    """
+    if seed is None and seed_sequence is not None:
+        seed = int(seed_sequence.generate_state(1)[0])
+    degseq_log = io.StringIO()
+    records = ResultBuffer()
+    graphical_sequences_count = 0
+    for a in a_range:
+        graphical_sequences_count += run_rounds_for_np_general(StrategyClass, n, a, rounds, degseq_log, seed=seed,
+                                                               records=records, profile=profile)
+    return degseq_log.getvalue(), graphical_sequences_count, records
+
 def run_experiment(
     # n_range=range(4, 101, 2),
     n_range=range(102, 301, 6),
@@ -47,28 +93,57 @@ def run_experiment(
     base_dir="experiment_results/power_law_degree_sequences",
     degseq_log_filename="pl_degseq_matching_log.txt",
     use_naive_strategy=False,
-    seed=None
+    seed=None,
+    workers=1,
+    profile=False,
+    resume=False,
+    checkpoint_seconds=60.0
     ):
+    """
+    Run the sweep over n_range x a_range. Every n is a cell of sweep_runner.iter_sweep, run on
+    `workers` processes, and the log is written in n order, checkpointed every `checkpoint_seconds`
+    (see SweepCheckpoint). With `resume`, an interrupted run is resumed from its checkpoint.
+    """
     if seed is not None:
         degseq_log_filename = f"pl_degseq_matching_log_naive_s{seed}.txt" if use_naive_strategy else f"pl_degseq_matching_log_s{seed}.txt"
     StrategyClass = NaiveMatchingAwareStrategy if use_naive_strategy else MatchingAwareStrategy
     ensure_dir(base_dir)
     degseq_log_filename = os.path.join(base_dir, degseq_log_filename)
-    graphical_sequences_count = 0
-    with open(degseq_log_filename, "w") as degseq_log:
-        degseq_log.write("Experiment started at {}\n\n".format(datetime.now()))
-        for n in n_range:
-            for a in a_range:
-                graphical_sequences_count += run_rounds_for_np_general(StrategyClass, n, a, rounds, degseq_log, seed=seed)
+    checkpoint = SweepCheckpoint(checkpoint_path_for(degseq_log_filename), {
+        "n_range": list(n_range), "a_range": list(a_range), "rounds": rounds, "seed": seed,
+        "strategy": StrategyClass.__name__,
+    }, every_seconds=checkpoint_seconds)
+    resumed = resume and checkpoint.load()
+    if checkpoint.complete:
+        print(f"{degseq_log_filename} is complete, nothing to resume.")
+        return
+    mode = "a" if resumed else "w"
+    with open(degseq_log_filename, mode) as degseq_log, ResultWriter(records_dir_for(degseq_log_filename), mode=mode) as record_writer:
+        if not resumed:
+            degseq_log.write("Experiment started at {}\n\n".format(datetime.now()))
+        checkpoint.state.setdefault("graphical_sequences_count", 0)
+        checkpoint.track([degseq_log], [record_writer])
+        cells = [(StrategyClass, n, list(a_range), rounds, seed, profile) for n in n_range]
+        for cell_log, cell_count, records in iter_sweep(run_cell, cells, workers=workers, seed=seed,
+                                                        start=checkpoint.cells_done):
+            degseq_log.write(cell_log)
+            record_writer.write(records)
+            checkpoint.state["graphical_sequences_count"] += cell_count
+            checkpoint.cell_done()
+        graphical_sequences_count = checkpoint.state["graphical_sequences_count"]
         total_rounds = len(n_range) * len(a_range) * rounds
         print(f"Total graphical sequences found: {graphical_sequences_count} out of {total_rounds} rounds. ({graphical_sequences_count / total_rounds:.2%})")
         degseq_log.write("\nExperiment ended at {}".format(datetime.now()))
+        checkpoint.finish()
 
 
 if __name__ == "__main__":
+    args = sweep_arg_parser("Matching-aware Havel-Hakimi on power-law degree sequences").parse_args()
+
     # Generate n random seeds
     n = 5
-    SEEDS = [random.randint(0, 10000) for _ in range(n)]
+    # Saved, so that --resume runs the same seeds again
+    SEEDS = sweep_seeds("experiment_results/power_law_degree_sequences/seeds.json", n, resume=args.resume)
     # SEEDS = [4983, 228, 1064, 532, 658]  # n_range=range(4, 101, 2), a_range=[1.8, 1.9, 2, 2.1, 2.3]
     # SEEDS = [1407, 7356, 8529, 4830, 2161]  # n_range=range(102, 301, 6), a_range=[1.8, 1.9, 2, 2.1, 2.3]
 
@@ -78,4 +153,5 @@ if __name__ == "__main__":
         print(f"Running experiment with seed: {seed}")
         random.seed(seed)
         np.random.seed(seed)
-        run_experiment(use_naive_strategy=use_naive_strategy, seed=seed)
+        run_experiment(use_naive_strategy=use_naive_strategy, seed=seed, workers=args.workers, profile=args.profile,
+                       resume=args.resume)
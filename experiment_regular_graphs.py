@@ -1,51 +1,128 @@
 import os
+import time
 from datetime import datetime
+from graph_utils import check_legal_matching
 from havel_hakimi_algorithm import havel_hakimi_general
+from hh_cache import HHResultCache, cache_summary
+from hh_profiler import HHProfiler
 from strategies.matching_aware_strategy import MatchingAwareStrategy
 from strategies.naive_matching_aware_strategy import NaiveMatchingAwareStrategy
+from results_store import ResultBuffer, ResultWriter, records_dir_for
+from sweep_runner import SweepCheckpoint, checkpoint_path_for, iter_sweep, sweep_arg_parser
 from utils import ensure_dir
 
 
+def run_cell(StrategyClass, d, n_max, cache_path=None, profile=False, seed_sequence=None):
+    """
+    Run every n for one degree d and return the log lines, their records (a ResultBuffer)
+    and the (hits, memory_hits, misses) counters of the HH result cache at `cache_path` (None if no cache).
+    The sequences are deterministic, so the cell's stream is not used.
+    With `profile`, every sequence is run again with an HHProfiler, whose summary is printed,
+    so the cache is not used.
+    """
+    lines = []
+    records = ResultBuffer()
+    cache = HHResultCache(cache_path) if cache_path is not None and not profile else None
+    for n in range(d + 1, n_max + 1):  # we must have n >= d+1
+        if (d * n) % 2 != 0:  # make sure that the sum of degrees is even
+            continue
+        degrees = [d] * n
+        if cache is not None:
+            result = cache.run(degrees, StrategyClass, deg_seq_str=f"[{d}] *{n}")
+            is_graphical, matching_size = result.is_graphical, result.matching_size
+            # Both None on a hit: the matching was checked when the sequence was run, and a lookup
+            # is not timed as a realization
+            hh_matching, elapsed = result.matching_edges, result.seconds
+        else:
+            strategy = StrategyClass(degrees=degrees)
+            if profile:
+                strategy.profiler = HHProfiler()
+            start_time = time.perf_counter()
+            is_graphical, hh_edges = havel_hakimi_general(degrees, strategy=strategy)
+            elapsed = time.perf_counter() - start_time
+            if profile:
+                print(strategy.profiler.summary_line(f"d={d}, n={n}"))
+            hh_matching = strategy.get_matching_edges() if is_graphical else None
+            matching_size = len(hh_matching) if hh_matching else 0
+        if StrategyClass is NaiveMatchingAwareStrategy and hh_matching is not None:
+            assert check_legal_matching(hh_matching), "Naive strategy produced an illegal matching!"
+        if not is_graphical:
+            print(f"Skipping d={d}, n={n} as it is not graphical.")
+            continue
+        is_perfect_matching = (matching_size == n // 2)
+
+        lines.append(f"{d},{n},{matching_size},{is_perfect_matching}\n")
+        records.append(n=n, p=d, matching_size=matching_size, seconds=elapsed)
+    if cache is None:
+        return lines, records, None
+    cache.close()
+    return lines, records, cache.counts()
+
 def run_regular_graph_experiment(
     d_range=range(1, 70),
     n_max=500,
     log_filename="regular_graph_experiment_log.txt",
     base_dir="regular_graph_experiment_results",
-    use_naive_strategy=False
+    use_naive_strategy=False,
+    workers=1,
+    cache_path=None,
+    profile=False,
+    resume=False,
+    checkpoint_seconds=60.0
 ):
+    """
+    Run every d-regular sequence with d in d_range and n up to n_max. Every d is a cell of
+    sweep_runner.iter_sweep, run on `workers` processes, and the lines are written in d order.
+    Every line is also written as a typed record, with d in the `p` column (see results_store).
+    With a `cache_path`, the HH results are memoized in that SQLite file (see HHResultCache)
+    and the hit rate is printed at the end.
+    With `profile`, every Havel-Hakimi run prints its phase times and counters (see HHProfiler).
+    The progress is checkpointed next to the log every `checkpoint_seconds` (see SweepCheckpoint).
+    With `resume`, an interrupted run is resumed from its checkpoint, appending to its outputs.
+    """
     StrategyClass = NaiveMatchingAwareStrategy if use_naive_strategy else MatchingAwareStrategy
     if use_naive_strategy:
         log_filename = "regular_graph_experiment_log_naive.txt"
 
     ensure_dir(base_dir)
     log_path = os.path.join(base_dir, log_filename)
-    with open(log_path, "w") as log_file:
-        log_file.write(f"Regular Graph Experiment started at {datetime.now()}\n\n")
-        log_file.write("d,n,matching_size,is_perfect_matching\n")
-
-        for d in d_range:
-            for n in range(d + 1, n_max + 1):  # we must have n >= d+1
-                if (d * n) % 2 != 0:  # make sure that the sum of degrees is even
-                    continue
-                degrees = [d] * n
-                strategy = StrategyClass(degrees=degrees)
-                is_graphical, hh_edges = havel_hakimi_general(degrees, strategy=strategy)
-                if not is_graphical:
-                    print(f"Skipping d={d}, n={n} as it is not graphical.")
-                    continue
-                hh_matching = strategy.get_matching_edges()
-                matching_size = len(hh_matching) if hh_matching else 0
-                is_perfect_matching = (matching_size == n // 2)
-
-                log_file.write(f"{d},{n},{matching_size},{is_perfect_matching}\n")
+    checkpoint = SweepCheckpoint(checkpoint_path_for(log_path), {
+        "d_range": list(d_range), "n_max": n_max, "strategy": StrategyClass.__name__,
+    }, every_seconds=checkpoint_seconds)
+    resumed = resume and checkpoint.load()
+    if checkpoint.complete:
+        print(f"{log_path} is complete, nothing to resume.")
+        return
+    mode = "a" if resumed else "w"
+    with open(log_path, mode) as log_file, ResultWriter(records_dir_for(log_path), mode=mode) as record_writer:
+        if not resumed:
+            log_file.write(f"Regular Graph Experiment started at {datetime.now()}\n\n")
+            log_file.write("d,n,matching_size,is_perfect_matching\n")
+        checkpoint.state.setdefault("cache_counts", [0, 0, 0])
+        checkpoint.track([log_file], [record_writer])
+
+        cells = [(StrategyClass, d, n_max, cache_path, profile) for d in d_range]
+        for lines, records, cell_cache_counts in iter_sweep(run_cell, cells, workers=workers, start=checkpoint.cells_done):
+            log_file.writelines(lines)
+            record_writer.write(records)
+            if cell_cache_counts is not None:
+                checkpoint.state["cache_counts"] = [total + count for total, count in zip(checkpoint.state["cache_counts"], cell_cache_counts)]
+            checkpoint.cell_done()
 
         log_file.write(f"\nRegular Graph Experiment ended at {datetime.now()}")
+        checkpoint.finish()
+    if cache_path is not None and not profile:
+        print(cache_summary(checkpoint.state["cache_counts"]))
 
 
 if __name__ == "__main__":
+    args = sweep_arg_parser("Matching-aware Havel-Hakimi on regular degree sequences").parse_args()
+
     # SEED = 42
     # import random
     # random.seed(SEED)
 
     use_naive_strategy = False  # Set to True to use NaiveMatchingAwareStrategy
-    run_regular_graph_experiment(use_naive_strategy=use_naive_strategy)
+    cache_path = "regular_graph_experiment_results/hh_cache.sqlite"  # Set to None to run every sequence again
+    run_regular_graph_experiment(use_naive_strategy=use_naive_strategy, workers=args.workers, cache_path=cache_path,
+                                 profile=args.profile, resume=args.resume)
@@ -1,9 +1,21 @@
+import argparse
 import re
 import os
 import glob
+import json
+
+import numpy as np
+
+from results_store import load_results, records_dir_for
+from sweep_runner import run_sweep
 
 
 def find_approximation_of_experiments(input_file, output_file):
+    """
+    Write the minimum matching size and approximation ratio of every (n, p) of an experiment log.
+    Returns the minima as (n, p, min) tuples, with p as written in the report.
+    """
+    minima = []
     with open(input_file, 'r') as infile, open(output_file, 'w') as outfile:
         min_approx_ratio = 1  # Initialize to 1 since approx_ratio is between 0 and 1
         previous_line = None
@@ -22,9 +34,120 @@ def find_approximation_of_experiments(input_file, output_file):
                 assert 0 <= approx_ratio <= 1, f"Invalid approx_ratio: {approx_ratio}"  # Ensure valid range
                 min_approx_ratio = min(min_approx_ratio, approx_ratio)  # Update minimum
                 outfile.write(f"n={n}, p={p}, min={min_value}, approx_ratio={approx_ratio:.4f}\n")
+                minima.append((int(n), p, min_value))
                 previous_line = None  # Reset after processing
 
         outfile.write(f"\nMinimum approx_ratio: {min_approx_ratio:.4f}\n")
+    return minima
+
+
+def find_approximation_from_records(records_dir, output_file):
+    """
+    Same report as find_approximation_of_experiments, computed from the typed records of an
+    experiment (see results_store) with a few array operations instead of parsing its log.
+    """
+    records = load_results(records_dir, columns=["n", "p", "matching_size"])
+    n, p, matching_size = records["n"], records["p"], records["matching_size"]
+    # Group the rounds by (n, p), keeping the groups in the order the experiment ran them
+    keys = np.rec.fromarrays([n, p])
+    _, first_index, group = np.unique(keys, return_index=True, return_inverse=True)
+    order = np.argsort(first_index)
+    min_values = np.full(len(first_index), np.iinfo(matching_size.dtype).max, dtype=matching_size.dtype)
+    np.minimum.at(min_values, group.ravel(), matching_size)
+    group_n, group_p, min_values = n[first_index[order]], p[first_index[order]], min_values[order]
+    approx_ratios = min_values / (group_n / 2)
+    assert np.all((0 <= approx_ratios) & (approx_ratios <= 1)), f"Invalid approx_ratio: {approx_ratios}"
+
+    with open(output_file, 'w') as outfile:
+        for n_value, p_value, min_value, approx_ratio in zip(group_n.tolist(), group_p.tolist(), min_values.tolist(), approx_ratios.tolist()):
+            outfile.write(f"n={n_value}, p={p_value:.2f}, min={min_value}, approx_ratio={approx_ratio:.4f}\n")
+        min_approx_ratio = min(1, approx_ratios.min()) if len(approx_ratios) else 1
+        outfile.write(f"\nMinimum approx_ratio: {min_approx_ratio:.4f}\n")
+    return [(n_value, f"{p_value:.2f}", min_value)
+            for n_value, p_value, min_value in zip(group_n.tolist(), group_p.tolist(), min_values.tolist())]
+
+
+def process_experiment(log_file, output_file, seed_sequence=None):
+    """
+    Write the report of one experiment, from its records if it has them, otherwise from its log.
+    Returns its (n, p, min) minima. `seed_sequence` is passed by run_sweep and not used.
+    """
+    records_dir = records_dir_for(log_file)
+    if os.path.isdir(records_dir):
+        print(f"Processing {records_dir} -> {output_file}")
+        return find_approximation_from_records(records_dir, output_file)
+    print(f"Processing {log_file} -> {output_file}")
+    return find_approximation_of_experiments(log_file, output_file)
+
+
+def _file_signature(log_file):
+    """The size and mtime of a log and of its record chunks, which change whenever the experiment is rerun."""
+    paths = [log_file] + sorted(glob.glob(os.path.join(records_dir_for(log_file), "*.npz")))
+    signature = []
+    for path in paths:
+        stat = os.stat(path)
+        signature.append([os.path.basename(path), stat.st_size, stat.st_mtime_ns])
+    return signature
+
+
+def aggregate_experiments(experiment_dir, pattern="experiment_log_*s*.txt", workers=1,
+                          manifest_filename="approx_ratios_manifest.json",
+                          summary_filename="experiments_approx_ratios_summary.txt"):
+    """
+    Write the report of every experiment log in `experiment_dir` and one merged summary.
+
+    The manifest keeps the size and mtime of every log (and of its records) with the minima found
+    in it, so a log that has not changed since the last run, and whose report still exists, is not
+    read again. The other logs are processed on `workers` processes. The summary holds the
+    minimum over all logs of every (n, p) and the global minimum approximation ratio.
+
+    Returns:
+        float: The global minimum approximation ratio.
+    """
+    manifest_path = os.path.join(experiment_dir, manifest_filename)
+    manifest = dict()
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as manifest_file:
+            manifest = json.load(manifest_file)
+
+    log_files = sorted(glob.glob(os.path.join(experiment_dir, pattern)))
+    entries = dict()
+    pending = []
+    for log_file in log_files:
+        base_name = os.path.basename(log_file).replace("experiment_log", "experiments_approx_ratios")
+        output_file = os.path.join(experiment_dir, base_name)
+        signature = _file_signature(log_file)
+        entry = manifest.get(log_file)
+        if entry is not None and entry["signature"] == signature and os.path.exists(output_file):
+            entries[log_file] = entry
+        else:
+            pending.append((log_file, output_file, signature))
+    print(f"{len(pending)} of {len(log_files)} experiment logs changed since the last run")
+
+    results = run_sweep(process_experiment, [(log_file, output_file) for log_file, output_file, _ in pending], workers=workers)
+    for (log_file, _, signature), minima in zip(pending, results):
+        entries[log_file] = {"signature": signature, "minima": [list(minimum) for minimum in minima]}
+
+    # Logs that were deleted drop out of the manifest
+    temp_path = manifest_path + ".tmp"
+    with open(temp_path, "w") as manifest_file:
+        json.dump(entries, manifest_file)
+    os.replace(temp_path, manifest_path)
+
+    merged = dict()
+    for entry in entries.values():
+        for n, p, min_value in entry["minima"]:
+            key = (n, p)
+            merged[key] = min(merged.get(key, min_value), min_value)
+    min_approx_ratio = 1
+    with open(os.path.join(experiment_dir, summary_filename), "w") as outfile:
+        outfile.write(f"Experiments: {len(entries)}\n\n")
+        for (n, p), min_value in sorted(merged.items(), key=lambda item: (item[0][0], float(item[0][1]))):
+            approx_ratio = min_value / (n / 2)
+            min_approx_ratio = min(min_approx_ratio, approx_ratio)
+            outfile.write(f"n={n}, p={p}, min={min_value}, approx_ratio={approx_ratio:.4f}\n")
+        outfile.write(f"\nMinimum approx_ratio: {min_approx_ratio:.4f}\n")
+    return min_approx_ratio
 
 
 if __name__ == "__main__":
@@ -40,14 +163,13 @@ if __name__ == "__main__":
     # output_filepath = args.output_filepath
     # find_approximation_of_experiments(input_filepath, output_filepath)
 
+    parser = argparse.ArgumentParser(description="Find the minimum approximation ratio of the experiment logs.")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Number of worker processes reading the logs (default: 1, 0 for all CPUs)")
+    args = parser.parse_args()
+
     experiment_dir = "experiment_results"  # Directory for both input and output files
 
-    # Find all files matching the pattern "experiment_log_s*.txt"
-    log_files = glob.glob(os.path.join(experiment_dir, "experiment_log_*s*.txt"))
-    
-    for log_file in log_files:
-        base_name = os.path.basename(log_file).replace("experiment_log", "experiments_approx_ratios")
-        output_file = os.path.join(experiment_dir, base_name)
-        
-        print(f"Processing {log_file} -> {output_file}")
-        find_approximation_of_experiments(log_file, output_file)
+    # Process the files matching the pattern "experiment_log_*s*.txt" that changed since the last run
+    min_approx_ratio = aggregate_experiments(experiment_dir, workers=args.workers)
+    print(f"Minimum approx_ratio over all experiments: {min_approx_ratio:.4f}")
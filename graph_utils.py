@@ -1,74 +1,202 @@
-from typing import List, Tuple
-import random
+from typing import List, Optional, Tuple
 import re
-from collections import defaultdict
-from math import floor
+from itertools import chain
 import numpy as np
 from rustworkx import PyGraph
 
-def generate_graph_with_perfect_matching(n, p=0.1):
+def generate_graph_with_perfect_matching(n, p=0.1, rng: Optional[np.random.Generator] = None):
     """
     Generate a random undirected graph with n vertices (even), 
     containing a perfect matching and additional edges with probability p.
-    Returns a tuple: (edges, matching).
+    Returns a tuple: (edges, matching), both as (m, 2) int64 arrays with u < v in every edge row.
+
+    The extra edges are drawn with geometric skips over the n(n-1)/2 vertex pairs
+    (Batagelj and Brandes), so the running time is O(n + m) instead of O(n^2),
+    and the planted matching is merged in without duplicates.
+
+    Args:
+        n (int): Number of vertices (must be even).
+        p (float, optional): Probability of every other edge. Defaults to 0.1.
+        rng (np.random.Generator, optional): Source of randomness, for reproducible graphs.
+            Defaults to a fresh default_rng().
     """
     if n % 2 != 0:
         raise ValueError("n must be even for a perfect matching.")
-    vertices = list(range(n))
-    random.shuffle(vertices)
-    matching = [(vertices[i], vertices[i+1]) for i in range(0, n, 2)]
-    edge_set = set(tuple(sorted(edge)) for edge in matching)
-    # Add other possible edges with probability p
-    for i in range(n):
-        for j in range(i+1, n):
-            edge = (i, j)
-            if edge not in edge_set and random.random() < p:
-                edge_set.add(edge)
-    edges = list(edge_set)
+    if rng is None:
+        rng = np.random.default_rng()
+    vertices = rng.permutation(n)
+    matching = vertices.reshape(-1, 2)
+    matching_pairs = np.sort(matching, axis=1)
+
+    pair_indices = _sample_pair_indices(n * (n - 1) // 2, p, rng)
+    # Drop the pairs that are already in the matching
+    matching_indices = _pair_index(matching_pairs[:, 0], matching_pairs[:, 1])
+    pair_indices = pair_indices[~np.isin(pair_indices, matching_indices)]
+    u, v = _pair_from_index(pair_indices)
+    edges = np.concatenate((matching_pairs, np.column_stack((u, v))))
     return edges, matching
 
+def generate_coupled_graphs(n, p_values, rng: Optional[np.random.Generator] = None, perfect_matching=False):
+    """
+    Random graphs G(n, p) for every p in p_values at once, coupled through one uniform weight
+    per vertex pair: the graph for p holds the pairs whose weight is below p, so the graphs
+    grow as p grows and a sweep over p compares the same underlying draw.
+    Only the pairs with weight below max(p_values) are drawn (with geometric skips), and
+    their weights are uniform below that maximum, which gives the same distribution.
+
+    Args:
+        n (int): Number of vertices.
+        p_values (list[float]): The edge probabilities.
+        rng (np.random.Generator, optional): Source of randomness. Defaults to a fresh default_rng().
+        perfect_matching (bool, optional): Plant a random perfect matching in every graph, as
+            generate_graph_with_perfect_matching does (n must be even). Defaults to False.
+
+    Returns:
+        tuple: (edge arrays aligned with p_values, matching array or None). All the edge arrays are
+            prefixes (views) of one array sorted by weight, with the matching first, so
+            prefix_degree_sequences can compute their degree sequences incrementally.
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    p_max = min(max(p_values), 1.0) if len(p_values) else 0.0
+    pair_indices = _sample_pair_indices(n * (n - 1) // 2, p_max, rng)
+    matching = None
+    matching_pairs = np.empty((0, 2), dtype=np.int64)
+    if perfect_matching:
+        if n % 2 != 0:
+            raise ValueError("n must be even for a perfect matching.")
+        matching = rng.permutation(n).reshape(-1, 2)
+        matching_pairs = np.sort(matching, axis=1)
+        pair_indices = pair_indices[~np.isin(pair_indices, _pair_index(matching_pairs[:, 0], matching_pairs[:, 1]))]
+
+    weights = rng.random(len(pair_indices)) * p_max
+    order = np.argsort(weights)
+    u, v = _pair_from_index(pair_indices[order])
+    edges = np.concatenate((matching_pairs, np.column_stack((u, v))))
+    cuts = len(matching_pairs) + np.searchsorted(weights[order], p_values, side="left")
+    return [edges[:cut] for cut in cuts], matching
+
+def prefix_degree_sequences(edge_prefixes: List[np.ndarray]) -> List[List[int]]:
+    """
+    Degree sequences (as returned by degree_sequence) of edge arrays that are all prefixes of the
+    longest one, such as those of generate_coupled_graphs. The degrees are accumulated from the
+    shortest prefix up, so every edge is counted once.
+    """
+    sequences = [None] * len(edge_prefixes)
+    counts = np.zeros(0, dtype=np.int64)
+    counted = 0
+    for i in sorted(range(len(edge_prefixes)), key=lambda i: len(edge_prefixes[i])):
+        new_endpoints = edge_prefixes[i][counted:].reshape(-1)
+        if new_endpoints.size > 0:
+            new_counts = np.bincount(new_endpoints)
+            if len(new_counts) > len(counts):
+                counts = np.concatenate((counts, np.zeros(len(new_counts) - len(counts), dtype=np.int64)))
+            counts[:len(new_counts)] += new_counts
+        counted = len(edge_prefixes[i])
+        sequences[i] = np.sort(counts[counts > 0])[::-1].tolist()
+    return sequences
+
+def _sample_pair_indices(pair_count, p, rng):
+    """
+    Indices of the pairs (out of pair_count) kept independently with probability p, in increasing order.
+    The gaps between kept pairs are geometric, so only the kept pairs are drawn.
+    """
+    if p <= 0 or pair_count == 0:
+        return np.empty(0, dtype=np.int64)
+    if p >= 1:
+        return np.arange(pair_count, dtype=np.int64)
+    expected = pair_count * p
+    positions = []
+    last = -1
+    while last < pair_count - 1:
+        batch = int(expected + 5 * np.sqrt(expected) + 16)
+        batch_positions = last + np.cumsum(rng.geometric(p, size=batch))
+        positions.append(batch_positions)
+        last = batch_positions[-1]
+    positions = np.concatenate(positions)
+    return positions[positions < pair_count]
+
+def _pair_index(u, v):
+    """Index of the pair (u, v), u < v, in the order (0,1), (0,2), (1,2), (0,3), ... (by v, then u)."""
+    return v * (v - 1) // 2 + u
+
+def _pair_from_index(index):
+    """Inverse of _pair_index: the pairs (u, v) with u < v at the given indices."""
+    v = ((1 + np.sqrt(1 + 8 * index.astype(np.float64))) // 2).astype(np.int64)
+    # Correct the floating point rounding of the square root
+    v -= v * (v - 1) // 2 > index
+    v += (v + 1) * v // 2 <= index
+    return index - v * (v - 1) // 2, v
+
 def degree_sequence(graph):
     """
     Given a list of edges, return the degree sequence (sorted).
+    The edges can also be an (m, 2) array or the `edge_list()` of a rustworkx graph.
+    Only the nodes that appear in an edge are counted.
     """
-    degree_count = defaultdict(int)
-    for u, v in graph:
-        degree_count[u] += 1
-        degree_count[v] += 1
-    degrees = list(degree_count.values())
-    return sorted(degrees, reverse=True)
+    endpoints = _edge_endpoints(graph)
+    if endpoints.size == 0:
+        return []
+    if endpoints.min() >= 0 and endpoints.max() <= 4 * endpoints.size:
+        counts = np.bincount(endpoints)
+        counts = counts[counts > 0]
+    else:
+        # Sparse or negative IDs, count them without an array sized by the largest ID
+        _, counts = np.unique(endpoints, return_counts=True)
+    return np.sort(counts)[::-1].tolist()
+
+def degree_order(graph) -> np.ndarray:
+    """
+    The node IDs of the graph in the order of its degree_sequence: node `order[i]` has degree
+    `degree_sequence(graph)[i]`, ties by increasing ID. The realizations of that degree sequence
+    use the positions as node IDs, so `order[hh_edges]` puts them on the nodes of the graph.
+    """
+    nodes, counts = np.unique(_edge_endpoints(graph), return_counts=True)
+    return nodes[np.argsort(-counts, kind="stable")]
+
+def _edge_endpoints(edges) -> np.ndarray:
+    """
+    The endpoints of the edges as a flat int64 array (u1, v1, u2, v2, ...).
+    Arrays and rustworkx edge lists are viewed through the array protocol; lists of tuples
+    are read with fromiter, which avoids building a nested array first.
+    """
+    if isinstance(edges, (list, tuple)):
+        return np.fromiter(chain.from_iterable(edges), dtype=np.int64, count=2 * len(edges))
+    return np.asarray(edges).reshape(-1).astype(np.int64, copy=False)
 
 def degree_sequence_repr(degrees):
     """
     Given a sorted degree sequence, returns a string like "[d] * r" for each group of repeated degrees.
     Example: [4, 4, 3, 3, 3, 2] -> "[4] *2, [3] *3, [2] *1"
     """
-    if not degrees:
+    if len(degrees) == 0:
         return ""
-    result = []
-    prev = degrees[0]
-    count = 1
-    for d in degrees[1:]:
-        if d == prev:
-            count += 1
-        else:
-            result.append(f"[{prev}] *{count}")
-            prev = d
-            count = 1
-    result.append(f"[{prev}] *{count}")
-    return ", ".join(result)
-
-def parse_degree_sequence(input_str):
+    deg_array = np.fromiter(degrees, dtype=np.int64, count=len(degrees)) if isinstance(degrees, list) else np.asarray(degrees)
+    # Each group starts where the degree changes
+    starts = np.concatenate(([0], np.flatnonzero(deg_array[1:] != deg_array[:-1]) + 1))
+    counts = np.diff(np.append(starts, len(deg_array)))
+    return ", ".join(f"[{d}] *{c}" for d, c in zip(deg_array[starts].tolist(), counts.tolist()))
+
+def parse_degree_sequence(input_str, as_runs=False):
     """
     Parse a degree sequence from a string that can be either:
     - Comma-separated list of integers (e.g., "3,3,2,2,2,1")
     - Python-style list expression (e.g., "[3]*2 + [2]*3 + [1]")
+
+    Args:
+        input_str (str): The degree sequence.
+        as_runs (bool, optional): Return the sequence as (degree, count) runs of equal
+            consecutive degrees instead of expanding it, so "[3]*10000000" stays a single run.
+            Defaults to False.
+
+    Returns:
+        list[int] or list[tuple[int, int]]: The degrees, or their runs if `as_runs` is set.
     """
+    runs = []
     # Check if the input is in Python-style list expression format
     if '[' in input_str and '*' in input_str:
         # Create a safe evaluation of the expression
         # The pattern captures: [number], followed by * and another number, or + operator
-        result = []
         pattern = r'\[(\d+)\]\s*\*?\s*(\d*)'
         
         # Split by + sign
@@ -79,12 +207,28 @@ def parse_degree_sequence(input_str):
             if match:
                 value = int(match.group(1))
                 count = int(match.group(2)) if match.group(2) else 1
-                result.extend([value] * count)
-        
-        return result
+                _append_run(runs, value, count)
     else:
         # Handle standard comma-separated format
-        return [int(x) for x in input_str.split(",")]
+        for x in input_str.split(","):
+            _append_run(runs, int(x), 1)
+
+    if as_runs:
+        return runs
+    result = []
+    for value, count in runs:
+        result.extend([value] * count)
+    return result
+
+
+def _append_run(runs, value, count):
+    """Append `count` copies of `value` to a list of (value, count) runs, merging equal neighbors."""
+    if count <= 0:
+        return
+    if runs and runs[-1][0] == value:
+        runs[-1] = (value, runs[-1][1] + count)
+    else:
+        runs.append((value, count))
 
 
 def check_legal_matching(matching: List[Tuple[int, int]]):
@@ -103,15 +247,37 @@ def check_legal_matching(matching: List[Tuple[int, int]]):
         seen.add(v)
     return True
 
-def edges_to_rustworkx_graph(edges: List[Tuple[int, int]]) -> PyGraph:
+def edges_to_rustworkx_graph(edges: List[Tuple[int, int]], return_mapping: bool = False):
+    """
+    Build a rustworkx graph from a list of edges, an (m, 2) edge array (as returned by
+    havel_hakimi_general(..., as_array=True)) or a rustworkx edge list, in bulk.
+    The node IDs are compacted with vectorized NumPy operations, so the graph has one node per distinct ID,
+    in increasing ID order, holding the original ID as payload.
+
+    Args:
+        edges: The edges.
+        return_mapping (bool, optional): Also return the original ID of every graph node,
+            so results on the graph translate back with one indexing, e.g.
+            node_ids[np.array(list(matching))]. Defaults to False.
+
+    Returns:
+        PyGraph, or (PyGraph, np.ndarray) with `return_mapping`.
+    """
+    endpoints = _edge_endpoints(edges)
+    if endpoints.size > 0 and endpoints.min() >= 0 and endpoints.max() <= 4 * endpoints.size:
+        # Dense non-negative IDs (the usual case) are compacted with a presence table, without sorting
+        present = np.zeros(endpoints.max() + 1, dtype=bool)
+        present[endpoints] = True
+        node_ids = np.flatnonzero(present)
+        inverse = (np.cumsum(present) - 1)[endpoints]
+    else:
+        node_ids, inverse = np.unique(endpoints, return_inverse=True)
+    index_pairs = inverse.reshape(-1, 2)
     rw_graph = PyGraph()
-    node_map = {}
-    for u, v in edges:
-        if u not in node_map:
-            node_map[u] = rw_graph.add_node(u)
-        if v not in node_map:
-            node_map[v] = rw_graph.add_node(v)
-        rw_graph.add_edge(node_map[u], node_map[v], None)
+    rw_graph.add_nodes_from(node_ids.tolist())
+    rw_graph.add_edges_from_no_data(list(zip(index_pairs[:, 0].tolist(), index_pairs[:, 1].tolist())))
+    if return_mapping:
+        return rw_graph, node_ids
     return rw_graph
 
 def generate_power_law_degree_sequence(n: int, exponent: float, seed_i) -> List[int]:
@@ -121,86 +287,225 @@ def generate_power_law_degree_sequence(n: int, exponent: float, seed_i) -> List[
     rng = np.random.default_rng(seed=seed_i)
     return sorted(rng.zipf(exponent, n).tolist(), reverse=True)
 
+def erdos_gallai_check(degrees: List[int]) -> Tuple[bool, Optional[str]]:
+    """
+    Check if a degree sequence is graphical with the Erdős–Gallai theorem, in O(n log n).
+    For the sequence sorted in descending order, every k must satisfy
+        sum_{i<=k} d_i <= k(k-1) + sum_{i>k} min(d_i, k)
+    The right-hand side is computed for all k at once with prefix sums, using that the
+    d_i >= k form a prefix of the sorted sequence.
+
+    Returns:
+        (bool, str): True and None if the sequence is graphical, otherwise False and the reason
+        (e.g. "Erdős–Gallai inequality fails at k=3").
+    """
+    deg_array = np.sort(np.asarray(degrees, dtype=np.int64))[::-1]
+    n = len(deg_array)
+    if n == 0:
+        return True, None
+    if deg_array[-1] < 0:
+        return False, "negative degree"
+    if deg_array[0] >= n:
+        # Also keeps the sums below far from int64 overflow
+        return False, f"degree {deg_array[0]} is at least n={n}"
+    if deg_array.sum() % 2 != 0:
+        return False, "odd degree sum"
+
+    k = np.arange(1, n + 1)
+    prefix = np.concatenate(([0], np.cumsum(deg_array)))  # prefix[j] = d_1 + ... + d_j
+    # m_k = number of degrees >= k, found in the ascending copy of the sequence
+    at_least_k = n - np.searchsorted(deg_array[::-1], k, side="left")
+    split = np.maximum(k, at_least_k)
+    # The i > k with d_i >= k contribute k each, the remaining ones contribute d_i
+    rhs = k * (k - 1) + k * (split - k) + (prefix[n] - prefix[split])
+    failing = np.nonzero(prefix[1:] > rhs)[0]
+    if failing.size > 0:
+        return False, f"Erdős–Gallai inequality fails at k={failing[0] + 1}"
+    return True, None
+
 
 # ***************************************************************************
 #  Implementation of Theorem 2.13 and Theorem 2.14 from the paper
 # "New results on graph matching from degree preserving growth" (4/12/24) 
 # ***************************************************************************
 
-def maximal_matching_lower_bound(d):
-    n = len(d)
-    min_val = float('inf')
+class DegreeSequenceProfile:
+    def __init__(self, deg_seq: List[int]):
+        """
+        Precomputed view of a degree sequence, shared by maximal_matching_lower_bound, td and
+        maximum_matching_size_numpy so it is built once per sequence instead of once per call.
+
+        It holds the degrees, their ascending sorted copy (for value-range counts with
+        searchsorted) and the prefix sums. When the sequence is non-increasing, which is how
+        degree_sequence and generate_power_law_degree_sequence return it, the ties of a value
+        occupy one index range and are located in O(log n).
+        In the prefix sums, degrees above 2n^2 + 1 count as 2n^2 + 1: the matching conditions
+        never compare a sum against more than that, and it keeps the sums in int64.
+        """
+        self.degrees = np.asarray(deg_seq, dtype=np.int64)
+        self.n = n = len(self.degrees)
+        self.ascending = np.sort(self.degrees)
+        self.is_non_increasing = bool(np.all(self.degrees[:-1] >= self.degrees[1:]))
+        self.prefix = np.concatenate(([0], np.cumsum(np.minimum(self.degrees, 2 * n * n + 1))))  # prefix[k] = d_1 + ... + d_k
+        self._suffix_min_sums = None
+
+    def count_in_range(self, low, high):
+        """Number of degrees d with low <= d <= high (vectorized over low and high)."""
+        count = np.searchsorted(self.ascending, high, side="right") - np.searchsorted(self.ascending, low, side="left")
+        return np.maximum(count, 0)
+
+    def count_greater(self, value):
+        """Number of degrees greater than `value` (vectorized)."""
+        return self.n - np.searchsorted(self.ascending, value, side="right")
 
-    for k in range(1, n + 1):
-        dk = d[k - 1]  # d_k
-        count = sum(1 for di in d if k <= di <= dk)
-        value = k - 1 + 0.5 * count
-        min_val = min(min_val, floor(value))
+    def tie_range(self, value):
+        """
+        The index range lo..hi-1 holding the degrees equal to `value` (vectorized).
+        Only valid for a non-increasing sequence.
+        """
+        assert self.is_non_increasing, "Tie ranges need a non-increasing sequence."
+        return self.count_greater(value), self.n - np.searchsorted(self.ascending, value, side="left")
 
-    return min_val
+    def suffix_min_sums(self):
+        """
+        T[k] = sum_{i >= k} min(d_i, k) for k = 0..n (0-based indices), computed once.
+        O(n log n) for a non-increasing sequence, O(n^2) otherwise.
+        """
+        if self._suffix_min_sums is None:
+            n = self.n
+            k = np.arange(n + 1)
+            if self.is_non_increasing:
+                # The i with d_i > k are exactly the first count_greater(k) indices
+                split = np.maximum(k, self.count_greater(k))
+                self._suffix_min_sums = k * (split - k) + (self.prefix[n] - self.prefix[split])
+            else:
+                self._suffix_min_sums = np.array([np.minimum(self.degrees[j:], j).sum() for j in range(n + 1)])
+        return self._suffix_min_sums
 
-def td(delta: int, deg_seq: List[int]) -> Tuple[int, int]:
+
+def maximal_matching_lower_bound(d, profile: Optional[DegreeSequenceProfile] = None):
+    """
+    min over k = 1..n of floor(k - 1 + #{i : k <= d_i <= d_k} / 2), with the counts
+    taken from the sorted degrees in O(n log n).
+    """
+    if profile is None:
+        profile = DegreeSequenceProfile(d)
+    if profile.n == 0:
+        return float('inf')
+    k = np.arange(1, profile.n + 1)
+    count = profile.count_in_range(k, profile.degrees)
+    return int(np.min(k - 1 + count // 2))
+
+def td(delta: int, deg_seq: List[int], profile: Optional[DegreeSequenceProfile] = None) -> Tuple[int, int]:
+    """
+    Compare the number of degrees equal to deg_seq[delta] after and before index delta.
+
+    Returns:
+        (int, int): (#after - #before, #after).
+    """
     assert delta < len(deg_seq), "Delta must be a valid index of the degree sequence."
-    d_delta = deg_seq[delta]
-    larger_indices_count, smaller_indices_count = 0, 0
-    for i, d in enumerate(deg_seq):
-        if d == d_delta:
-            if i > delta:
-                larger_indices_count += 1
-            elif i < delta:
-                smaller_indices_count += 1
+    if profile is None:
+        profile = DegreeSequenceProfile(deg_seq)
+    d_delta = profile.degrees[delta]
+    if profile.is_non_increasing:
+        lo, hi = profile.tie_range(d_delta)
+        larger_indices_count, smaller_indices_count = int(hi) - delta - 1, delta - int(lo)
+    else:
+        is_tie = profile.degrees == d_delta
+        larger_indices_count = int(np.count_nonzero(is_tie[delta + 1:]))
+        smaller_indices_count = int(np.count_nonzero(is_tie[:delta]))
     return larger_indices_count - smaller_indices_count, larger_indices_count
 
-def maximum_matching_size_numpy(deg_seq: List[int]) -> int:
+def maximum_matching_size_numpy(deg_seq: List[int], profile: Optional[DegreeSequenceProfile] = None) -> int:
     """
     Efficient numpy implementation of maximum_matching_size.
     Calculate the potentially maximum matching size based on the degree sequence.
-    """
-    n = len(deg_seq)
 
-    if n == 0:
+    For every even delta (from the largest down) two conditions are checked, and h = delta/2
+    is returned for the first delta that satisfies both:
+      1. for k = 1..h-1:  s1(k) <= k^2 + sum_{i>=k} min(d_i - [i < delta], k)
+      2. for k = delta + t_delta:  s1(k) + larger <= k^2 + sum_{i>=k} min(d_i - [d_i = d_delta], k)
+    where s1(k) is the sum of the first k degrees (0-based indices above).
+    Using min(d - 1, k) = min(d, k) - [d <= k], both right-hand sides become
+    T(k) = sum_{i>=k} min(d_i, k) minus a count, so T is computed once for all k,
+    and condition 1 reduces to a bound D_k on delta for every k.
+    For a non-increasing sequence (the common case) all of it comes from prefix sums and
+    searchsorted in O(n log n); other orders take O(n^2).
+
+    Args:
+        deg_seq (list[int]): The degree sequence.
+        profile (DegreeSequenceProfile, optional): A profile of deg_seq, to reuse it across calls.
+    """
+    if profile is None:
+        profile = DegreeSequenceProfile(deg_seq)
+    n = profile.n
+    if n < 2:
         return 0
-    
-    deg_array = np.array(deg_seq)
-    start_n = n if n % 2 == 0 else n - 1
-    
-    for delta in range(start_n, 1, -2):
-        h_delta = delta // 2
-        d_delta = deg_seq[delta - 1]
-        
-        # First condition check
-        first_flag = True
-        s1 = 0
-        for k in range(1, h_delta):
-            s1 += deg_seq[k - 1]
-            
-            # Vectorized computation of s2
-            indices = np.arange(k, n)
-            indicator = (indices <= (delta - 1)).astype(int)
-            s2 = np.sum(np.minimum(deg_array[k:] - indicator, k))
-            
-            first_flag = first_flag and (s1 <= k**2 + s2)
-            if not first_flag:
-                break
-        
-        if not first_flag:
-            continue
-        
-        # Second condition
-        t_delta, s2 = td(delta-1, deg_seq)
+
+    deltas = np.arange(n if n % 2 == 0 else n - 1, 1, -2)
+    if profile.is_non_increasing:
+        first_ok, second_ok = _matching_conditions_sorted(profile, deltas)
+    else:
+        first_ok, second_ok = _matching_conditions_general(profile, deltas)
+
+    satisfied = np.nonzero(first_ok & second_ok)[0]
+    if satisfied.size > 0:
+        return int(deltas[satisfied[0]]) // 2
+    return 0
+
+def _first_condition_ok(delta_bound, deltas):
+    """
+    Condition 1 holds for delta iff delta <= D_k for every k = 1..delta/2-1,
+    given the bounds D_k in delta_bound[k] (delta_bound[0] is unused).
+    """
+    running_min = np.minimum.accumulate(np.concatenate(([np.iinfo(np.int64).max], delta_bound[1:])))
+    # running_min[j] = min(D_1, ..., D_j), so delta needs running_min[delta/2 - 1]
+    return deltas <= running_min[deltas // 2 - 1]
+
+def _matching_conditions_sorted(profile, deltas):
+    """Both conditions of maximum_matching_size_numpy for every delta, for a non-increasing sequence."""
+    prefix = profile.prefix
+    suffix_min_sum = profile.suffix_min_sums()
+    k = np.arange(profile.n + 1)
+
+    # Condition 1: the count is #{k <= i < delta : d_i <= k} = max(0, delta - split[k])
+    split = np.maximum(k, profile.count_greater(k))
+    slack = k * k + suffix_min_sum - prefix
+    delta_bound = np.where(slack >= 0, split + slack, -1)
+    first_ok = _first_condition_ok(delta_bound, deltas)
+
+    # Condition 2: the ties of d_delta occupy indices lo..hi-1
+    d_delta = profile.degrees[deltas - 1]
+    lo, hi = profile.tie_range(d_delta)
+    larger = hi - deltas
+    smaller = deltas - 1 - lo
+    k2 = deltas + larger - smaller
+    ties_from_k = np.maximum(0, hi - np.maximum(k2, lo))
+    s3 = suffix_min_sum[k2] - np.where(d_delta <= k2, ties_from_k, 0)
+    second_ok = prefix[k2] + larger <= k2 * k2 + s3
+    return first_ok, second_ok
+
+def _matching_conditions_general(profile, deltas):
+    """Both conditions of maximum_matching_size_numpy for every delta, for a sequence in any order."""
+    n = profile.n
+    deg_array, prefix = profile.degrees, profile.prefix
+    suffix_min_sum = profile.suffix_min_sums()
+
+    delta_bound = np.full(n // 2, -1, dtype=np.int64)
+    for k in range(1, n // 2):
+        slack = k * k + suffix_min_sum[k] - prefix[k]
+        if slack >= 0:
+            # at_most_k[j] = #{i < j : d_i <= k}, non-decreasing in j
+            at_most_k = np.concatenate(([0], np.cumsum(deg_array <= k)))
+            delta_bound[k] = np.searchsorted(at_most_k, at_most_k[k] + slack, side="right") - 1
+    first_ok = _first_condition_ok(delta_bound, deltas)
+
+    second_ok = np.zeros(len(deltas), dtype=bool)
+    for j, delta in enumerate(deltas):
+        t_delta, larger = td(delta - 1, deg_array, profile)
         k = delta + t_delta
-        
-        # Vectorized computation of s1 and s3
-        s1 = np.sum(deg_array[:k])
-        if k < n:
-            indicator = (deg_array[k:] == d_delta).astype(int)
-            s3 = np.sum(np.minimum(deg_array[k:] - indicator, k))
-        else:
-            s3 = 0
-        
-        second_flag = (s1 + s2) <= (k**2 + s3)
-        
-        if second_flag:
-            return h_delta
-        
-    return 0
\ No newline at end of file
+        s3 = suffix_min_sum[k]
+        if deg_array[delta - 1] <= k:
+            s3 -= np.count_nonzero(deg_array[k:] == deg_array[delta - 1])
+        second_ok[j] = prefix[k] + larger <= k * k + s3
+    return first_ok, second_ok
@@ -1,31 +1,290 @@
+import hashlib
+from collections import OrderedDict
+
 import matplotlib.pyplot as plt
 import networkx as nx
+import numpy as np
+from matplotlib.collections import LineCollection
+from rustworkx import connected_components
+
+from graph_utils import edges_to_rustworkx_graph
+
+LARGE_GRAPH_NODES = 1000  # From this many nodes on, the NumPy layout and the light drawing are used
+LABEL_MAX_NODES = 200  # Node labels are only drawn up to this many nodes
+MAX_DRAWN_EDGES = 20000  # Above this many edges, a uniform sample of the (not highlighted) edges is drawn
+PIVOT_MDS_NODES = 64  # Components of large graphs with this many nodes are laid out by pivot MDS
+PIVOTS = 50
+
+
+def graph_layout(edges, seed=None, iterations=100):
+    """
+    Node positions for drawing the graph given by `edges`.
+
+    Up to LARGE_GRAPH_NODES nodes, this is networkx's spring layout. Larger graphs are laid out
+    with NumPy on the edge array in O(n + m) per step, instead of O(n^2) per iteration for the
+    spring layout, component by component:
+        - components of PIVOT_MDS_NODES nodes or more by pivot MDS (Brandes and Pich): the BFS
+          distances to PIVOTS random pivots are embedded in the plane by classical MDS;
+        - the smaller ones, all at once, with the two leading nontrivial eigenvectors of their
+          normalized adjacency matrix, found by `iterations` steps of orthogonal iteration.
+    The components are then packed side by side, largest first, and the positions are jittered
+    by a fraction of the spacing of the nodes: nodes with the same neighbors (e.g. the leaves of a
+    star) have the same distances and eigenvector entries, and would be drawn on top of each other.
+
+    Args:
+        edges (list[tuple] or np.ndarray): The edges, or an (m, 2) edge array.
+        seed (int, optional): Seed of the initial positions and of the pivots. Defaults to None.
+        iterations (int, optional): Iterations of the spectral layout. Defaults to 100.
+
+    Returns:
+        np.ndarray, np.ndarray: The node IDs, in increasing order, and their (n, 2) positions.
+    """
+    graph, node_ids = edges_to_rustworkx_graph(edges, return_mapping=True)
+    if len(node_ids) < LARGE_GRAPH_NODES:
+        nx_graph = nx.Graph()
+        nx_graph.add_nodes_from(node_ids.tolist())
+        nx_graph.add_edges_from(edges if isinstance(edges, list) else np.asarray(edges).tolist())
+        pos = nx.spring_layout(nx_graph, seed=seed)
+        return node_ids, np.array([pos[node_id] for node_id in node_ids.tolist()]).reshape(-1, 2)
+    index_pairs = np.array(graph.edge_list(), dtype=np.int64).reshape(-1, 2)
+    component = np.empty(len(node_ids), dtype=np.int64)
+    for label, nodes in enumerate(sorted(connected_components(graph), key=len, reverse=True)):
+        component[list(nodes)] = label
+    rng = np.random.default_rng(seed)
+    positions = _spectral_positions(index_pairs, component, rng, iterations)
+    sizes = np.bincount(component)
+    large_count = int(np.sum(sizes >= PIVOT_MDS_NODES))
+    if large_count:
+        # The nodes and the edges of every component, as slices of arrays sorted by component
+        order = np.argsort(component, kind="stable")
+        starts = np.concatenate(([0], np.cumsum(sizes)))
+        edge_component = component[index_pairs[:, 0]]
+        edge_order = np.argsort(edge_component, kind="stable")
+        edge_starts = np.searchsorted(edge_component[edge_order], np.arange(large_count + 1))
+        local_index = np.empty(len(node_ids), dtype=np.int64)
+        for label in range(large_count):
+            nodes = order[starts[label]:starts[label + 1]]
+            local_index[nodes] = np.arange(len(nodes))
+            local_pairs = local_index[index_pairs[edge_order[edge_starts[label]:edge_starts[label + 1]]]]
+            positions[nodes] = _pivot_mds(local_pairs, len(nodes), rng)
+    positions = _pack_components(positions, component)
+    return node_ids, positions + rng.uniform(-0.15, 0.15, positions.shape)
+
+
+def _adjacency(index_pairs, n):
+    """The graph in compressed sparse row form: the neighbors of i are neighbors[indptr[i]:indptr[i + 1]]."""
+    sources = np.concatenate((index_pairs[:, 0], index_pairs[:, 1]))
+    targets = np.concatenate((index_pairs[:, 1], index_pairs[:, 0]))
+    order = np.argsort(sources, kind="stable")
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=n), out=indptr[1:])
+    return indptr, targets[order]
+
+
+def _bfs_distances(indptr, neighbors, sources):
+    """
+    Hop distances from every source, as an (n, len(sources)) array (-1 where a source does not
+    reach). The searches advance in lockstep, one level of all of them per step, so a graph of
+    large diameter (HH realizations can be long paths) costs one step per level, not one per
+    level and source.
+    """
+    n, k = len(indptr) - 1, len(sources)
+    distances = np.full(n * k, -1, dtype=np.int32)  # Flat, (node, source) is at node * k + source
+    first_seen = np.empty(n * k, dtype=np.int64)
+    frontier, columns = np.asarray(sources), np.arange(k)
+    distances[frontier * k + columns] = 0
+    level = 0
+    while frontier.size:
+        level += 1
+        starts = indptr[frontier]
+        counts = indptr[frontier + 1] - starts
+        # The neighbor lists of the whole frontier, gathered with one ragged index
+        index = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        keys = neighbors[index] * k + np.repeat(columns, counts)
+        keys = keys[distances[keys] < 0]
+        # Keep one copy of every key without sorting: of the duplicates, the one written last to first_seen
+        first_seen[keys] = np.arange(len(keys))
+        keys = keys[first_seen[keys] == np.arange(len(keys))]
+        distances[keys] = level
+        frontier, columns = keys // k, keys % k
+    return distances.reshape(n, k)
+
+
+def _pivot_mds(index_pairs, n, rng):
+    """Positions of the n nodes of a connected graph by pivot MDS."""
+    indptr, neighbors = _adjacency(index_pairs, n)
+    pivots = rng.choice(n, min(PIVOTS, n), replace=False)
+    squared = _bfs_distances(indptr, neighbors, pivots).astype(np.float64) ** 2
+    centered = -0.5 * (squared - squared.mean(axis=0) - squared.mean(axis=1, keepdims=True) + squared.mean())
+    left, singular_values, _ = np.linalg.svd(centered, full_matrices=False)
+    return left[:, :2] * singular_values[:2]
+
 
-def visualize_graph(edges, highlight_edges=None, title=None, ax=None):
+def _spectral_positions(index_pairs, component, rng, iterations):
+    """
+    Orthogonal iteration with M = (I + D^-1/2 A D^-1/2) / 2, run on all the components at once:
+    the vectors are deflated, orthogonalized and normalized per component (with bincount over
+    the component labels), so every component converges to its own two leading nontrivial
+    eigenvectors. Returns the (n, 2) embedding D^-1/2 X.
+    """
+    n = len(component)
+    u, v = index_pairs[:, 0], index_pairs[:, 1]
+    degrees = np.bincount(u, minlength=n) + np.bincount(v, minlength=n)
+    inverse_sqrt = 1.0 / np.sqrt(degrees)
+    trivial = np.sqrt(degrees)  # The eigenvector of eigenvalue 1 on every component
+    trivial_norm = np.bincount(component, weights=trivial * trivial)
+
+    def per_component(values):
+        return np.bincount(component, weights=values)[component]
+
+    def orthonormalize(x):
+        for column in range(2):
+            x[:, column] -= trivial * (per_component(trivial * x[:, column]) / trivial_norm[component])
+            if column == 1:
+                x[:, 1] -= x[:, 0] * per_component(x[:, 0] * x[:, 1])
+            norm = np.sqrt(per_component(x[:, column] ** 2))
+            x[:, column] = np.divide(x[:, column], norm, out=np.zeros(n), where=norm > 1e-12)
+        return x
+
+    x = orthonormalize(rng.standard_normal((n, 2)))
+    for _ in range(iterations):
+        scaled = x * inverse_sqrt[:, None]
+        product = np.empty_like(x)
+        for column in range(2):
+            product[:, column] = (np.bincount(u, weights=scaled[v, column], minlength=n)
+                                  + np.bincount(v, weights=scaled[u, column], minlength=n))
+        x = orthonormalize(0.5 * (x + product * inverse_sqrt[:, None]))
+    return x * inverse_sqrt[:, None]
+
+
+def _pack_components(positions, component):
+    """
+    Scale every component into a square of side proportional to the square root of its size,
+    and place the squares in rows, largest first (the component labels are in decreasing size).
+    """
+    sizes = np.bincount(component)
+    order = np.argsort(component, kind="stable")
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    low = np.minimum.reduceat(positions[order], starts)
+    high = np.maximum.reduceat(positions[order], starts)
+    extent = (high - low).max(axis=1)
+    side = np.sqrt(sizes)
+    scale = np.divide(side, extent, out=np.zeros(len(sizes)), where=extent > 1e-12)
+    positions = (positions - low[component]) * scale[component, None]
+
+    row_width = max(side[0], 1.2 * np.sqrt(sizes.sum()))
+    offsets = np.empty((len(sizes), 2))
+    x = y = row_height = 0.0
+    gap = 1.0
+    for label, component_side in enumerate(side.tolist()):
+        if x > 0 and x + component_side > row_width:
+            x, y, row_height = 0.0, y - row_height - gap, 0.0
+        offsets[label] = x, y - component_side
+        x += component_side + gap
+        row_height = max(row_height, component_side)
+    return positions + offsets[component]
+
+
+class LayoutCache:
+    def __init__(self, max_entries=8):
+        """
+        Layouts already computed by `graph_layout`, keyed by the set of edges of the graph, so a
+        graph drawn again (in any edge order or orientation) is not laid out again.
+
+        Args:
+            max_entries (int, optional): Number of layouts kept, the least recently used is dropped. Defaults to 8.
+        """
+        self.max_entries = max_entries
+        self._layouts = OrderedDict()
+
+    def get(self, edges, seed=None, key=None):
+        """
+        Return (node_ids, positions) for the nodes of `edges`, computing the layout of this graph
+        if it was not laid out yet.
+
+        Args:
+            edges (list[tuple] or np.ndarray): The edges, or an (m, 2) edge array.
+            seed (int, optional): Seed of the layout, if it is computed. Defaults to None.
+            key (hashable, optional): Key of the layout instead of the edge set, to draw several
+                graphs with the same positions. Only meaningful when a node ID stands for the same
+                node in all of them, e.g. the realizations of one degree sequence by different
+                strategies. A layout on other nodes is computed again. Defaults to None.
+        """
+        edge_array = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+        if key is None:
+            # Every edge as (low, high), the edges in increasing order: the same key for the same graph
+            canonical = np.unique(np.sort(edge_array, axis=1), axis=0)
+            key = hashlib.sha1(canonical.tobytes()).hexdigest()
+        layout = self._layouts.get(key)
+        if layout is not None and not np.array_equal(layout[0], np.unique(edge_array)):
+            layout = None
+        if layout is None:
+            layout = self._layouts[key] = graph_layout(edges, seed=seed)
+            if len(self._layouts) > self.max_entries:
+                self._layouts.popitem(last=False)
+        self._layouts.move_to_end(key)
+        return layout
+
+
+def visualize_graph(edges, highlight_edges=None, title=None, ax=None, layout_cache=None, seed=None, layout_key=None):
     """
     Visualizes a graph given its edges. Optionally highlights specific edges.
 
+    Graphs with LARGE_GRAPH_NODES nodes or more are laid out with the NumPy layout of
+    `graph_layout` and drawn as line collections. Labels are only drawn up to LABEL_MAX_NODES
+    nodes, and above MAX_DRAWN_EDGES edges only a sample of the edges is drawn (the highlighted
+    edges are always drawn).
+
     Args:
-        edges (list[tuple]): List of edges in the graph (e.g., [(u, v), ...]).
+        edges (list[tuple] or np.ndarray): List of edges in the graph (e.g., [(u, v), ...]), or an (m, 2) edge array.
         highlight_edges (list[tuple], optional): Edges to highlight in a different color.
         title (str, optional): Title for the figure.
         ax (matplotlib.axes.Axes, optional): Axes to plot on.
+        layout_cache (LayoutCache, optional): Where to take the layout from, or keep it for the
+            next drawing of the same graph. Defaults to computing the layout for this call only.
+        seed (int, optional): Seed of the layout. Defaults to None.
+        layout_key (hashable, optional): Key of the layout in `layout_cache`, to draw other graphs
+            on the same nodes with the same positions (see LayoutCache.get). Defaults to None.
     """
-    G = nx.Graph()
-    G.add_edges_from(edges)
-    pos = nx.spring_layout(G)
+    edge_array = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+    if layout_cache is not None:
+        node_ids, positions = layout_cache.get(edge_array, seed=seed, key=layout_key)
+    else:
+        node_ids, positions = graph_layout(edges, seed=seed)
     if ax is None:
         plt.figure(figsize=(8, 6))
         ax = plt.gca()
-    # Draw all edges in gray
-    nx.draw_networkx_edges(G, pos, edgelist=edges, edge_color="gray", ax=ax)
-    # Draw highlighted edges if provided
-    if highlight_edges:
-        nx.draw_networkx_edges(
-            G, pos, edgelist=highlight_edges, edge_color="red", width=2, ax=ax
-        )
-    nx.draw_networkx_nodes(G, pos, node_color="lightblue", node_size=500, ax=ax)
-    nx.draw_networkx_labels(G, pos, font_size=10, ax=ax)
+    n = len(node_ids)
+    highlighted = np.asarray(highlight_edges if highlight_edges is not None else [], dtype=np.int64).reshape(-1, 2)
+
+    if n < LARGE_GRAPH_NODES:
+        G = nx.Graph()
+        G.add_edges_from(edge_array.tolist())
+        pos = dict(zip(node_ids.tolist(), positions))
+        # Draw all edges in gray
+        nx.draw_networkx_edges(G, pos, edgelist=edge_array.tolist(), edge_color="gray", ax=ax)
+        # Draw highlighted edges if provided
+        if len(highlighted):
+            nx.draw_networkx_edges(
+                G, pos, edgelist=highlighted.tolist(), edge_color="red", width=2, ax=ax
+            )
+        nx.draw_networkx_nodes(G, pos, node_color="lightblue", node_size=500 if n <= LABEL_MAX_NODES else 50, ax=ax)
+        if n <= LABEL_MAX_NODES:
+            nx.draw_networkx_labels(G, pos, font_size=10, ax=ax)
+    else:
+        # Positions indexed by node ID: the IDs are sorted, so searchsorted maps them to their row
+        if len(edge_array) > MAX_DRAWN_EDGES:
+            sample = np.random.default_rng(seed).choice(len(edge_array), MAX_DRAWN_EDGES, replace=False)
+            edge_array = edge_array[np.sort(sample)]
+        segments = positions[np.searchsorted(node_ids, edge_array)]
+        ax.add_collection(LineCollection(segments, colors="gray", linewidths=0.3, alpha=0.5))
+        if len(highlighted):
+            ax.add_collection(LineCollection(positions[np.searchsorted(node_ids, highlighted)],
+                                             colors="red", linewidths=1.0))
+        ax.scatter(positions[:, 0], positions[:, 1], s=max(0.5, 2000 / np.sqrt(n) / 10), c="lightblue",
+                   edgecolors="none", zorder=2)
+        ax.autoscale_view()
+        ax.set_aspect("equal")
     if title:
         ax.set_title(title)
     ax.axis("off")
@@ -1,38 +1,329 @@
-from typing import List, Tuple
-from bins import Bins
-from hh_strategy import HHStrategy
+import random
+from itertools import chain
+from time import perf_counter
+from typing import Iterator, List, NamedTuple, Optional, Sequence, Tuple, Type, Union
+import numpy as np
+from graph_utils import erdos_gallai_check
+from hh_strategy import HHStrategy, NotGraphicalError
 from strategies.max_degree_strategy import MaxDegreeStrategy
 
-def havel_hakimi_general(degrees: List[int], strategy: HHStrategy) -> Tuple[bool, List[Tuple[int, int]]]:
+def havel_hakimi_general(degrees: List[int], strategy: HHStrategy, precheck: bool = False,
+                         as_array: bool = False) -> Tuple[bool, Union[List[Tuple[int, int]], np.ndarray]]:
     """
     Generalized Havel-Hakimi algorithm to check if a degree sequence is graphical.
-    
+    When the sequence is not graphical, the reason is stored in `strategy.rejection_reason`.
+
     Args:
         degrees (list[int]): The degree sequence.
         strategy (HHStrategy): Strategy object for pivot/neighbor selection.
-    
+        precheck (bool, optional): Run the Erdős–Gallai test first, so a non-graphical sequence
+            is rejected before any edge is built. Defaults to False.
+        as_array (bool, optional): Return the edges as an (m, 2) NumPy int array, preallocated from
+            sum(degrees) // 2 and filled in place, instead of a list of tuples. The array takes
+            8 or 16 bytes per edge instead of about 100. Defaults to False.
+
     Returns:
-        bool, list[tuple]: True if the sequence is graphical, False otherwise. If True, also returns the edges.
+        bool, list[tuple] or np.ndarray: True if the sequence is graphical, False otherwise. If True, also returns the edges.
     """
     if strategy is None:
         strategy = MaxDegreeStrategy()
-    
-    bins = Bins()
+    no_edges = _empty_edge_array(len(degrees)) if as_array else []
+
+    if as_array:
+        edges = np.empty((sum(degrees) // 2, 2), dtype=no_edges.dtype)
+    else:
+        edges = []
+    edge_count = 0
+
+    steps = _havel_hakimi_steps(degrees, strategy, precheck)
+    while True:
+        try:
+            pivot_vertex, neighbors = next(steps)
+        except StopIteration as stop:
+            is_graphical = stop.value
+            break
+
+        if as_array:
+            end = edge_count + len(neighbors)
+            edges[edge_count:end, 0] = pivot_vertex
+            edges[edge_count:end, 1] = neighbors
+            edge_count = end
+        else:
+            for neighbor in neighbors:
+                edges.append((pivot_vertex, neighbor))
+
+    if not is_graphical:
+        return False, no_edges
+    if as_array and edge_count < len(edges):
+        edges = edges[:edge_count]
+    return True, edges
+
+
+class HavelHakimiStream:
+    def __init__(self, degrees: List[int], strategy: HHStrategy, precheck: bool = False):
+        """
+        Streaming form of `havel_hakimi_general`: the edges are produced while they are iterated,
+        so only the bins (O(n)) are kept in memory and never the edge list (O(m)).
+
+        Iterating yields (pivot, neighbor) edges; `batches()` yields (pivot, neighbors) per pivot instead.
+        A stream can be consumed once. Edges already yielded cannot be taken back, so the verdict
+        is only known at the end: `is_graphical` is None until the stream is exhausted, then True
+        or False, and `rejection_reason` explains a False. Use `precheck=True` to reject
+        non-graphical sequences before the first edge.
+
+        Args:
+            degrees (list[int]): The degree sequence.
+            strategy (HHStrategy): Strategy object for pivot/neighbor selection.
+            precheck (bool, optional): Run the Erdős–Gallai test first. Defaults to False.
+        """
+        self.degrees = degrees
+        self.strategy = strategy if strategy is not None else MaxDegreeStrategy()
+        self.precheck = precheck
+        self.is_graphical = None
+        self._started = False
+
+    @property
+    def rejection_reason(self):
+        return self.strategy.rejection_reason
+
+    def __iter__(self) -> Iterator[Tuple[int, int]]:
+        # Each neighbor is yielded as soon as the strategy chooses it
+        steps = self._steps(lazy_neighbors=True)
+        for pivot_vertex, neighbors in steps:
+            try:
+                for neighbor in neighbors:
+                    yield pivot_vertex, neighbor
+            except NotGraphicalError as error:
+                # Raised while choosing the neighbors, outside the steps: they record the rejection
+                try:
+                    steps.throw(error)
+                except StopIteration:
+                    return
+
+    def batches(self) -> Iterator[Tuple[int, List[int]]]:
+        """
+        Yield (pivot, neighbors) for every pivot, in the order they are processed.
+        """
+        return self._steps(lazy_neighbors=False)
+
+    def _steps(self, lazy_neighbors):
+        if self._started:
+            raise RuntimeError("a HavelHakimiStream can only be consumed once")
+        self._started = True
+        self.is_graphical = yield from _havel_hakimi_steps(self.degrees, self.strategy, self.precheck, lazy_neighbors)
+
+
+def _havel_hakimi_steps(degrees, strategy, precheck, lazy_neighbors=False, bins=None):
+    """
+    Run Havel-Hakimi one pivot at a time, yielding (pivot, neighbors) and returning the verdict.
+    With `lazy_neighbors`, the neighbors are the strategy's `iter_neighbors` generator,
+    which must be exhausted before the next step.
+    `bins`, if given, are empty bins created by the strategy, filled instead of new ones.
+    If the strategy has a `profiler` (HHProfiler), it is attached for the pivot loop.
+    """
+    strategy.rejection_reason = None
+
+    if precheck:
+        is_graphical, reason = erdos_gallai_check(degrees)
+        if not is_graphical:
+            strategy.rejection_reason = reason
+            return False
+
+    # A vertex cannot have more neighbors than there are other vertices.
+    # Checked before filling the bins, so a huge degree never reaches them.
+    positive_count = sum(1 for degree in degrees if degree > 0)
+    if positive_count > 0 and max(degrees) >= positive_count:
+        strategy.rejection_reason = f"degree {max(degrees)} is at least the number of non-zero degrees ({positive_count})"
+        return False
+
+    if bins is None:
+        bins = strategy.create_bins()
     for vertex_id, degree in enumerate(degrees):
         if degree > 0:
             bins.add_node(degree, vertex_id)
-    
-    edges = []
-
-    while bins.size > 0:
-        pivot_degree, pivot_vertex = strategy.choose_pivot(bins)
-        
-        if pivot_degree > bins.size:
-            return False, []
-        
-        neighbors = strategy.choose_and_add_neighbors(bins, pivot_degree, pivot_vertex)
-        
-        for neighbor in neighbors:
-            edges.append((pivot_vertex, neighbor))
-    
-    return True, edges
\ No newline at end of file
+
+    profiler = strategy.profiler
+    if profiler is not None:
+        profiler.attach(strategy, bins)
+    try:
+        while bins.size > 0:
+            try:
+                pivot_degree, pivot_vertex = strategy.choose_pivot(bins)
+
+                if pivot_degree > bins.size:
+                    strategy.rejection_reason = f"pivot {pivot_vertex} needs {pivot_degree} neighbors but only {bins.size} nodes are left"
+                    return False
+
+                if lazy_neighbors:
+                    yield pivot_vertex, strategy.iter_neighbors(bins, pivot_degree, pivot_vertex)
+                else:
+                    yield pivot_vertex, strategy.choose_and_add_neighbors(bins, pivot_degree, pivot_vertex)
+            except NotGraphicalError as error:
+                strategy.rejection_reason = str(error)
+                return False
+    finally:
+        if profiler is not None:
+            profiler.detach()
+
+    return True
+
+
+def _empty_edge_array(n: int) -> np.ndarray:
+    """An empty (0, 2) edge array, with an int type wide enough for n node IDs."""
+    return np.empty((0, 2), dtype=np.int32 if n <= np.iinfo(np.int32).max else np.int64)
+
+
+class RaggedSequences(NamedTuple):
+    """
+    Many degree sequences as one ragged array: sequence i is values[offsets[i]:offsets[i + 1]].
+    """
+    offsets: np.ndarray  # int64, one more than the number of sequences
+    values: np.ndarray
+
+    @classmethod
+    def pack(cls, sequences: Sequence[Sequence[int]]) -> "RaggedSequences":
+        lengths = [len(degrees) for degrees in sequences]
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        values = np.fromiter(chain.from_iterable(sequences), dtype=np.int64, count=int(offsets[-1]))
+        return cls(offsets, values)
+
+
+class BatchResult(NamedTuple):
+    is_graphical: np.ndarray  # bool, per sequence
+    matching_size: np.ndarray  # int32, size of the matching built by the strategy, 0 if it builds none
+    seconds: np.ndarray  # float64, time spent realizing every sequence
+    edge_offsets: np.ndarray  # int64, the edges of sequence i are edges[edge_offsets[i]:edge_offsets[i + 1]]
+    edges: np.ndarray  # (m, 2) int array of all the realizations, empty unless they were asked for
+    edge_counts: np.ndarray  # int64, number of edges of every realization, also when the edges are not stored
+    matching_offsets: Optional[np.ndarray] = None  # int64, like edge_offsets, for the matchings
+    matchings: Optional[np.ndarray] = None  # (k, 2) int array of the matchings built by the strategy, if asked for
+
+    def edges_of(self, index: int) -> np.ndarray:
+        if self.edge_offsets is None:
+            raise ValueError("the edges were not stored, run havel_hakimi_batch with store_edges=True")
+        return self.edges[self.edge_offsets[index]:self.edge_offsets[index + 1]]
+
+    def matching_of(self, index: int) -> np.ndarray:
+        if self.matching_offsets is None:
+            raise ValueError("the matchings were not stored, run havel_hakimi_batch with store_matchings=True")
+        return self.matchings[self.matching_offsets[index]:self.matching_offsets[index + 1]]
+
+
+def havel_hakimi_batch(sequences: Union[RaggedSequences, Sequence[Sequence[int]]], StrategyClass: Type[HHStrategy],
+                       precheck: bool = False, store_edges: bool = True, store_matchings: bool = False,
+                       workers: int = 1, shard_size: int = 1024, seed: Optional[int] = None) -> BatchResult:
+    """
+    Run Havel-Hakimi on many degree sequences in one call.
+
+    Every shard of `shard_size` sequences uses one strategy and one set of bins, reset between the
+    sequences (see HHStrategy.reset), and collects the edges of all its sequences in two flat lists,
+    turned into one array at the end, instead of building all of them again for every sequence.
+    The results are the ones of havel_hakimi_general(degrees, StrategyClass(degrees=degrees)) for
+    every sequence.
+    The shards are the cells of sweep_runner.run_sweep, run on `workers` processes. With a `seed`,
+    the global `random` generator (used by RandomStrategy) is seeded from the stream of every
+    shard, so the results do not depend on `workers`.
+
+    Args:
+        sequences (RaggedSequences or list[list[int]]): The degree sequences.
+        StrategyClass (type): The strategy class.
+        precheck (bool, optional): Run the Erdős–Gallai test first, see havel_hakimi_general. Defaults to False.
+        store_edges (bool, optional): Return the edges of the graphical sequences. Defaults to True.
+        store_matchings (bool, optional): Return the matching edges built by the strategy. Defaults to False.
+        workers (int, optional): Number of worker processes, see run_sweep. Defaults to 1.
+        shard_size (int, optional): Sequences per shard. Defaults to 1024.
+        seed (int, optional): Root seed of the shards' streams. Defaults to leaving `random` as it is.
+
+    Returns:
+        BatchResult: The results of every sequence, as columns. Without `store_edges`, `edges` is
+            empty and `edge_offsets` is None, only the `edge_counts` are kept. Without
+            `store_matchings`, `matching_offsets` and `matchings` are None.
+    """
+    # Imported here, so that the algorithm does not depend on the experiment infrastructure
+    from sweep_runner import run_sweep
+
+    if not isinstance(sequences, RaggedSequences):
+        sequences = RaggedSequences.pack(sequences)
+    offsets, values = sequences
+    count = len(offsets) - 1
+    cells = []
+    for start in range(0, max(count, 1), shard_size):
+        shard_offsets = offsets[start:min(start + shard_size, count) + 1]
+        cells.append((StrategyClass, shard_offsets - shard_offsets[0], values[shard_offsets[0]:shard_offsets[-1]],
+                      precheck, store_edges, store_matchings, seed is not None))
+    shards = run_sweep(_havel_hakimi_shard, cells, workers=workers, seed=seed)
+
+    is_graphical, matching_size, seconds, edge_counts, edges, matchings = (np.concatenate(column) for column in zip(*shards))
+    edge_offsets = matching_offsets = None
+    if store_edges:
+        edge_offsets = np.zeros(count + 1, dtype=np.int64)
+        np.cumsum(edge_counts, out=edge_offsets[1:])
+    if store_matchings:
+        matching_offsets = np.zeros(count + 1, dtype=np.int64)
+        np.cumsum(matching_size, out=matching_offsets[1:])
+    else:
+        matchings = None
+    return BatchResult(is_graphical, matching_size, seconds, edge_offsets, edges, edge_counts, matching_offsets, matchings)
+
+
+def _havel_hakimi_shard(StrategyClass, offsets, values, precheck, store_edges, store_matchings, reseed,
+                        seed_sequence=None):
+    if reseed:
+        random.seed(int(seed_sequence.generate_state(1)[0]))
+    count = len(offsets) - 1
+    offsets = offsets.tolist()
+    values = values.tolist()  # Python ints, which the bins handle faster than NumPy scalars
+    is_graphical = np.zeros(count, dtype=bool)
+    matching_size = np.zeros(count, dtype=np.int32)
+    seconds = np.zeros(count, dtype=np.float64)
+    edge_counts = np.zeros(count, dtype=np.int64)
+    # The endpoints of the edges of all the sequences. Appending a few neighbors to a list is much
+    # cheaper than writing them into an array, so the array is built once at the end.
+    edge_sources = []
+    edge_targets = []
+    edge_count = 0
+    matching_edges = []
+
+    strategy = StrategyClass()
+    get_matching_edges = getattr(strategy, "get_matching_edges", None)
+    bins = None
+    for index in range(count):
+        degrees = values[offsets[index]:offsets[index + 1]]
+        start_time = perf_counter()
+        strategy.reset(degrees)
+        if bins is None:
+            bins = strategy.create_bins()
+        first_edge = edge_count
+        steps = _havel_hakimi_steps(degrees, strategy, precheck, bins=bins)
+        while True:
+            try:
+                pivot_vertex, neighbors = next(steps)
+            except StopIteration as stop:
+                graphical = stop.value
+                break
+            if store_edges:
+                edge_sources.extend([pivot_vertex] * len(neighbors))
+                edge_targets.extend(neighbors)
+            edge_count += len(neighbors)
+
+        if graphical:
+            matching = get_matching_edges() if get_matching_edges is not None else None
+            matching_size[index] = len(matching) if matching else 0
+            if store_matchings and matching:
+                matching_edges.extend(matching)
+        else:
+            edge_count = first_edge
+            del edge_sources[first_edge:], edge_targets[first_edge:]
+            if bins.size:
+                bins.clear()
+        seconds[index] = perf_counter() - start_time
+        is_graphical[index] = graphical
+        edge_counts[index] = edge_count - first_edge
+    edges = _empty_edge_array(max((offsets[i + 1] - offsets[i] for i in range(count)), default=0))
+    if store_edges and edge_count:
+        edges = np.empty((edge_count, 2), dtype=edges.dtype)
+        edges[:, 0] = edge_sources
+        edges[:, 1] = edge_targets
+    matchings = np.array(matching_edges, dtype=edges.dtype).reshape(-1, 2)
+    return is_graphical, matching_size, seconds, edge_counts, edges, matchings
@@ -0,0 +1,207 @@
+import hashlib
+import os
+import sqlite3
+from collections import OrderedDict
+from time import perf_counter
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+from graph_utils import degree_sequence_repr, maximum_matching_size_numpy
+from havel_hakimi_algorithm import havel_hakimi_general
+
+
+class HHResult(NamedTuple):
+    is_graphical: bool
+    matching_size: int  # Size of the matching built by the strategy, 0 if it builds none
+    matching_bound: Optional[int]  # maximum_matching_size_numpy of the sequence, if it was asked for
+    edges: Optional[np.ndarray]  # (m, 2) realization, only kept when the cache stores edges
+    # The strategy's matching edges, only when the sequence was just run (they are not cached),
+    # so that callers can check every realization the cache computes
+    matching_edges: Optional[list] = None
+    seconds: Optional[float] = None  # Time of havel_hakimi_general, only when the sequence was just run
+
+
+class HHResultCache:
+    def __init__(self, path=None, memory_size=4096, max_bytes=256 * 2**20, store_edges=False):
+        """
+        Memo cache of Havel-Hakimi results, keyed by the degree sequence and the strategy.
+
+        The key is a hash of the run-length form of the sequence (`degree_sequence_repr`, which keeps
+        the order of the nodes, so the cached edges and matching are the ones the strategy builds for
+        this exact sequence), the strategy class name and its `version`. Results live in an SQLite
+        file shared by runs and processes, behind an in-memory LRU of `memory_size` entries. When the
+        file holds more than `max_bytes` of results, the least recently used ones are evicted.
+        Every process opens its own cache on the shared file; the size accounting and the recency
+        order are per process, so with several writers the budget is approximate.
+
+        Args:
+            path (str, optional): The SQLite file. Defaults to an in-memory cache that is not persisted.
+            memory_size (int, optional): Number of results kept in the LRU. Defaults to 4096.
+            max_bytes (int, optional): Size budget of the stored results. Defaults to 256 MiB.
+            store_edges (bool, optional): Also store the realization of every sequence. Defaults to False.
+        """
+        self.path = path
+        self.memory_size = memory_size
+        self.max_bytes = max_bytes
+        self.store_edges = store_edges
+        self.hits = 0
+        self.memory_hits = 0  # Hits served by the LRU, counted in `hits` as well
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._connection = None
+        self._stored_bytes = None
+        self._clock = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def run(self, degrees, StrategyClass, with_bound=False, deg_seq_str=None) -> HHResult:
+        """
+        Return the result of `havel_hakimi_general(degrees, StrategyClass(degrees=degrees))`,
+        from the cache if the sequence was already run with this strategy.
+
+        Args:
+            degrees (list[int]): The degree sequence.
+            StrategyClass (type): The strategy class.
+            with_bound (bool, optional): Also return maximum_matching_size_numpy(degrees). Defaults to False.
+            deg_seq_str (str, optional): degree_sequence_repr(degrees), if the caller already has it.
+
+        Returns:
+            HHResult: The verdict, the matching size, the bound and the edges, and on a miss the
+                matching edges and the time of the realization (see HHResult).
+        """
+        if deg_seq_str is None:
+            deg_seq_str = degree_sequence_repr(degrees)
+        key = self.key(deg_seq_str, StrategyClass)
+        in_memory = key in self._memory
+        result = self._get(key)
+        if result is not None and (result.matching_bound is not None or not with_bound) \
+                and (result.edges is not None or not self.store_edges or not result.is_graphical):
+            # Only counted once the entry is accepted: an entry without the bound or the edges is a miss
+            self.hits += 1
+            self.memory_hits += in_memory
+            return result
+
+        self.misses += 1
+        strategy = StrategyClass(degrees=degrees)
+        start = perf_counter()
+        is_graphical, edges = havel_hakimi_general(degrees, strategy=strategy, as_array=self.store_edges)
+        seconds = perf_counter() - start
+        matching = strategy.get_matching_edges() if is_graphical and hasattr(strategy, "get_matching_edges") else None
+        result = HHResult(
+            is_graphical=is_graphical,
+            matching_size=len(matching) if matching else 0,
+            matching_bound=maximum_matching_size_numpy(degrees) if with_bound else None,
+            edges=edges if self.store_edges and is_graphical else None,
+        )
+        self._put(key, result)
+        return result._replace(matching_edges=matching, seconds=seconds)
+
+    @staticmethod
+    def key(deg_seq_str, StrategyClass):
+        name = f"{StrategyClass.__name__}:{getattr(StrategyClass, 'version', 0)}"
+        return hashlib.sha256(f"{name}|{deg_seq_str}".encode()).hexdigest()
+
+    def counts(self):
+        """Return (hits, memory_hits, misses), so the counters of several caches can be summed."""
+        return self.hits, self.memory_hits, self.misses
+
+    def _get(self, key):
+        result = self._memory.get(key)
+        if result is not None:
+            self._memory.move_to_end(key)
+            return result
+        row = self._db().execute(
+            "SELECT is_graphical, matching_size, matching_bound, edges, edges_dtype FROM results WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        # Committed right away, so the write lock is not held while other workers wait for it
+        self._db().execute("UPDATE results SET last_used = ? WHERE key = ?", (self._tick(), key))
+        self._db().commit()
+        is_graphical, matching_size, matching_bound, edges, edges_dtype = row
+        if edges is not None:
+            edges = np.frombuffer(edges, dtype=edges_dtype).reshape(-1, 2)
+        result = HHResult(bool(is_graphical), matching_size, matching_bound, edges)
+        self._remember(key, result)
+        return result
+
+    def _put(self, key, result):
+        edges = result.edges
+        blob = edges.tobytes() if edges is not None else None
+        nbytes = len(key) + 32 + (len(blob) if blob is not None else 0)
+        db = self._db()
+        old = db.execute("SELECT nbytes FROM results WHERE key = ?", (key,)).fetchone()
+        db.execute(
+            "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (key, int(result.is_graphical), result.matching_size, result.matching_bound,
+             blob, edges.dtype.str if edges is not None else None, nbytes, self._tick()),
+        )
+        db.commit()
+        self._stored_bytes += nbytes - (old[0] if old else 0)
+        self._remember(key, result)
+        if self._stored_bytes > self.max_bytes:
+            self._evict()
+
+    def _remember(self, key, result):
+        self._memory[key] = result
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def _evict(self):
+        """Drop the least recently used results until the file is back under 3/4 of its budget."""
+        db = self._db()
+        target = self.max_bytes * 3 // 4
+        freed_keys = []
+        for key, nbytes in db.execute("SELECT key, nbytes FROM results ORDER BY last_used"):
+            if self._stored_bytes <= target:
+                break
+            freed_keys.append((key,))
+            self._stored_bytes -= nbytes
+        db.executemany("DELETE FROM results WHERE key = ?", freed_keys)
+        db.commit()
+        for (key,) in freed_keys:
+            self._memory.pop(key, None)
+
+    def _tick(self):
+        self._clock += 1
+        return self._clock
+
+    def _db(self):
+        if self._connection is None:
+            if self.path is not None and os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            # Several workers may share the file, so wait for their writes instead of failing
+            self._connection = sqlite3.connect(self.path or ":memory:", timeout=60)
+            if self.path is not None:
+                self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, is_graphical INTEGER, matching_size INTEGER, "
+                "matching_bound INTEGER, edges BLOB, edges_dtype TEXT, nbytes INTEGER, last_used INTEGER)"
+            )
+            self._connection.execute("CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)")
+            self._connection.commit()
+            stored_bytes, clock = self._connection.execute("SELECT COALESCE(SUM(nbytes), 0), COALESCE(MAX(last_used), 0) FROM results").fetchone()
+            self._stored_bytes = stored_bytes
+            self._clock = clock
+        return self._connection
+
+
+def cache_summary(counts):
+    """
+    Format (hits, memory_hits, misses) counters, as returned by `HHResultCache.counts`, with their hit rate.
+    """
+    hits, memory_hits, misses = counts
+    lookups = hits + misses
+    hit_rate = hits / lookups if lookups else 0.0
+    return f"HH cache: {hits} hits ({memory_hits} in memory), {misses} misses, hit rate {hit_rate:.1%}"
@@ -0,0 +1,173 @@
+from collections import Counter
+from time import perf_counter
+
+from bins import Bins
+
+
+class HHProfiler:
+    PHASES = ("choose_pivot", "choose_neighbors", "insert_into_bins")
+
+    def __init__(self):
+        """
+        Phase timers and hot-path counters for one Havel-Hakimi run.
+
+        Set it as the `profiler` of a strategy before running `havel_hakimi_general`. For the
+        duration of the run, the profiler wraps the strategy's methods on the instance (the
+        classes are never changed), so a strategy without a profiler runs exactly the same code
+        as before and pays nothing for it.
+
+        Recorded:
+            - the time in choose_pivot, in the neighbor selection (choose_and_add_neighbors or
+              iter_neighbors, without the reinsertion) and in PendingNodes.insert_into_bins;
+            - the pivot candidates each choose_pivot examined (the calls to the strategy's
+              `pivot_candidate_checks`), and how many pivots examined every node left in the bins,
+              which is the O(n^2) path of the matching strategies;
+            - the calls to the bins' pop_node_by_id, and the bins rebuilt or compacted.
+        """
+        self.seconds = dict.fromkeys(self.PHASES, 0.0)
+        self.counters = Counter()
+        self.pivots = 0
+        self.max_candidates = 0
+        self._attached = []
+        self._in_pivot = False
+        self._in_neighbors = False
+        self._candidates = 0
+        self._rebuilds_at_attach = 0
+
+    def attach(self, strategy, bins):
+        """Wrap the methods of `strategy`, its pending nodes and `bins`. Called by havel_hakimi_general."""
+        self._wrap(strategy, "choose_pivot", self._timed_pivot)
+        self._wrap(strategy, "choose_and_add_neighbors", self._timed_neighbors)
+        self._wrap(strategy, "iter_neighbors", self._timed_iter_neighbors)
+        for name in strategy.pivot_candidate_checks:
+            self._wrap(strategy, name, self._counted_candidate)
+        pending = getattr(strategy, "pending", None)
+        if pending is not None:
+            self._wrap(pending, "insert_into_bins", self._timed_insert)
+        self._wrap(bins, "pop_node_by_id", self._counted_pop_by_id)
+        self._rebuilds_at_attach = Bins.rebuilds
+
+    def detach(self):
+        """Put back the original methods."""
+        for obj, name, had_own, own in reversed(self._attached):
+            if had_own:
+                setattr(obj, name, own)
+            else:
+                delattr(obj, name)
+        self._attached = []
+        self.counters["bins rebuilt"] += Bins.rebuilds - self._rebuilds_at_attach
+
+    def _wrap(self, obj, name, make_wrapper):
+        own = vars(obj).get(name)
+        self._attached.append((obj, name, name in vars(obj), own))
+        setattr(obj, name, make_wrapper(getattr(obj, name)))
+
+    def _timed_pivot(self, choose_pivot):
+        def wrapper(bins):
+            remaining = bins.size
+            self._in_pivot = True
+            self._candidates = 0
+            start = perf_counter()
+            try:
+                return choose_pivot(bins)
+            finally:
+                self.seconds["choose_pivot"] += perf_counter() - start
+                self._in_pivot = False
+                self.pivots += 1
+                self.counters["pivot candidates"] += self._candidates
+                self.max_candidates = max(self.max_candidates, self._candidates)
+                if remaining > 1 and self._candidates >= remaining:
+                    self.counters["full pivot scans"] += 1
+        return wrapper
+
+    def _counted_candidate(self, check):
+        def wrapper(*args, **kwargs):
+            if self._in_pivot:
+                self._candidates += 1
+            return check(*args, **kwargs)
+        return wrapper
+
+    def _timed_neighbors(self, choose_and_add_neighbors):
+        def wrapper(*args, **kwargs):
+            if self._in_neighbors:  # The base class builds the list from iter_neighbors, already timed
+                return choose_and_add_neighbors(*args, **kwargs)
+            self._in_neighbors = True
+            insert_before = self.seconds["insert_into_bins"]
+            start = perf_counter()
+            try:
+                return choose_and_add_neighbors(*args, **kwargs)
+            finally:
+                elapsed = perf_counter() - start
+                self.seconds["choose_neighbors"] += elapsed - (self.seconds["insert_into_bins"] - insert_before)
+                self._in_neighbors = False
+        return wrapper
+
+    def _timed_iter_neighbors(self, iter_neighbors):
+        def wrapper(*args, **kwargs):
+            if self._in_neighbors:
+                yield from iter_neighbors(*args, **kwargs)
+                return
+            self._in_neighbors = True
+            insert_before = self.seconds["insert_into_bins"]
+            elapsed = 0.0
+            neighbors = iter_neighbors(*args, **kwargs)
+            try:
+                while True:
+                    # Only the time spent inside the generator is counted, not the consumer's
+                    start = perf_counter()
+                    try:
+                        neighbor = next(neighbors)
+                    except StopIteration:
+                        return
+                    finally:
+                        elapsed += perf_counter() - start
+                    yield neighbor
+            finally:
+                self.seconds["choose_neighbors"] += elapsed - (self.seconds["insert_into_bins"] - insert_before)
+                self._in_neighbors = False
+        return wrapper
+
+    def _timed_insert(self, insert_into_bins):
+        def wrapper(bins):
+            start = perf_counter()
+            try:
+                return insert_into_bins(bins)
+            finally:
+                self.seconds["insert_into_bins"] += perf_counter() - start
+        return wrapper
+
+    def _counted_pop_by_id(self, pop_node_by_id):
+        def wrapper(node_id, degree):
+            self.counters["pop_node_by_id"] += 1
+            return pop_node_by_id(node_id, degree)
+        return wrapper
+
+    def as_dict(self):
+        """The measurements as a flat dict, e.g. to be saved with the results of a run."""
+        result = {f"{phase}_seconds": seconds for phase, seconds in self.seconds.items()}
+        result.update(pivots=self.pivots, max_pivot_candidates=self.max_candidates)
+        result.update((name.replace(" ", "_"), count) for name, count in self.counters.items())
+        return result
+
+    def summary_line(self, label=""):
+        """One line with all the measurements, for logging many runs."""
+        phases = " | ".join(f"{phase} {seconds:.4f}s" for phase, seconds in self.seconds.items())
+        return (f"profile {label}: {phases} | pivots {self.pivots} | candidates {self.counters['pivot candidates']} "
+                f"(max {self.max_candidates}) | full scans {self.counters['full pivot scans']} | "
+                f"pop_node_by_id {self.counters['pop_node_by_id']} | bins rebuilt {self.counters['bins rebuilt']}")
+
+    def report(self, title="Havel-Hakimi profile"):
+        """A readable breakdown of the run."""
+        total = sum(self.seconds.values())
+        lines = [f"{title}:"]
+        for phase, seconds in self.seconds.items():
+            share = seconds / total if total else 0.0
+            lines.append(f"  {phase:<18} {seconds:10.4f} s  ({share:.1%})")
+        mean_candidates = self.counters["pivot candidates"] / self.pivots if self.pivots else 0.0
+        lines.append(f"  pivots: {self.pivots}")
+        lines.append(f"  pivot candidates examined: {self.counters['pivot candidates']} "
+                     f"(mean {mean_candidates:.1f}, max {self.max_candidates} per pivot)")
+        lines.append(f"  pivots that examined every remaining node: {self.counters['full pivot scans']}")
+        lines.append(f"  pop_node_by_id calls: {self.counters['pop_node_by_id']}")
+        lines.append(f"  bins rebuilt: {self.counters['bins rebuilt']}")
+        return "\n".join(lines)
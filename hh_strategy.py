@@ -3,10 +3,35 @@ from typing import Tuple
 from bins import Bins
 from pending_nodes import PendingNodes
 
+
+class NotGraphicalError(Exception):
+    """
+    Raised by a strategy (or its bins) when a pivot cannot get all its neighbors, which means the
+    sequence is not graphical. havel_hakimi_general turns it into a rejection, with the message as
+    the `rejection_reason`.
+    """
+
+
 class HHStrategy(ABC):
+    rejection_reason = None  # Set by havel_hakimi_general when it finds the sequence is not graphical
+    version = 1  # Part of the HHResultCache key: bump it when a change alters the graphs the strategy builds
+    profiler = None  # An HHProfiler to instrument the next run with; None runs the strategy untouched
+    pivot_candidate_checks = ()  # Methods called once per pivot candidate, counted by HHProfiler
+
     def __init__(self):
         self.pending = PendingNodes()
 
+    def reset(self, degrees=None):
+        """
+        Prepare the strategy for another sequence, as if it was created with `degrees`, keeping its
+        containers, so one strategy and its bins can realize many sequences (see havel_hakimi_batch).
+        """
+        self.pending.clear()
+
+    def create_bins(self) -> Bins:
+        """Return the (empty) bins that havel_hakimi_general fills for this strategy"""
+        return Bins()
+
     @abstractmethod
     def choose_pivot(self, bins: Bins) -> Tuple[int, int]:
         """Return (pivot_degree, pivot_node)"""
@@ -19,17 +44,23 @@ class HHStrategy(ABC):
 
     def choose_and_add_neighbors(self, bins: Bins, pivot_degree, pivot_node):
         """Return a list of neighbors to add"""
-        neighbors = []
+        return list(self.iter_neighbors(bins, pivot_degree, pivot_node))
+
+    def iter_neighbors(self, bins: Bins, pivot_degree, pivot_node):
+        """
+        Generator form of choose_and_add_neighbors: yield the neighbors one by one as they are chosen.
+        The chosen neighbors go back into the bins with their new degree when the generator is exhausted,
+        so it must be run to the end before the next pivot is chosen.
+        """
         self.pending.clear()
         for _ in range(pivot_degree):
             if bins.size == 0:
                 break
             neighbor_degree = bins.get_max_degree()
             neighbor_node = self.choose_neighbor(bins, neighbor_degree)
-            neighbors.append(neighbor_node)
+            yield neighbor_node
             new_degree = neighbor_degree - 1
             if new_degree > 0:
                 self.pending.add(new_degree, neighbor_node)
         
         self.pending.insert_into_bins(bins)
-        return neighbors
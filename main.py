@@ -1,15 +1,17 @@
 import argparse
 
 from rustworkx import max_weight_matching, undirected_gnp_random_graph
-from graph_utils import degree_sequence, degree_sequence_repr, edges_to_rustworkx_graph, generate_graph_with_perfect_matching, maximum_matching_size_numpy, parse_degree_sequence
+from graph_utils import degree_order, degree_sequence, degree_sequence_repr, edges_to_rustworkx_graph, generate_graph_with_perfect_matching, maximum_matching_size_numpy, parse_degree_sequence
 from havel_hakimi_algorithm import havel_hakimi_general
-from graph_visualization import visualize_graph
+from hh_profiler import HHProfiler
+from graph_visualization import LayoutCache, visualize_graph
 from strategies.max_degree_strategy import MaxDegreeStrategy
 from strategies.min_degree_strategy import MinDegreeStrategy
 from strategies.naive_matching_aware_strategy import NaiveMatchingAwareStrategy
 from strategies.random_strategy import RandomStrategy
 from strategies.matching_aware_strategy import MatchingAwareStrategy
 import matplotlib.pyplot as plt
+import numpy as np
 
 # Edit this line to change the default degree sequence
 # k = 5
@@ -31,6 +33,7 @@ def parse_args():
     parser.add_argument('--strategy', type=str, default="matching", choices=STRATEGY_MAP.keys(),
                         help="Strategy to use: max, min, random, matching (default: matching)")
     parser.add_argument('--p', type=float, default=0.1, help="Edge probability for random graph with perfect matching (default: 0.1)")
+    parser.add_argument('--profile', action='store_true', help="Print the time per phase and the hot-path counters of the run")
     return parser.parse_args()
 
 def get_degree_sequence(args):
@@ -75,7 +78,7 @@ def setup_visualization(degrees):
     fig.suptitle(f"Degree sequence: ({deg_seq_str}), n={n}", fontsize=16)
     return fig, axes, n, deg_seq_str
 
-def visualize_original_graph(original_edges, matching, axes, n):
+def visualize_original_graph(original_edges, matching, axes, n, layout_cache=None, layout_key=None):
     """
     Visualize the original graph if available
     """
@@ -84,14 +87,18 @@ def visualize_original_graph(original_edges, matching, axes, n):
             original_edges,
             highlight_edges=matching,
             ax=axes[0],
+            layout_cache=layout_cache,
+            layout_key=layout_key,
             title=f"Random Graph with Perfect Matching, matching size: {len(matching) if matching is not None else 0}/{n // 2}"
         )
     else:
         axes[0].set_visible(False)
 
-def run_and_visualize_havel_hakimi(degrees, strategy, axes, n):
+def run_and_visualize_havel_hakimi(degrees, strategy, axes, n, node_order=None, layout_cache=None, layout_key=None):
     """
-    Run Havel-Hakimi algorithm and visualize the resulting graph
+    Run Havel-Hakimi algorithm and visualize the resulting graph.
+    With `node_order` (the degree_order of the original graph), the graph is drawn on the nodes of
+    the original one, so both panels can share their layout.
     """
     is_graphical, edges = havel_hakimi_general(degrees, strategy=strategy)
     if is_graphical:
@@ -109,10 +116,16 @@ def run_and_visualize_havel_hakimi(degrees, strategy, axes, n):
         print(f"Matching size by algorithm: {matching_size}")
         print(f"Maximum matching size (resulting graph): {max_matching_size_graph}")
         print(f"Maximum matching size (degree sequence): {max_matching_size_degseq}")
+        if node_order is not None:
+            edges = node_order[np.asarray(edges, dtype=np.int64).reshape(-1, 2)]
+            if matching_edges:
+                matching_edges = node_order[np.asarray(matching_edges, dtype=np.int64)].tolist()
         visualize_graph(
             edges, 
             highlight_edges=matching_edges, 
             ax=axes[1],
+            layout_cache=layout_cache,
+            layout_key=layout_key,
             title=f"Graph from HH Algorithm ({strategy.__class__.__name__}), matching size: {matching_size}/{n // 2}"
         )
         return True
@@ -128,15 +141,23 @@ def main():
     degrees, original_edges, matching = get_degree_sequence(args)
 
     strategy = STRATEGY_MAP[args.strategy](degrees=degrees)
+    if args.profile:
+        strategy.profiler = HHProfiler()
 
     # Setup visualization
     fig, axes, n, _ = setup_visualization(degrees)
+    # The HH graph is drawn on the nodes of the original one, with its layout, computed once
+    layout_cache = LayoutCache()
+    layout_key = tuple(degrees)
+    node_order = degree_order(original_edges) if original_edges is not None else None
     
     # Visualize original graph if available
-    visualize_original_graph(original_edges, matching, axes, n)
+    visualize_original_graph(original_edges, matching, axes, n, layout_cache, layout_key)
     
     # Run Havel-Hakimi algorithm and visualize result
-    success = run_and_visualize_havel_hakimi(degrees, strategy, axes, n)
+    success = run_and_visualize_havel_hakimi(degrees, strategy, axes, n, node_order, layout_cache, layout_key)
+    if args.profile:
+        print(strategy.profiler.report(f"Havel-Hakimi profile ({strategy.__class__.__name__}, n={n})"))
     
     if success:
         plt.show()
@@ -146,19 +167,3 @@ if __name__ == "__main__":
     # import random
     # random.seed(42)
     main()
-
-
-# Uncomment for checking runtime of functions
-# if __name__ == "__main__":
-#     import cProfile
-#     import pstats
-
-#     with cProfile.Profile() as pr:
-#         main()  # or your entry function
-
-#     stats = pstats.Stats(pr)
-#     stats.strip_dirs()
-#     stats.sort_stats("cumulative")  # or "time"
-
-#     # Only show your module, e.g. anything inside "my_project/"
-#     stats.print_stats("strategy")  # adjust to match your file path
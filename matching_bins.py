@@ -0,0 +1,206 @@
+from itertools import islice
+from bins import Bins
+from hh_strategy import NotGraphicalError
+
+
+class _FenwickTree:
+    """
+    Fenwick (binary indexed) tree over the indices 1..capacity, supporting point updates,
+    prefix sums and a search for the longest prefix with a bounded sum, all in O(log capacity).
+    """
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.tree = [0] * (capacity + 1)
+
+    def add(self, index, delta):
+        tree = self.tree
+        while index <= self.capacity:
+            tree[index] += delta
+            index += index & -index
+
+    def clear(self):
+        self.tree = [0] * (self.capacity + 1)
+
+    def prefix_sum(self, index):
+        """Sum of the values at indices 1..index."""
+        tree = self.tree
+        total = 0
+        while index > 0:
+            total += tree[index]
+            index -= index & -index
+        return total
+
+    def last_index_with_prefix_at_most(self, target):
+        """Largest index (0..capacity) whose prefix sum is at most target. Requires non-negative values."""
+        index = 0
+        step = 1 << self.capacity.bit_length()
+        while step:
+            next_index = index + step
+            if next_index <= self.capacity and self.tree[next_index] <= target:
+                index = next_index
+                target -= self.tree[next_index]
+            step >>= 1
+        return index
+
+
+class MatchingBins(Bins):
+    def __init__(self, matching_nodes, max_degree=0, pop_pos=0):
+        """
+        Bins that also keep the unmatched and the matched nodes of every degree in separate bins,
+        in the same relative order as in the bins, so a pivot search can visit only the nodes
+        of one matching status.
+        The number of nodes and of unmatched nodes per degree are indexed by Fenwick trees,
+        so the "top nodes" of a pivot (all bins from the highest degree down, until they hold
+        enough nodes) can be counted and checked in O(log max_degree) without listing them.
+
+        Args:
+            matching_nodes (set): The matched nodes, shared with the strategy. The matching status
+                of a node is read when it enters the bins, so it must not change while the node is in them.
+            max_degree (int, optional): The largest expected degree. The index grows if a larger degree is added.
+            pop_pos (int, optional): Default position to pop from.
+        """
+        super().__init__(pop_pos=pop_pos)
+        self.matching_nodes = matching_nodes
+        self.unmatched_bins = Bins()  # The unmatched nodes, in bins order
+        self.matched_bins = Bins()  # The matched nodes, in bins order
+        self._count_tree = _FenwickTree(max(max_degree, 1))
+        self._unmatched_tree = _FenwickTree(max(max_degree, 1))
+
+    def clear(self):
+        super().clear()
+        self.unmatched_bins.clear()
+        self.matched_bins.clear()
+        self._count_tree.clear()
+        self._unmatched_tree.clear()
+
+    def add_node(self, degree, node_id, index=None):
+        self._ensure_capacity(degree)
+        super().add_node(degree, node_id, index=index)
+        is_matched = node_id in self.matching_nodes
+        if index is not None and index != 0:
+            # Position among the nodes of the same matching status
+            index = sum(1 for nid in islice(self.bins[degree], index) if (nid in self.matching_nodes) == is_matched)
+        if is_matched:
+            self.matched_bins.add_node(degree, node_id, index=index)
+        else:
+            self.unmatched_bins.add_node(degree, node_id, index=index)
+        self._count(degree, 1, 0 if is_matched else 1)
+
+    def prepend_nodes(self, degree, node_ids):
+        if not node_ids:
+            return
+        self._ensure_capacity(degree)
+        super().prepend_nodes(degree, node_ids)
+        matched = [node_id for node_id in node_ids if node_id in self.matching_nodes]
+        unmatched = [node_id for node_id in node_ids if node_id not in self.matching_nodes]
+        self.matched_bins.prepend_nodes(degree, matched)
+        self.unmatched_bins.prepend_nodes(degree, unmatched)
+        self._count(degree, len(node_ids), len(unmatched))
+
+    def pop_node(self, degree, pop_pos=None):
+        node_id = super().pop_node(degree, pop_pos=pop_pos)
+        self._remove_from_status_bins(node_id, degree)
+        return node_id
+
+    def pop_node_by_id(self, node_id, degree):
+        super().pop_node_by_id(node_id, degree)
+        self._remove_from_status_bins(node_id, degree)
+        return node_id
+
+    def _remove_from_status_bins(self, node_id, degree):
+        if node_id in self.matching_nodes:
+            self.matched_bins.pop_node_by_id(node_id, degree)
+            self._count(degree, -1, 0)
+        else:
+            self.unmatched_bins.pop_node_by_id(node_id, degree)
+            self._count(degree, -1, -1)
+
+    def _count(self, degree, delta, unmatched_delta):
+        self._count_tree.add(degree, delta)
+        if unmatched_delta:
+            self._unmatched_tree.add(degree, unmatched_delta)
+
+    def _unmatched_count(self, degree):
+        """Number of unmatched nodes with the given degree."""
+        unmatched_bin = self.unmatched_bins.bins.get(degree)
+        return len(unmatched_bin) if unmatched_bin is not None else 0
+
+    def _ensure_capacity(self, degree):
+        """
+        Rebuild the trees from the current bins if `degree` is beyond their capacity.
+        """
+        if degree <= self._count_tree.capacity:
+            return
+        capacity = max(degree, 2 * self._count_tree.capacity)
+        Bins.rebuilds += 1
+        self._count_tree = _FenwickTree(capacity)
+        self._unmatched_tree = _FenwickTree(capacity)
+        for d, node_bin in self.bins.items():
+            self._count_tree.add(d, len(node_bin))
+        for d, node_bin in self.unmatched_bins.bins.items():
+            self._unmatched_tree.add(d, len(node_bin))
+
+    def _suffix_count(self, degree):
+        """Number of nodes with degree >= `degree`."""
+        return self.size - self._count_tree.prefix_sum(degree - 1)
+
+    def _suffix_unmatched(self, degree):
+        """Number of unmatched nodes with degree >= `degree`."""
+        return self.unmatched_bins.size - self._unmatched_tree.prefix_sum(degree - 1)
+
+    def _threshold(self, count):
+        """Largest degree t such that at least `count` nodes have degree >= t (0 if there are not enough nodes)."""
+        if count > self.size:
+            return 0
+        return self._count_tree.last_index_with_prefix_at_most(self.size - count) + 1
+
+    def top_threshold(self, degree, node_degree):
+        """
+        The lowest degree among the top nodes for a pivot: the bins are taken from the highest
+        degree down until they hold at least `degree` nodes, not counting the pivot itself.
+
+        Args:
+            degree (int): The number of top nodes needed (the degree of the pivot).
+            node_degree (int): The degree of the pivot, which is excluded from the top nodes.
+
+        Returns:
+            int: The degree of the last bin in the top nodes.
+        """
+        threshold = self._threshold(degree)
+        if threshold <= node_degree:
+            # The pivot is within the top bins, so one more node is needed
+            threshold = self._threshold(degree + 1)
+        if threshold == 0:
+            raise NotGraphicalError(f"not enough top nodes found for a pivot of degree {degree}")
+        return threshold
+
+    def top_has_unmatched(self, degree, node_id, node_degree):
+        """
+        Check whether the top nodes for the pivot `node_id` contain an unmatched node.
+        """
+        threshold = self.top_threshold(degree, node_degree)
+        unmatched = self._suffix_unmatched(threshold)
+        if node_degree >= threshold and node_id not in self.matching_nodes:
+            unmatched -= 1
+        return unmatched > 0
+
+    def top_allows_matched_pivot(self, degree, node_id, node_degree):
+        """
+        Check whether the top nodes for the pivot `node_id` contain enough matched nodes:
+        all the top nodes above the lowest top degree are matched, and the matched nodes
+        of the lowest top degree can fill the rest of the `degree` neighbors.
+        """
+        threshold = self.top_threshold(degree, node_degree)
+        node_matched = node_id in self.matching_nodes
+        high_count = self._suffix_count(threshold + 1)
+        high_unmatched = self._suffix_unmatched(threshold + 1)
+        if node_degree > threshold:
+            high_count -= 1
+            if not node_matched:
+                high_unmatched -= 1
+        if high_unmatched > 0:
+            return False
+        min_degree_matched = len(self.bins[threshold]) - self._unmatched_count(threshold)
+        if node_degree == threshold and node_matched:
+            min_degree_matched -= 1
+        return min_degree_matched >= degree - high_count
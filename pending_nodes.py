@@ -17,10 +17,10 @@ class PendingNodes:
     def insert_into_bins(self, bins: Bins):
         """
         Insert all pending nodes back into bins, preserving the order they were popped.
-        Each node is inserted at the beginning of its bin, so the first popped ends up first.
+        The nodes of each degree are inserted as one run at the beginning of their bin, so the first popped ends up first.
+        This costs O(number of pending nodes), regardless of the size of the bins.
         *Important Note*: This does not necessarily preserve the original order of nodes within each degree bin!
         (e.g. when choosing the neighbors from random locations in the bin)
         """
         for degree, nodes in self.pending.items():
-            for node in reversed(nodes):
-                bins.add_node(degree, node, index=0)
+            bins.prepend_nodes(degree, nodes)
@@ -0,0 +1,165 @@
+import glob
+import json
+import os
+import shutil
+
+import numpy as np
+
+from utils import ensure_dir
+
+
+# Columns of the experiment records, with their types. Unknown values are stored as -1 (NaN for floats).
+RESULT_COLUMNS = {
+    "n": np.int32,
+    "p": np.float64,  # The parameter of the sweep: edge probability, power-law exponent or degree
+    "seed": np.int64,
+    "round": np.int32,
+    "matching_size": np.int32,  # Size of the matching built by the strategy
+    "matching_bound": np.int32,  # maximum_matching_size_numpy of the degree sequence
+    "original_matching": np.int32,  # Maximum matching size of the original graph
+    "seconds": np.float64,  # Time spent realizing the sequence, NaN if the result came from the HH cache
+}
+SCHEMA_FILENAME = "schema.json"
+
+
+def _missing(dtype):
+    return np.nan if np.issubdtype(dtype, np.floating) else -1
+
+
+class ResultBuffer:
+    def __init__(self):
+        """
+        Records collected column by column, as plain lists so a buffer is cheap to append to and
+        to send back from a sweep worker. Write it with `ResultWriter.write`.
+        """
+        self.columns = {name: [] for name in RESULT_COLUMNS}
+
+    def append(self, **row):
+        """
+        Add a record. Columns that are not given are stored as unknown.
+        """
+        unknown = row.keys() - RESULT_COLUMNS.keys()
+        if unknown:
+            raise ValueError(f"unknown result columns: {sorted(unknown)}")
+        for name, dtype in RESULT_COLUMNS.items():
+            value = row.get(name)
+            self.columns[name].append(_missing(dtype) if value is None else value)
+
+    def __len__(self):
+        return len(self.columns["n"])
+
+
+class ResultWriter:
+    def __init__(self, directory, mode="w", chunk_rows=1 << 16):
+        """
+        Append-only writer of experiment records as a directory of chunked .npz files.
+
+        The directory holds a `schema.json` header with the columns and their types, and
+        chunk_000000.npz, chunk_000001.npz, ... with one array per column. Records are buffered
+        and a chunk is written every `chunk_rows` records and on `close`, so a crash loses at most
+        the unwritten chunk. `load_results` reads the whole directory back as one array per column.
+
+        Args:
+            directory (str): The records directory.
+            mode (str, optional): "w" replaces existing records, "a" appends to them. Defaults to "w".
+            chunk_rows (int, optional): Records per chunk. Defaults to 65536.
+        """
+        if mode not in ("w", "a"):
+            raise ValueError(f"mode must be 'w' or 'a', not {mode!r}")
+        self.directory = directory
+        self.chunk_rows = chunk_rows
+        if mode == "w" and os.path.exists(directory):
+            shutil.rmtree(directory)
+        ensure_dir(directory)
+        schema = {name: np.dtype(dtype).str for name, dtype in RESULT_COLUMNS.items()}
+        schema_path = os.path.join(directory, SCHEMA_FILENAME)
+        if os.path.exists(schema_path):
+            with open(schema_path) as schema_file:
+                if json.load(schema_file) != schema:
+                    raise ValueError(f"the records in {directory} have another schema")
+        else:
+            with open(schema_path, "w") as schema_file:
+                json.dump(schema, schema_file, indent=2)
+        self._next_chunk = len(_chunk_paths(directory))
+        self._buffer = ResultBuffer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def append(self, **row):
+        self._buffer.append(**row)
+        if len(self._buffer) >= self.chunk_rows:
+            self.flush()
+
+    def write(self, records, **constants):
+        """
+        Append the records of a ResultBuffer, with `constants` (e.g. seed=...) set in all of them.
+        """
+        for name, values in records.columns.items():
+            if name in constants:
+                value = constants[name]
+                values = [_missing(RESULT_COLUMNS[name]) if value is None else value] * len(records)
+            self._buffer.columns[name].extend(values)
+        if len(self._buffer) >= self.chunk_rows:
+            self.flush()
+
+    def flush(self):
+        if not len(self._buffer):
+            return
+        arrays = {name: np.asarray(values, dtype=RESULT_COLUMNS[name]) for name, values in self._buffer.columns.items()}
+        chunk_path = os.path.join(self.directory, f"chunk_{self._next_chunk:06d}.npz")
+        # Written under a temporary name first, so a reader never sees half a chunk
+        temp_path = chunk_path + ".tmp.npz"
+        np.savez_compressed(temp_path, **arrays)
+        os.replace(temp_path, chunk_path)
+        self._next_chunk += 1
+        self._buffer = ResultBuffer()
+
+    def close(self):
+        self.flush()
+
+    @property
+    def chunk_count(self):
+        """Number of chunks written, by this writer and before it."""
+        return self._next_chunk
+
+
+def _chunk_paths(directory):
+    return sorted(glob.glob(os.path.join(directory, "chunk_[0-9]*[0-9].npz")))
+
+
+def truncate_results(directory, chunk_count):
+    """
+    Delete the chunks after the first `chunk_count`, e.g. the ones written after a checkpoint.
+    """
+    for chunk_path in _chunk_paths(directory)[chunk_count:]:
+        os.remove(chunk_path)
+
+
+def load_results(directory, columns=None):
+    """
+    Load the records written by a ResultWriter.
+
+    Args:
+        directory (str): The records directory.
+        columns (list[str], optional): The columns to load. Defaults to all of them.
+
+    Returns:
+        dict[str, np.ndarray]: One array per column, with the records in the order they were written.
+    """
+    columns = list(RESULT_COLUMNS) if columns is None else columns
+    parts = {name: [] for name in columns}
+    for chunk_path in _chunk_paths(directory):
+        with np.load(chunk_path) as chunk:
+            for name in columns:
+                parts[name].append(chunk[name])
+    return {name: np.concatenate(arrays) if arrays else np.empty(0, dtype=RESULT_COLUMNS[name])
+            for name, arrays in parts.items()}
+
+
+def records_dir_for(log_path):
+    """The records directory that goes with a text log: the log path without its extension, plus "_records"."""
+    return os.path.splitext(log_path)[0] + "_records"
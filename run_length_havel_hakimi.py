@@ -0,0 +1,191 @@
+from bisect import bisect_left, insort
+from collections import deque
+from typing import Iterator, List, Tuple
+
+
+class RunBins:
+    def __init__(self):
+        """
+        Bins that hold the nodes of every degree as runs of consecutive node IDs.
+
+        Each bin is a deque of (start, stop) ranges in bin order, so a bin of 10^7 nodes with
+        consecutive IDs is a single entry. Nodes are only taken from the front of a bin and
+        put back at the front, which is how the max degree strategy uses its bins, so every
+        operation costs time proportional to the number of runs it touches.
+        """
+        self.bins = dict()  # degree -> deque of (start, stop) node ID ranges
+        self.counts = dict()  # degree -> number of nodes in the bin
+        self.size = 0  # Total number of nodes across all bins
+        self._degrees = []  # Degrees of the non-empty bins, in ascending order
+
+    def append_run(self, degree, start, stop):
+        """
+        Add the nodes start..stop-1 at the end of the bin of the given degree.
+        """
+        if stop <= start:
+            return
+        runs = self._get_bin(degree)
+        if runs and runs[-1][1] == start:
+            runs[-1] = (runs[-1][0], stop)
+        else:
+            runs.append((start, stop))
+        self.counts[degree] += stop - start
+        self.size += stop - start
+
+    def prepend_runs(self, degree, runs):
+        """
+        Insert runs of nodes at the beginning of the bin of the given degree, keeping their order.
+
+        Args:
+            degree (int): The degree of the nodes.
+            runs (list[tuple[int, int]]): (start, stop) node ID ranges, in the order they should appear in the bin.
+        """
+        if not runs:
+            return
+        node_bin = self._get_bin(degree)
+        count = 0
+        for start, stop in reversed(runs):
+            if node_bin and node_bin[0][0] == stop:
+                node_bin[0] = (start, node_bin[0][1])
+            else:
+                node_bin.appendleft((start, stop))
+            count += stop - start
+        self.counts[degree] += count
+        self.size += count
+
+    def pop_runs(self, degree, count):
+        """
+        Remove the first `count` nodes of the bin of the given degree.
+
+        Returns:
+            list[tuple[int, int]]: The removed nodes as (start, stop) ranges, in bin order.
+        """
+        node_bin = self.bins[degree]
+        if count > self.counts[degree]:
+            raise ValueError(f"cannot pop {count} nodes from the bin of degree {degree}")
+        taken = []
+        remaining = count
+        while remaining:
+            start, stop = node_bin[0]
+            if stop - start <= remaining:
+                node_bin.popleft()
+                taken.append((start, stop))
+                remaining -= stop - start
+            else:
+                node_bin[0] = (start + remaining, stop)
+                taken.append((start, start + remaining))
+                remaining = 0
+        self.counts[degree] -= count
+        self.size -= count
+        if not self.counts[degree]:
+            del self.bins[degree]
+            del self.counts[degree]
+            del self._degrees[bisect_left(self._degrees, degree)]
+        return taken
+
+    def _get_bin(self, degree):
+        node_bin = self.bins.get(degree)
+        if node_bin is None:
+            node_bin = self.bins[degree] = deque()
+            self.counts[degree] = 0
+            insort(self._degrees, degree)
+        return node_bin
+
+    def get_max_degree(self):
+        """
+        Get the maximum degree present in the bins.
+        """
+        if not self._degrees:
+            raise ValueError("get_max_degree() called on empty bins")
+        return self._degrees[-1]
+
+    def __len__(self):
+        """
+        Return the total number of bins (distinct degrees).
+        """
+        return len(self.bins)
+
+    def __str__(self) -> str:
+        return f"RunBins(size={self.size}, bins={dict((degree, list(self.bins[degree])) for degree in reversed(self._degrees))})"
+
+
+def havel_hakimi_runs(runs: List[Tuple[int, int]]) -> Tuple[bool, List[Tuple[int, int, int]]]:
+    """
+    Havel-Hakimi with the max degree strategy on a run-length degree sequence.
+
+    The sequence is given as (degree, count) runs, as returned by
+    `parse_degree_sequence(..., as_runs=True)`, and nodes are numbered consecutively as if the
+    runs were expanded. Pivots and neighbors are taken as ranges of node IDs, so the node-level
+    sequence is never built and the running time is proportional to the number of edge runs.
+    The realization is the same as `havel_hakimi_general` with `MaxDegreeStrategy`.
+
+    Args:
+        runs (list[tuple[int, int]]): The degree sequence as (degree, count) runs.
+
+    Returns:
+        bool, list[tuple]: True if the sequence is graphical, False otherwise. If True, also returns
+            the edges as (pivot, start, stop) runs, each standing for the edges from `pivot` to
+            every node in start..stop-1. Use `iter_run_edges` to expand them.
+    """
+    bins = RunBins()
+    node_id = 0
+    max_degree = 0
+    for degree, count in runs:
+        # Runs of zero count stand for no node, so their degree must not count towards max_degree
+        if degree > 0 and count > 0:
+            bins.append_run(degree, node_id, node_id + count)
+            max_degree = max(max_degree, degree)
+        node_id += count
+
+    # A vertex cannot have more neighbors than there are other vertices
+    if bins.size > 0 and max_degree >= bins.size:
+        return False, []
+
+    edge_runs = []
+    while bins.size > 0:
+        pivot_degree = bins.get_max_degree()
+        start, stop = bins.bins[pivot_degree][0]
+        step = pivot_degree + 1
+        batch = (stop - start) // step
+        if batch:
+            # The first run of the top bin holds the next `batch` pivots together with all their
+            # neighbors, so they are realized at once: every block of pivot_degree + 1 nodes
+            # becomes a pivot followed by its neighbors.
+            bins.pop_runs(pivot_degree, batch * step)
+            pivots = range(start, start + batch * step, step)
+            edge_runs.extend((pivot, pivot + 1, pivot + step) for pivot in pivots)
+            if pivot_degree > 1:
+                bins.prepend_runs(pivot_degree - 1, [(pivot + 1, pivot + step) for pivot in reversed(pivots)])
+            continue
+
+        pivot_vertex = bins.pop_runs(pivot_degree, 1)[0][0]
+
+        if pivot_degree > bins.size:
+            return False, []
+
+        # The neighbors are the first nodes of the bins from the highest degree down,
+        # and each bin's share goes back to the front of the bin one degree lower.
+        pending = []
+        remaining = pivot_degree
+        while remaining:
+            neighbor_degree = bins.get_max_degree()
+            neighbor_runs = bins.pop_runs(neighbor_degree, min(remaining, bins.counts[neighbor_degree]))
+            for start, stop in neighbor_runs:
+                edge_runs.append((pivot_vertex, start, stop))
+                remaining -= stop - start
+            if neighbor_degree > 1:
+                pending.append((neighbor_degree - 1, neighbor_runs))
+
+        for degree, neighbor_runs in pending:
+            bins.prepend_runs(degree, neighbor_runs)
+
+    return True, edge_runs
+
+
+def iter_run_edges(edge_runs: List[Tuple[int, int, int]]) -> Iterator[Tuple[int, int]]:
+    """
+    Expand (pivot, start, stop) edge runs into (pivot, neighbor) edges, in order.
+    """
+    for pivot, start, stop in edge_runs:
+        for neighbor in range(start, stop):
+            yield pivot, neighbor
@@ -1,9 +1,12 @@
 from typing import Dict, List, Tuple
 from bins import Bins
-from hh_strategy import HHStrategy
+from hh_strategy import HHStrategy, NotGraphicalError
+from matching_bins import MatchingBins
 from pending_nodes import PendingNodes
 
 class MatchingAwareStrategy(HHStrategy):
+    pivot_candidate_checks = ("check_neighbors_for_unmatched_pivot", "check_neighbors_for_matched_pivot")
+
     def __init__(self, degrees=None):
         self.matching_nodes = set()
         self.matching_edges = list()
@@ -13,18 +16,35 @@ class MatchingAwareStrategy(HHStrategy):
         self.n = len(degrees) if degrees is not None else 0
         self.perfect_matching_size = self.n // 2
 
+    def reset(self, degrees=None):
+        super().reset(degrees)
+        self.matching_nodes.clear()  # Cleared in place, the bins created by the strategy share it
+        self.matching_edges = list()
+        self.current_top_nodes = dict()
+        self.degrees = degrees
+        self.n = len(degrees) if degrees is not None else 0
+        self.perfect_matching_size = self.n // 2
+
+    def create_bins(self) -> MatchingBins:
+        max_degree = max(self.degrees) if self.degrees else 0
+        return MatchingBins(self.matching_nodes, max_degree=max_degree)
+
     def choose_neighbor(self, bins: Bins, neighbor_degree: int):
         pass
 
-    def choose_pivot(self, bins: Bins):
+    def choose_pivot(self, bins: MatchingBins):
         """
         Choose a pivot node from the bins that is not already in the matching, 
         preferring nodes with potential unmatched neighbors among the top degree nodes.
         If no such node is found, returns the last node considered (with smallest degree) 
         even if it is already in the matching.
 
+        Only the unmatched nodes are visited as candidates first, then only the matched ones.
+        The top nodes of each candidate are checked with the counts kept by the bins,
+        in O(log n), and only built for the chosen pivot.
+
         Args:
-            bins (Bins): The bins data structure containing nodes grouped by degree.
+            bins (MatchingBins): The bins data structure containing nodes grouped by degree.
 
         Returns:
             Tuple[int, int]: The degree and node id of the chosen pivot.
@@ -36,12 +56,11 @@ class MatchingAwareStrategy(HHStrategy):
         # Commented out lines are for choosing the node with the minimum degree (seems to give worse results)
         # best_min_degree_node = None
         # best_min_degree_top_nodes = None
-        for degree, node_id in bins:
-            top_nodes = self._get_top_nodes_for_degree(bins, degree, node_id)
-            if (node_id not in self.matching_nodes) and self.check_neighbors_for_unmatched_pivot(top_nodes):
+        for degree, node_id in bins.unmatched_bins:
+            if self.check_neighbors_for_unmatched_pivot(bins, degree, node_id):
                 # If we find an unmatched node with an unmatched neighbor, we can use it as a pivot
                 # Remove the node from bins and return it
-                self.current_top_nodes = top_nodes
+                self.current_top_nodes = self._get_top_nodes_for_degree(bins, degree, node_id)
                 bins.pop_node_by_id(node_id, degree)
                 return (degree, node_id)
                 # if best_min_degree_node is None or degree < best_min_degree_node[1]:
@@ -58,50 +77,33 @@ class MatchingAwareStrategy(HHStrategy):
         # if len(self.matching_edges) < self.perfect_matching_size:
         #     print("Matching size is less than maximum (perfect) matching size, and no unmatched pivot found!")
         
-        for degree, node_id in bins:
-            top_nodes = self._get_top_nodes_for_degree(bins, degree, node_id)
-            if (node_id in self.matching_nodes) and self.check_neighbors_for_matched_pivot(top_nodes, degree):
+        for degree, node_id in bins.matched_bins:
+            if self.check_neighbors_for_matched_pivot(bins, degree, node_id):
                 # If we find a matched node with enough matched neighbors, we can use it as a pivot
                 # Remove the node from bins and return it
-                self.current_top_nodes = top_nodes
+                self.current_top_nodes = self._get_top_nodes_for_degree(bins, degree, node_id)
                 bins.pop_node_by_id(node_id, degree)
                 return (degree, node_id)
         
         # If we reach here, we didn't find any unmatched pivot, so we return the last node considered
+        degree, node_id = bins.get_last_node()
         print("No suitable pivot found! returning", node_id, "with degree", degree)
         self.current_top_nodes = self._get_top_nodes_for_degree(bins, degree, node_id)
         bins.pop_node_by_id(node_id, degree)
         return (degree, node_id)
     
-    def check_neighbors_for_unmatched_pivot(self, top_nodes: Dict[int, int]) -> bool:
+    def check_neighbors_for_unmatched_pivot(self, bins: MatchingBins, degree: int, node_id: int) -> bool:
         """
-        Check if there are any unmatched neighbors in the top nodes.
+        Check if there are any unmatched neighbors in the top nodes of the given node.
         """
-        for neighbor_id in top_nodes.keys():
-            if neighbor_id not in self.matching_nodes:
-                return True
-
-        return False
+        return bins.top_has_unmatched(degree, node_id, degree)
     
-    def check_neighbors_for_matched_pivot(self, top_nodes: Dict[int, int], degree: int) -> bool:
+    def check_neighbors_for_matched_pivot(self, bins: MatchingBins, degree: int, node_id: int) -> bool:
         """
-        Check if the top nodes contain enough matched neighbors for the pivot node.
+        Check if the top nodes of the given node contain enough matched neighbors for it as a pivot:
+        all neighbors above the minimum top degree are matched, and enough of the minimum degree ones are.
         """
-        min_deg_neighbor = min(top_nodes.values()) if top_nodes else 0
-        high_deg_neighbors_count = 0
-        min_deg_neighbors_matched_count = 0
-
-        for neighbor_id in top_nodes.keys():
-            deg = top_nodes[neighbor_id]
-            if deg > min_deg_neighbor:
-                high_deg_neighbors_count += 1
-                if neighbor_id not in self.matching_nodes:
-                    return False
-            else:  # deg == min_deg_neighbor
-                if neighbor_id in self.matching_nodes:
-                    min_deg_neighbors_matched_count += 1
-
-        return min_deg_neighbors_matched_count >= (degree - high_deg_neighbors_count)
+        return bins.top_allows_matched_pivot(degree, node_id, degree)
 
     def choose_and_add_neighbors(self, bins: Bins, pivot_degree: int, pivot_vertex: int):
         """
@@ -131,10 +133,18 @@ class MatchingAwareStrategy(HHStrategy):
         # Add to matching if appropriate
         self._update_matching(min_unmatched_node, pivot_vertex, is_pivot_unmatched)
         
-        assert len(neighbors) == pivot_degree, f"Not enough neighbors found for pivot {pivot_vertex} with degree {pivot_degree}."
+        if len(neighbors) < pivot_degree:
+            raise NotGraphicalError(f"not enough neighbors found for pivot {pivot_vertex} with degree {pivot_degree}")
         self.pending.insert_into_bins(bins)
         return neighbors
     
+    def iter_neighbors(self, bins: Bins, pivot_degree: int, pivot_vertex: int):
+        """
+        Generator form of choose_and_add_neighbors. The neighbors are chosen together
+        from the top nodes, so they are yielded once all of them are selected.
+        """
+        yield from self.choose_and_add_neighbors(bins, pivot_degree, pivot_vertex)
+
     def _prepare_sorted_nodes(self, pivot_vertex: int):
         """
         Prepares and sorts nodes based on degree and matching status.
@@ -238,6 +248,7 @@ class MatchingAwareStrategy(HHStrategy):
                     top_nodes[nid2] = top_degree
             if len(top_nodes) >= degree:
                 break
-        assert len(top_nodes) >= degree, f"Not enough top nodes found for degree {degree}."
+        if len(top_nodes) < degree:
+            raise NotGraphicalError(f"not enough top nodes found for a pivot of degree {degree}")
         return top_nodes
 
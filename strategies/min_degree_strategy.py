@@ -7,7 +7,7 @@ class MinDegreeStrategy(HHStrategy):
         self.pending = PendingNodes()
 
     def choose_pivot(self, bins: Bins):
-        degree = min(bins.bins)
+        degree = bins.get_min_degree()
         node = bins.pop_node(degree, pop_pos=-1)
         return degree, node
 
@@ -1,16 +1,27 @@
 from typing import List
-from hh_strategy import HHStrategy
+from hh_strategy import HHStrategy, NotGraphicalError
 from bins import Bins
+from matching_bins import MatchingBins
 from pending_nodes import PendingNodes
 
 
 class NaiveMatchingAwareStrategy(HHStrategy):
+    pivot_candidate_checks = ("get_top_neighbors",)
+
     def __init__(self, degrees=None):
         self.matching_nodes = set()
         self.matching_edges = list()
         self.pending = PendingNodes()
 
-    def choose_pivot(self, bins: Bins):
+    def reset(self, degrees=None):
+        super().reset(degrees)
+        self.matching_nodes.clear()  # Cleared in place, the bins created by the strategy share it
+        self.matching_edges = list()
+
+    def create_bins(self) -> MatchingBins:
+        return MatchingBins(self.matching_nodes)
+
+    def choose_pivot(self, bins: MatchingBins):
         """
         Choose a pivot node from the bins that is not already in the matching, 
         preferring nodes with potential unmatched neighbors among the top degree nodes.
@@ -18,33 +29,33 @@ class NaiveMatchingAwareStrategy(HHStrategy):
         even if it is already in the matching.
 
         Args:
-            bins (Bins): The bins data structure containing nodes grouped by degree.
+            bins (MatchingBins): The bins data structure containing nodes grouped by degree.
 
         Returns:
             Tuple[int, int]: The degree and node id of the chosen pivot.
         """
         # Finds a pivot node that is not in the matching and has at least one unmatched neighbor
-        for degree, node_id in bins:
-            if node_id not in self.matching_nodes:
-                top_neighbors = self.get_top_neighbors(bins, node_id, degree)
-                if any(not neighbor[-1] for neighbor in top_neighbors):
-                    # If there is at least one unmatched neighbor, we can use this node as a pivot
-                    # Remove the node from bins and return it
-                    bins.pop_node_by_id(node_id, degree)
-                    return degree, node_id
+        for degree, node_id in bins.unmatched_bins:
+            top_neighbors = self.get_top_neighbors(bins, node_id, degree)
+            if any(not neighbor[-1] for neighbor in top_neighbors):
+                # If there is at least one unmatched neighbor, we can use this node as a pivot
+                # Remove the node from bins and return it
+                bins.pop_node_by_id(node_id, degree)
+                return degree, node_id
         # Finds a pivot node that is in the matching, and has at least "degree" unmatched neighbors
-        for degree, node_id in bins:
-            if node_id in self.matching_nodes:
-                top_neighbors = self.get_top_neighbors(bins, node_id, degree)
-                min_neighbor_degree = min(neighbor[1] for neighbor in top_neighbors)
-                high_deg_neighbor = [neighbor for neighbor in top_neighbors if neighbor[1] > min_neighbor_degree]
-                min_deg_matched_neighbors = [neighbor for neighbor in top_neighbors if neighbor[1] == min_neighbor_degree and neighbor[-1]]
-                necessary_min_deg_count = degree - len(high_deg_neighbor)
-                if len(min_deg_matched_neighbors) >= necessary_min_deg_count and all(neighbor[-1] for neighbor in high_deg_neighbor):
-                    # If there are enough matched neighbors, we can use this node as a pivot
-                    # Remove the node from bins and return it
-                    bins.pop_node_by_id(node_id, degree)
-                    return degree, node_id
+        for degree, node_id in bins.matched_bins:
+            top_neighbors = self.get_top_neighbors(bins, node_id, degree)
+            min_neighbor_degree = min(neighbor[1] for neighbor in top_neighbors)
+            high_deg_neighbor = [neighbor for neighbor in top_neighbors if neighbor[1] > min_neighbor_degree]
+            min_deg_matched_neighbors = [neighbor for neighbor in top_neighbors if neighbor[1] == min_neighbor_degree and neighbor[-1]]
+            necessary_min_deg_count = degree - len(high_deg_neighbor)
+            if len(min_deg_matched_neighbors) >= necessary_min_deg_count and all(neighbor[-1] for neighbor in high_deg_neighbor):
+                # If there are enough matched neighbors, we can use this node as a pivot
+                # Remove the node from bins and return it
+                bins.pop_node_by_id(node_id, degree)
+                return degree, node_id
+        # No suitable pivot, return the last node in the bins
+        degree, node_id = bins.get_last_node()
         bins.pop_node_by_id(node_id, degree)
         return degree, node_id
 
@@ -102,6 +113,13 @@ class NaiveMatchingAwareStrategy(HHStrategy):
         return neighbors
 
     
+    def iter_neighbors(self, bins: Bins, pivot_degree: int, pivot_vertex: int):
+        """
+        Generator form of choose_and_add_neighbors. The neighbors are chosen together
+        from the top nodes, so they are yielded once all of them are selected.
+        """
+        yield from self.choose_and_add_neighbors(bins, pivot_degree, pivot_vertex)
+
     def get_top_neighbors(self, bins: Bins, pivot_vertex: int, pivot_degree: int):
         """
         Get the top neighbors for a given pivot vertex and degree.
@@ -123,7 +141,8 @@ class NaiveMatchingAwareStrategy(HHStrategy):
             for node_id in bins.bins[degree]:
                 if node_id != pivot_vertex:
                     neighbors.append((node_id, degree, node_id in self.matching_nodes))
-        
+        if len(neighbors) < pivot_degree:
+            raise NotGraphicalError(f"not enough top nodes found for a pivot of degree {pivot_degree}")
         return neighbors
     
     def get_neighbor_and_degree_to_match(self, neighbors):
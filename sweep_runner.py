@@ -0,0 +1,198 @@
+import argparse
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from results_store import truncate_results
+
+
+def run_sweep(task: Callable, cells: Sequence[tuple], workers: int = 1, seed: Optional[int] = None,
+              chunksize: Optional[int] = None) -> List:
+    """
+    Run `task(*cell, seed_sequence=...)` for every cell of an experiment grid and return the
+    results in cell order.
+
+    Every cell gets its own child of SeedSequence(seed), spawned up front, so the random stream of
+    a cell only depends on the seed and on its position in the grid. The results are therefore the
+    same for any number of workers, and merging them in cell order keeps the outputs deterministic.
+
+    Args:
+        task (Callable): A module-level function (it is pickled to the workers).
+        cells (Sequence[tuple]): The positional arguments of every call.
+        workers (int, optional): Number of worker processes. 1 runs the cells in this process,
+            0 or less uses all CPUs. Defaults to 1.
+        seed (int, optional): Root seed of the per-cell streams. Defaults to fresh entropy.
+        chunksize (int, optional): Cells sent to a worker at a time. Defaults to about four chunks per worker.
+
+    Returns:
+        list: The result of every cell, in the order of `cells`.
+    """
+    return list(iter_sweep(task, cells, workers=workers, seed=seed, chunksize=chunksize))
+
+def iter_sweep(task: Callable, cells: Sequence[tuple], workers: int = 1, seed: Optional[int] = None,
+               start: int = 0, chunksize: Optional[int] = None) -> Iterator:
+    """
+    Generator form of `run_sweep`: yield the results in cell order as soon as they are ready,
+    so they can be written (and checkpointed, see SweepCheckpoint) while the sweep runs.
+    The cells before `start` are skipped. The streams are spawned for all the cells, so the
+    others get the same streams as in a sweep from the first cell.
+    """
+    seed_sequences = np.random.SeedSequence(seed).spawn(len(cells))
+    calls = [(task, cell, seed_sequence) for cell, seed_sequence in zip(cells, seed_sequences)][start:]
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    if workers == 1 or len(calls) <= 1:
+        for call in calls:
+            yield _run_cell(call)
+        return
+    if chunksize is None:
+        chunksize = max(1, len(calls) // (4 * workers))
+    with ProcessPoolExecutor(max_workers=min(workers, len(calls))) as executor:
+        # map returns the results in submission order, whatever order the workers finish in
+        yield from executor.map(_run_cell, calls, chunksize=chunksize)
+
+def _run_cell(call):
+    task, cell, seed_sequence = call
+    return task(*cell, seed_sequence=seed_sequence)
+
+def sweep_arg_parser(description: str) -> argparse.ArgumentParser:
+    """
+    Argument parser with the options shared by the experiment scripts.
+    """
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Number of worker processes for the sweep (default: 1, 0 for all CPUs)")
+    parser.add_argument('--profile', action='store_true',
+                        help="Print the time per phase and the hot-path counters of every Havel-Hakimi run")
+    parser.add_argument('--resume', action='store_true',
+                        help="Resume an interrupted sweep from its checkpoints, appending to its outputs")
+    return parser
+
+def sweep_seeds(path: str, count: int, resume: bool = False) -> List[int]:
+    """
+    Draw `count` seeds for a seed sweep and save them to `path`, or with `resume`, load the seeds
+    saved by the interrupted sweep, so it is resumed with the same seeds.
+    """
+    if resume and os.path.exists(path):
+        with open(path) as seeds_file:
+            return json.load(seeds_file)
+    seeds = [random.randint(0, 10000) for _ in range(count)]
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    _write_json_atomically(path, seeds)
+    return seeds
+
+def _write_json_atomically(path, value):
+    temp_path = path + ".tmp"
+    with open(temp_path, "w") as temp_file:
+        json.dump(value, temp_file)
+        temp_file.flush()
+        os.fsync(temp_file.fileno())
+    # A reader (or a resumed sweep) sees either the old file or the new one, never half of it
+    os.replace(temp_path, path)
+
+
+class SweepCheckpoint:
+    def __init__(self, path: str, params: dict, every_seconds: float = 60.0):
+        """
+        Progress of a sweep whose cells are written to its outputs in cell order, saved so that an
+        interrupted sweep can be resumed where it stopped.
+
+        A checkpoint holds the number of cells written, the size of every text output and the
+        number of record chunks at that point, and `state`, the totals the sweep accumulates over
+        its cells. It is saved atomically, at most every `every_seconds` and when the sweep ends.
+        Resuming truncates the outputs back to the checkpoint and runs the cells written after it
+        again. Every cell has its own random stream (see iter_sweep), so they give the same results
+        again and the outputs end up the same as those of an uninterrupted sweep.
+
+        Usage:
+            resumed = resume and checkpoint.load()  # Truncates the outputs to the checkpoint
+            if checkpoint.complete: return
+            open the outputs with mode "a" if resumed else "w", then checkpoint.track(outputs...)
+            for result in iter_sweep(..., start=checkpoint.cells_done): write it, checkpoint.cell_done()
+            checkpoint.finish()
+
+        Args:
+            path (str): The checkpoint file.
+            params (dict): The parameters of the sweep, as JSON. A checkpoint saved with other
+                parameters is not resumed.
+            every_seconds (float, optional): Minimum time between two checkpoints. Defaults to 60.
+        """
+        self.path = path
+        self.params = json.loads(json.dumps(params))  # As they read back from the file
+        self.every_seconds = every_seconds
+        self.cells_done = 0
+        self.state = {}
+        self.complete = False
+        self._text_files = []
+        self._record_writers = []
+        self._saved_at = time.monotonic()
+
+    def load(self) -> bool:
+        """
+        Load the checkpoint and truncate the outputs back to it.
+
+        Returns:
+            bool: True if there was a checkpoint (open the outputs in append mode), False if the
+                sweep must start from the beginning.
+        """
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path) as checkpoint_file:
+            checkpoint = json.load(checkpoint_file)
+        if checkpoint["params"] != self.params:
+            raise ValueError(f"the checkpoint {self.path} was saved by a sweep with other parameters")
+        for path, size in checkpoint["text_sizes"].items():
+            with open(path, "r+b") as text_file:
+                text_file.truncate(size)
+        for directory, chunk_count in checkpoint["record_chunks"].items():
+            truncate_results(directory, chunk_count)
+        self.cells_done = checkpoint["cells_done"]
+        self.state = checkpoint["state"]
+        self.complete = checkpoint["complete"]
+        return True
+
+    def track(self, text_files=(), record_writers=()):
+        """
+        Set the open outputs of the sweep (text files and ResultWriters) and save a first checkpoint,
+        so a checkpoint left by an earlier sweep never describes the new outputs.
+        """
+        self._text_files = list(text_files)
+        self._record_writers = list(record_writers)
+        self.save()
+
+    def cell_done(self):
+        """Count a cell whose results are written, and save a checkpoint if the last one is old enough."""
+        self.cells_done += 1
+        if time.monotonic() - self._saved_at >= self.every_seconds:
+            self.save()
+
+    def finish(self):
+        """Save the final checkpoint, after the last cell and the end of the outputs are written."""
+        self.complete = True
+        self.save()
+
+    def save(self):
+        for text_file in self._text_files:
+            text_file.flush()
+            os.fsync(text_file.fileno())
+        for record_writer in self._record_writers:
+            record_writer.flush()
+        _write_json_atomically(self.path, {
+            "params": self.params,
+            "cells_done": self.cells_done,
+            "complete": self.complete,
+            "state": self.state,
+            "text_sizes": {text_file.name: os.fstat(text_file.fileno()).st_size for text_file in self._text_files},
+            "record_chunks": {writer.directory: writer.chunk_count for writer in self._record_writers},
+        })
+        self._saved_at = time.monotonic()
+
+def checkpoint_path_for(log_path: str) -> str:
+    """The checkpoint file of a sweep: its log path without the extension, plus ".checkpoint.json"."""
+    return os.path.splitext(log_path)[0] + ".checkpoint.json"
@@ -0,0 +1,76 @@
+import random
+import unittest
+from bins import Bins
+from matching_bins import MatchingBins
+
+
+class TestBins(unittest.TestCase):
+    def test_matches_list_bins(self):
+        # Compare against plain lists per degree, which is how the bins order nodes
+        rng = random.Random(0)
+        for _ in range(20):
+            bins = Bins()
+            expected = dict()
+            next_id = 0
+            for _ in range(2000):
+                op = rng.random()
+                if op < 0.3 or not expected:
+                    degree = rng.randint(1, 6)
+                    index = rng.choice([None, 0])
+                    bins.add_node(degree, next_id, index=index)
+                    expected.setdefault(degree, []).insert(len(expected[degree]) if index is None else index, next_id)
+                    next_id += 1
+                elif op < 0.4:
+                    degree = rng.randint(1, 6)
+                    run = list(range(next_id, next_id + rng.randint(1, 8)))
+                    bins.prepend_nodes(degree, run)
+                    expected[degree] = run + expected.get(degree, [])
+                    next_id += len(run)
+                else:
+                    degree = rng.choice(list(expected))
+                    if op < 0.7:
+                        node_id = rng.choice(expected[degree])
+                        bins.pop_node_by_id(node_id, degree)
+                        expected[degree].remove(node_id)
+                    else:
+                        pos = rng.choice([0, -1, rng.randrange(len(expected[degree]))])
+                        self.assertEqual(bins.pop_node(degree, pos), expected[degree].pop(pos))
+                    if not expected[degree]:
+                        del expected[degree]
+                if rng.random() < 0.1:  # Iterating compacts the bins, so only check the order once in a while
+                    self.assertEqual(list(bins), [(d, v) for d in sorted(expected, reverse=True) for v in expected[d]])
+                self.assertEqual(bins.size, sum(len(nodes) for nodes in expected.values()))
+                if expected:
+                    self.assertEqual(bins.get_max_degree(), max(expected))
+                    self.assertEqual(bins.get_min_degree(), min(expected))
+    def test_matching_bins_top_queries(self):
+        # Compare the counted queries against building the top nodes explicitly
+        rng = random.Random(1)
+        for _ in range(300):
+            matching_nodes = set()
+            bins = MatchingBins(matching_nodes)
+            for node_id in range(rng.randint(2, 40)):
+                if rng.random() < 0.5:
+                    matching_nodes.add(node_id)
+                bins.add_node(rng.randint(1, 12), node_id)
+            self.assertEqual(list(bins.unmatched_bins), [(d, v) for d, v in bins if v not in matching_nodes])
+            self.assertEqual(list(bins.matched_bins), [(d, v) for d, v in bins if v in matching_nodes])
+            for degree, node_id in list(bins):
+                if degree >= bins.size:
+                    continue
+                top_nodes = dict()
+                for top_degree in bins.iter_degrees_descending():
+                    top_nodes.update((v, top_degree) for v in bins.bins[top_degree] if v != node_id)
+                    if len(top_nodes) >= degree:
+                        break
+                has_unmatched = any(v not in matching_nodes for v in top_nodes)
+                min_degree = min(top_nodes.values())
+                high = [v for v, d in top_nodes.items() if d > min_degree]
+                min_matched = [v for v, d in top_nodes.items() if d == min_degree and v in matching_nodes]
+                allows_matched = all(v in matching_nodes for v in high) and len(min_matched) >= degree - len(high)
+                self.assertEqual(bins.top_threshold(degree, degree), min_degree)
+                self.assertEqual(bins.top_has_unmatched(degree, node_id, degree), has_unmatched)
+                self.assertEqual(bins.top_allows_matched_pivot(degree, node_id, degree), allows_matched)
+
+if __name__ == "__main__":
+    unittest.main()
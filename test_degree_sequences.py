@@ -1,8 +1,60 @@
+import contextlib
+import io
+import os
+import random
+import tempfile
 import unittest
-from graph_utils import maximum_matching_size_numpy
-from havel_hakimi_algorithm import havel_hakimi_general
+from unittest import mock
+import numpy as np
+from rustworkx import undirected_gnp_random_graph
+import experiment_regular_graphs
+from experiment_matching_aware_power_law import run_cell as power_law_cell
+from find_approximation_of_experiments import aggregate_experiments
+from graph_visualization import LayoutCache, graph_layout
+from graph_utils import DegreeSequenceProfile, degree_order, degree_sequence, degree_sequence_repr, edges_to_rustworkx_graph, erdos_gallai_check, generate_coupled_graphs, generate_graph_with_perfect_matching, maximal_matching_lower_bound, maximum_matching_size_numpy, parse_degree_sequence, prefix_degree_sequences, td
+from hh_cache import HHResultCache
+from hh_profiler import HHProfiler
+from havel_hakimi_algorithm import HavelHakimiStream, RaggedSequences, havel_hakimi_batch, havel_hakimi_general
+from results_store import ResultBuffer, ResultWriter, load_results
+from run_length_havel_hakimi import havel_hakimi_runs, iter_run_edges
 from strategies.matching_aware_strategy import MatchingAwareStrategy
+from strategies.max_degree_strategy import MaxDegreeStrategy
 from strategies.naive_matching_aware_strategy import NaiveMatchingAwareStrategy
+from sweep_runner import run_sweep
+
+def _maximum_matching_size_reference(deg_seq):
+    # The original O(n^3) formulation of maximum_matching_size_numpy, kept to check the fast one
+    n = len(deg_seq)
+    if n == 0:
+        return 0
+    deg_array = np.array(deg_seq)
+    for delta in range(n if n % 2 == 0 else n - 1, 1, -2):
+        h_delta = delta // 2
+        d_delta = deg_seq[delta - 1]
+        first_flag = True
+        s1 = 0
+        for k in range(1, h_delta):
+            s1 += deg_seq[k - 1]
+            indicator = (np.arange(k, n) <= (delta - 1)).astype(int)
+            s2 = np.sum(np.minimum(deg_array[k:] - indicator, k))
+            first_flag = first_flag and (s1 <= k**2 + s2)
+            if not first_flag:
+                break
+        if not first_flag:
+            continue
+        larger = sum(1 for i, d in enumerate(deg_seq) if d == d_delta and i > delta - 1)
+        smaller = sum(1 for i, d in enumerate(deg_seq) if d == d_delta and i < delta - 1)
+        k = delta + larger - smaller
+        s1 = np.sum(deg_array[:k])
+        if k < n:
+            indicator = (deg_array[k:] == d_delta).astype(int)
+            s3 = np.sum(np.minimum(deg_array[k:] - indicator, k))
+        else:
+            s3 = 0
+        if (s1 + larger) <= (k**2 + s3):
+            return h_delta
+    return 0
+
 
 class TestHavelHakimiAlgorithm(unittest.TestCase):
     def test_degree_sequence_k_odd(self):
@@ -32,6 +84,326 @@ class TestHavelHakimiAlgorithm(unittest.TestCase):
             degrees = [k] * 2 + [2] * (2 * k)
             self._run_and_compare_strategies(degrees)
 
+    def test_erdos_gallai_precheck(self):
+        # The max degree strategy decides graphicality exactly, so both tests must agree
+        rng = random.Random(0)
+        for _ in range(2000):
+            n = rng.randint(1, 15)
+            degrees = [rng.randint(0, n) for _ in range(n)]
+            is_graphical, _ = havel_hakimi_general(degrees, strategy=MaxDegreeStrategy())
+            self.assertEqual(erdos_gallai_check(degrees)[0], is_graphical, f"Erdős–Gallai disagrees on {degrees}")
+            strategy = MatchingAwareStrategy()
+            is_graphical_checked, edges = havel_hakimi_general(degrees, strategy=strategy, precheck=True)
+            if not is_graphical:
+                self.assertFalse(is_graphical_checked)
+                self.assertEqual(edges, [])
+                self.assertIsNotNone(strategy.rejection_reason)
+                # Without the precheck, the matching strategies reject the sequence too, instead of failing
+                for StrategyClass in (MatchingAwareStrategy, NaiveMatchingAwareStrategy):
+                    strategy = StrategyClass(degrees=degrees)
+                    self.assertEqual(havel_hakimi_general(degrees, strategy=strategy), (False, []), f"{degrees}")
+                    self.assertIsNotNone(strategy.rejection_reason)
+                    stream = HavelHakimiStream(degrees, StrategyClass(degrees=degrees))
+                    list(stream)
+                    self.assertFalse(stream.is_graphical, f"{degrees}")
+
+    def test_run_length_engine(self):
+        # The run-length engine must build exactly the edges of the max degree strategy
+        rng = random.Random(0)
+        for _ in range(1000):
+            spec = " + ".join(f"[{rng.randint(0, 8)}]*{rng.randint(1, 20)}" for _ in range(rng.randint(1, 5)))
+            degrees = parse_degree_sequence(spec)
+            is_graphical, edges = havel_hakimi_general(degrees, strategy=MaxDegreeStrategy())
+            is_graphical_runs, edge_runs = havel_hakimi_runs(parse_degree_sequence(spec, as_runs=True))
+            self.assertEqual(is_graphical_runs, is_graphical, spec)
+            self.assertEqual(list(iter_run_edges(edge_runs)), edges, spec)
+        # Runs given directly, with empty runs and runs of zero count (the parser drops those)
+        for _ in range(1000):
+            runs = [(rng.randint(0, 8), rng.randint(0, 20)) for _ in range(rng.randint(0, 5))]
+            degrees = [degree for degree, count in runs for _ in range(count)]
+            is_graphical, edges = havel_hakimi_general(degrees, strategy=MaxDegreeStrategy())
+            is_graphical_runs, edge_runs = havel_hakimi_runs(runs)
+            self.assertEqual(is_graphical_runs, is_graphical, runs)
+            self.assertEqual(list(iter_run_edges(edge_runs)), edges, runs)
+        is_graphical_runs, edge_runs = havel_hakimi_runs([(5, 6), (6, 0)])
+        self.assertTrue(is_graphical_runs)
+        self.assertEqual(list(iter_run_edges(edge_runs)), havel_hakimi_general([5] * 6, strategy=MaxDegreeStrategy())[1])
+
+    def test_edge_array_output(self):
+        # The edge array must hold the same edges, in the same order, as the edge list
+        for degrees in ([3] * 4 + [2] * 6 + [1] * 4, [5] * 6 + [1] * 30, [4] * 12, [3, 3, 1]):
+            for StrategyClass in (MaxDegreeStrategy, MatchingAwareStrategy):
+                is_graphical, edges = havel_hakimi_general(degrees, strategy=StrategyClass())
+                is_graphical_array, edge_array = havel_hakimi_general(degrees, strategy=StrategyClass(), as_array=True)
+                self.assertEqual(is_graphical_array, is_graphical)
+                self.assertEqual(edge_array.shape, (len(edges), 2))
+                self.assertEqual([tuple(edge) for edge in edge_array.tolist()], edges)
+
+    def test_streaming_output(self):
+        # The stream must yield the edges of havel_hakimi_general and give the verdict at the end
+        for degrees in ([3] * 4 + [2] * 6 + [1] * 4, [5] * 6 + [1] * 30, [4] * 12, [3, 3, 1], [3, 3, 2, 1, 1]):
+            for StrategyClass in (MaxDegreeStrategy, MatchingAwareStrategy):
+                is_graphical, edges = havel_hakimi_general(degrees, strategy=StrategyClass())
+                stream = HavelHakimiStream(degrees, strategy=StrategyClass())
+                self.assertIsNone(stream.is_graphical)
+                streamed = list(stream)
+                self.assertEqual(stream.is_graphical, is_graphical)
+                if is_graphical:
+                    self.assertEqual(streamed, edges)
+                else:
+                    self.assertIsNotNone(stream.rejection_reason)
+                batches = HavelHakimiStream(degrees, strategy=StrategyClass()).batches()
+                self.assertEqual([(pivot, neighbor) for pivot, neighbors in batches for neighbor in neighbors], streamed)
+
+    def test_maximum_matching_size_matches_reference(self):
+        rng = random.Random(0)
+        for _ in range(3000):
+            n = rng.randint(0, 25)
+            degrees = [rng.randint(0, rng.choice([2, n, 3 * n + 5])) for _ in range(n)]
+            if rng.random() < 0.6:
+                degrees.sort(reverse=True)
+            self.assertEqual(maximum_matching_size_numpy(degrees), _maximum_matching_size_reference(degrees), f"{degrees}")
+
+    def test_degree_sequence_profile_queries(self):
+        # The profile-based bounds must match their definitions, for sorted and unsorted sequences
+        rng = random.Random(1)
+        for _ in range(1000):
+            n = rng.randint(1, 25)
+            degrees = [rng.randint(0, 2 * n) for _ in range(n)]
+            if rng.random() < 0.6:
+                degrees.sort(reverse=True)
+            profile = DegreeSequenceProfile(degrees)
+            lower_bound = min((k - 1) + sum(1 for d in degrees if k <= d <= degrees[k - 1]) // 2 for k in range(1, n + 1))
+            self.assertEqual(maximal_matching_lower_bound(degrees, profile), lower_bound, f"{degrees}")
+            for delta in range(n):
+                larger = sum(1 for d in degrees[delta + 1:] if d == degrees[delta])
+                smaller = sum(1 for d in degrees[:delta] if d == degrees[delta])
+                self.assertEqual(td(delta, degrees, profile), (larger - smaller, larger), f"{degrees}")
+            self.assertEqual(maximum_matching_size_numpy(degrees, profile), maximum_matching_size_numpy(degrees))
+
+    def test_degree_sequence_inputs(self):
+        edges = [(0, 1), (1, 2), (2, 0), (2, 7), (9, 9)]
+        self.assertEqual(degree_sequence(edges), [3, 2, 2, 2, 1])
+        self.assertEqual(degree_sequence(np.array(edges)), [3, 2, 2, 2, 1])
+        self.assertEqual(degree_sequence([(10**9, 1), (1, -5)]), [2, 1, 1])
+        self.assertEqual(degree_sequence([]), [])
+        graph = undirected_gnp_random_graph(200, 0.05, seed=3)
+        self.assertEqual(degree_sequence(graph.edge_list()), sorted((graph.degree(v) for v in graph.node_indices() if graph.degree(v) > 0), reverse=True))
+        self.assertEqual(degree_sequence_repr([4, 4, 3, 3, 3, 2]), "[4] *2, [3] *3, [2] *1")
+        self.assertEqual(degree_sequence_repr([2, 3, 3, 2]), "[2] *1, [3] *2, [2] *1")
+        self.assertEqual(degree_sequence_repr([]), "")
+
+    def test_generate_graph_with_perfect_matching(self):
+        for n, p in ((2, 0.5), (10, 0.0), (10, 1.0), (60, 0.1), (500, 0.01)):
+            edges, matching = generate_graph_with_perfect_matching(n, p, np.random.default_rng(n))
+            edge_set = set(map(tuple, edges.tolist()))
+            self.assertEqual(len(edge_set), len(edges), "duplicate edges")
+            self.assertTrue(np.all(edges[:, 0] < edges[:, 1]) and edges.max() < n)
+            self.assertEqual(sorted(matching.ravel().tolist()), list(range(n)))
+            self.assertTrue(set(map(tuple, np.sort(matching, axis=1).tolist())) <= edge_set)
+            if p == 1.0:
+                self.assertEqual(len(edges), n * (n - 1) // 2)
+        same_edges, _ = generate_graph_with_perfect_matching(60, 0.1, np.random.default_rng(60))
+        self.assertTrue(np.array_equal(generate_graph_with_perfect_matching(60, 0.1, np.random.default_rng(60))[0], same_edges))
+
+    def test_coupled_graphs(self):
+        # The graphs of a coupled sweep are nested, and their degree sequences are computed incrementally
+        rng = np.random.default_rng(0)
+        p_values = [0.2, 0.05, 0.3, 0.1]
+        for perfect_matching in (False, True):
+            for _ in range(20):
+                edge_prefixes, matching = generate_coupled_graphs(40, p_values, rng, perfect_matching=perfect_matching)
+                edge_sets = [set(map(tuple, edges.tolist())) for edges in edge_prefixes]
+                self.assertTrue(edge_sets[1] <= edge_sets[3] <= edge_sets[0] <= edge_sets[2])
+                self.assertEqual(prefix_degree_sequences(edge_prefixes), [degree_sequence(edges) for edges in edge_prefixes])
+                if perfect_matching:
+                    self.assertTrue(set(map(tuple, np.sort(matching, axis=1).tolist())) <= edge_sets[1])
+
+    def test_edges_to_rustworkx_graph_mapping(self):
+        for edges in ([(5, 9), (9, 2), (2, 5), (7, 5)], [(10**9, 3), (3, -1)], np.array([[4, 0], [0, 8]])):
+            graph, node_ids = edges_to_rustworkx_graph(edges, return_mapping=True)
+            self.assertEqual(graph.nodes(), sorted(set(np.ravel(edges).tolist())))
+            self.assertEqual(node_ids.tolist(), graph.nodes())
+            mapped = [tuple(node_ids[[u, v]].tolist()) for u, v in graph.edge_list()]
+            self.assertEqual(mapped, [tuple(edge) for edge in np.asarray(edges).tolist()])
+
+    def test_sweep_independent_of_workers(self):
+        # Each cell has its own stream, so the results only depend on the seed and the cell order
+        cells = [(MatchingAwareStrategy, n, [1.9, 2.1], 3) for n in (10, 20, 30)]
+        def logs(results):
+            # The log and the graphical count of every cell, without the timed records
+            return [result[:2] for result in results]
+        serial = logs(run_sweep(power_law_cell, cells, workers=1, seed=11))
+        self.assertEqual(logs(run_sweep(power_law_cell, cells, workers=2, seed=11)), serial)
+        # The middle cell keeps its position when the grid is reversed, so it keeps its stream
+        self.assertEqual(logs(run_sweep(power_law_cell, cells[::-1], workers=2, seed=11))[1], serial[1])
+
+    def test_hh_result_cache(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "hh.sqlite")
+            sequences = [[3, 3, 2, 2, 2, 2], [2, 2, 2, 2], [1, 1, 1, 1], [5, 1, 1]]
+            with HHResultCache(path, memory_size=2, store_edges=True) as cache:
+                for index, degrees in enumerate(sequences + sequences):
+                    result = cache.run(degrees, MatchingAwareStrategy, with_bound=True)
+                    strategy = MatchingAwareStrategy(degrees=degrees)
+                    is_graphical, edges = havel_hakimi_general(degrees, strategy=strategy)
+                    self.assertEqual(result.is_graphical, is_graphical)
+                    self.assertEqual(result.matching_bound, maximum_matching_size_numpy(degrees))
+                    if is_graphical:
+                        self.assertEqual(result.matching_size, len(strategy.get_matching_edges()))
+                        self.assertEqual(list(map(tuple, result.edges.tolist())), edges)
+                        # The matching edges come with the results computed now, not with the cached ones
+                        if index < len(sequences):
+                            self.assertEqual(result.matching_edges, strategy.get_matching_edges())
+                            self.assertGreater(result.seconds, 0)
+                        else:
+                            self.assertIsNone(result.matching_edges)
+                            self.assertIsNone(result.seconds)
+                self.assertEqual(cache.counts(), (4, 0, 4))
+            # An entry in memory without the bound asked for is a miss, not a memory hit
+            with HHResultCache() as cache:
+                cache.run([2, 2, 2], MaxDegreeStrategy)
+                cache.run([2, 2, 2], MaxDegreeStrategy, with_bound=True)
+                self.assertEqual(cache.counts(), (0, 0, 2))
+                cache.run([2, 2, 2], MaxDegreeStrategy, with_bound=True)
+                self.assertEqual(cache.counts(), (1, 1, 2))
+            # A new cache finds the results in the file, and evicts the oldest ones past its budget
+            with HHResultCache(path, max_bytes=300, store_edges=True) as cache:
+                cache.run([3, 3, 2, 2, 2, 2], MatchingAwareStrategy, with_bound=True)
+                self.assertEqual(cache.counts(), (1, 0, 0))
+                cache.run([1, 1], MaxDegreeStrategy)
+                self.assertEqual(cache.misses, 1)
+                self.assertLessEqual(cache._stored_bytes, 300)
+                stored = cache._db().execute("SELECT COUNT(*) FROM results").fetchone()[0]
+                self.assertLess(stored, 5)
+
+    def test_results_store_round_trip(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            records_dir = os.path.join(tmp, "records")
+            records = ResultBuffer()
+            for round_idx in range(1, 6):
+                records.append(n=10, p=0.25, round=round_idx, matching_size=round_idx, seconds=0.5)
+            with ResultWriter(records_dir, chunk_rows=2) as writer:
+                writer.write(records, seed=3)
+                writer.append(n=12, p=0.5, matching_size=6)
+            # Appending keeps the existing chunks, writing again replaces them
+            with ResultWriter(records_dir, mode="a") as writer:
+                writer.append(n=14, p=0.5, matching_size=7)
+            loaded = load_results(records_dir)
+            self.assertEqual(loaded["n"].tolist(), [10] * 5 + [12, 14])
+            self.assertEqual(loaded["seed"].tolist(), [3] * 5 + [-1, -1])
+            self.assertEqual(loaded["matching_size"].dtype, np.int32)
+            self.assertTrue(np.isnan(loaded["seconds"][-1]))
+            with ResultWriter(records_dir):
+                pass
+            self.assertEqual(len(load_results(records_dir, columns=["n"])["n"]), 0)
+            with self.assertRaises(ValueError):
+                records.append(n=1, degree=2)
+
+    def test_aggregate_experiments_incremental(self):
+        def write_log(path, min_value):
+            with open(path, "w") as log_file:
+                log_file.write(f"n=10, p=0.10 | rounds=5\n  min: {min_value}\n\nn=20, p=0.10 | rounds=5\n  min: 10\n")
+        with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+            write_log(os.path.join(tmp, "experiment_log_s1.txt"), 5)
+            write_log(os.path.join(tmp, "experiment_log_s2.txt"), 4)
+            self.assertEqual(aggregate_experiments(tmp), 0.8)
+            report = os.path.join(tmp, "experiments_approx_ratios_s1.txt")
+            os.utime(report, ns=(0, 0))
+            # An unchanged log is not processed again, a new one is merged into the summary
+            write_log(os.path.join(tmp, "experiment_log_s3.txt"), 3)
+            self.assertEqual(aggregate_experiments(tmp), 0.6)
+            self.assertEqual(os.stat(report).st_mtime_ns, 0)
+            with open(os.path.join(tmp, "experiments_approx_ratios_summary.txt")) as summary:
+                self.assertIn("n=10, p=0.10, min=3, approx_ratio=0.6000", summary.read())
+
+    def test_profiler(self):
+        # A profiled run builds the same graph, and the wrappers are gone once it is done
+        degrees = [3] * 4 + [1] * 12
+        for StrategyClass in (MatchingAwareStrategy, NaiveMatchingAwareStrategy, MaxDegreeStrategy):
+            strategy = StrategyClass(degrees=degrees)
+            strategy.profiler = HHProfiler()
+            result = havel_hakimi_general(degrees, strategy=strategy)
+            self.assertEqual(result, havel_hakimi_general(degrees, strategy=StrategyClass(degrees=degrees)))
+            self.assertNotIn("choose_pivot", vars(strategy))
+            self.assertGreater(strategy.profiler.pivots, 0)
+            if StrategyClass is not MaxDegreeStrategy:
+                self.assertGreater(strategy.profiler.counters["pivot candidates"], 0)
+
+    def test_havel_hakimi_batch(self):
+        # The pooled strategy and bins give the results of a new strategy per sequence,
+        # also after a rejected sequence, and for any number of shards and workers
+        sequences = [[3, 3, 2, 2, 2, 2], [3, 3, 3, 1], [2, 2, 2, 2], [], [5, 1, 1], [3] * 4 + [1] * 12, [1, 1]]
+        for StrategyClass in (MatchingAwareStrategy, NaiveMatchingAwareStrategy, MaxDegreeStrategy):
+            result = havel_hakimi_batch(RaggedSequences.pack(sequences), StrategyClass, precheck=True, shard_size=3)
+            self.assertEqual(len(result.edge_offsets), len(sequences) + 1)
+            for index, degrees in enumerate(sequences):
+                strategy = StrategyClass(degrees=degrees)
+                is_graphical, edges = havel_hakimi_general(degrees, strategy=strategy, precheck=True, as_array=True)
+                self.assertEqual(result.is_graphical[index], is_graphical, f"{degrees}")
+                self.assertTrue(np.array_equal(result.edges_of(index), edges), f"{degrees}")
+                if is_graphical and StrategyClass is not MaxDegreeStrategy:
+                    self.assertEqual(result.matching_size[index], len(strategy.get_matching_edges()))
+        sharded = havel_hakimi_batch(sequences, MaxDegreeStrategy, shard_size=2, workers=2, store_edges=False)
+        self.assertEqual(sharded.is_graphical.tolist(), result.is_graphical.tolist())
+        self.assertEqual(sharded.edge_counts.tolist(), np.diff(result.edge_offsets).tolist())
+        self.assertEqual(len(sharded.edges), 0)
+        with self.assertRaises(ValueError):
+            sharded.edges_of(0)
+        # Without the precheck, a sequence rejected by the matching strategy does not stop the others
+        unchecked = havel_hakimi_batch(sequences, MatchingAwareStrategy, shard_size=3, store_matchings=True)
+        checked = havel_hakimi_batch(sequences, MatchingAwareStrategy, precheck=True, shard_size=3)
+        self.assertEqual(unchecked.is_graphical.tolist(), checked.is_graphical.tolist())
+        self.assertEqual(unchecked.edges.tolist(), checked.edges.tolist())
+        for index, degrees in enumerate(sequences):
+            strategy = MatchingAwareStrategy(degrees=degrees)
+            if havel_hakimi_general(degrees, strategy=strategy)[0]:
+                self.assertEqual(unchecked.matching_of(index).tolist(), list(map(list, strategy.get_matching_edges())))
+
+    def test_sweep_resume(self):
+        # A sweep interrupted after a few cells and resumed writes the same outputs as an uninterrupted one
+        run_cell = experiment_regular_graphs.run_cell
+        def preempted(StrategyClass, d, *args, **kwargs):
+            if d == 4:
+                raise RuntimeError("preempted")
+            return run_cell(StrategyClass, d, *args, **kwargs)
+        def outputs(base_dir):
+            with open(os.path.join(base_dir, "regular_graph_experiment_log.txt")) as log_file:
+                lines = [line for line in log_file if "Experiment" not in line]
+            return lines, load_results(os.path.join(base_dir, "regular_graph_experiment_log_records"))["n"].tolist()
+        with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+            full, part = os.path.join(tmp, "full"), os.path.join(tmp, "part")
+            settings = dict(d_range=range(1, 7), n_max=16, checkpoint_seconds=0)
+            experiment_regular_graphs.run_regular_graph_experiment(base_dir=full, **settings)
+            with mock.patch.object(experiment_regular_graphs, "run_cell", preempted), self.assertRaises(RuntimeError):
+                experiment_regular_graphs.run_regular_graph_experiment(base_dir=part, **settings)
+            experiment_regular_graphs.run_regular_graph_experiment(base_dir=part, resume=True, **settings)
+            self.assertEqual(outputs(part), outputs(full))
+            with self.assertRaises(ValueError):
+                experiment_regular_graphs.run_regular_graph_experiment(base_dir=part, resume=True, d_range=range(1, 5), n_max=16)
+
+    def test_large_graph_layout(self):
+        # One finite position per node of a large graph with many components, and a cached layout
+        # only for the same graph, or for the HH graph on the same nodes under an explicit key
+        rng = np.random.default_rng(1)
+        edges, _ = generate_graph_with_perfect_matching(3000, 1.5 / 3000, rng)
+        node_ids, positions = graph_layout(edges, seed=0)
+        self.assertEqual(node_ids.tolist(), sorted(set(edges.ravel().tolist())))
+        self.assertEqual(positions.shape, (len(node_ids), 2))
+        self.assertTrue(np.isfinite(positions).all())
+        self.assertEqual(len(np.unique(positions.round(9), axis=0)), len(node_ids))
+        _, hh_edges = havel_hakimi_general(degree_sequence(edges), strategy=MaxDegreeStrategy(), as_array=True)
+        cache = LayoutCache()
+        layout = cache.get(edges, seed=0)
+        self.assertIs(cache.get(edges[::-1, ::-1], seed=0), layout)
+        self.assertIsNot(cache.get(hh_edges, seed=0), layout)
+        # On the nodes of the original graph, the HH graph has their degrees and shares their layout
+        node_order = degree_order(edges)
+        hh_on_original = node_order[hh_edges]
+        np.testing.assert_array_equal(np.bincount(hh_on_original.ravel()), np.bincount(edges.ravel()))
+        layout = cache.get(edges, seed=0, key="panels")
+        self.assertIs(cache.get(hh_on_original, seed=0, key="panels"), layout)
+
     def _run_and_compare_strategies(self, degrees):
         # Run with MatchingAwareStrategy
         matching_strategy = MatchingAwareStrategy()